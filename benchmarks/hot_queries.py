@@ -0,0 +1,139 @@
+"""Tez-tez bajariladigan so'rovlar mikrobenchmarki: Model.query vs keshlangan lambda_stmt.
+
+Ishga tushirish (repo ildizidan):
+
+    python benchmarks/hot_queries.py --iterations 5000
+
+Har bir so'rov ikki usulda bir xil natija bilan bajariladi; farq Python
+tomonidagi (so'rov qurish va kesh kalitini hisoblash) sarf. Oxirida bitta
+bron yaratish so'rovidagi (foydalanuvchi, xona, kompyuter, to'qnashuv)
+jami tejash ko'rsatiladi.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def measure(function, iterations):
+    function()
+    best = None
+    for _ in range(3):
+        began = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = (time.perf_counter() - began) / iterations
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=200)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix='gameport-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+
+    from src.main import app
+    from src.models.user import User, db
+    from src.models.game_club import GameClub
+    from src.models.room import Room
+    from src.models.computer import Computer
+    from src.models.booking import Booking
+    from src.models.media_file import MediaFile
+    from src.services import queries
+    from sqlalchemy import and_, func, or_
+
+    with app.app_context():
+        admin = User.query.filter_by(role='superadmin').first()
+        club = GameClub(name='Bench', address='Bench', phone='0')
+        db.session.add(club)
+        db.session.flush()
+        room = Room(name='Room', computer_count=10, hourly_price=10000, game_club_id=club.id)
+        db.session.add(room)
+        db.session.flush()
+        computers = [Computer(number=number, room_id=room.id) for number in range(1, 11)]
+        db.session.add_all(computers)
+        db.session.flush()
+        start = datetime(2026, 1, 1)
+        db.session.add_all([
+            Booking(
+                customer_username='bench', start_time=start + timedelta(hours=i),
+                end_time=start + timedelta(hours=i + 1), total_hours=1, total_price=10000,
+                computer_id=computers[i % 10].id, room_id=room.id, game_club_id=club.id, admin_id=admin.id
+            )
+            for i in range(args.bookings)
+        ])
+        db.session.add_all([
+            MediaFile(
+                filename=f'{i}.jpg', original_filename=f'{i}.jpg', file_path=f'/tmp/{i}.jpg',
+                file_type='image' if i % 3 else 'video', file_size=1, mime_type='image/jpeg',
+                game_club_id=club.id, uploaded_by=admin.id
+            )
+            for i in range(30)
+        ])
+        db.session.commit()
+
+        computer = computers[3]
+        probe_start = start + timedelta(hours=10, minutes=30)
+        probe_end = probe_start + timedelta(hours=2)
+
+        def legacy_conflict():
+            return Booking.query.filter(
+                and_(
+                    Booking.computer_id == computer.id,
+                    Booking.is_active == True,
+                    or_(
+                        and_(Booking.start_time <= probe_start, Booking.end_time > probe_start),
+                        and_(Booking.start_time < probe_end, Booking.end_time >= probe_end),
+                        and_(Booking.start_time >= probe_start, Booking.end_time <= probe_end)
+                    )
+                )
+            ).first()
+
+        def legacy_media():
+            return db.session.query(MediaFile.file_type, func.count(MediaFile.id)).filter_by(
+                game_club_id=club.id, is_active=True
+            ).group_by(MediaFile.file_type).all()
+
+        cases = [
+            ('user_by_id', True,
+             lambda: User.query.filter_by(id=admin.id).first(),
+             lambda: queries.user_by_id(admin.id)),
+            ('room_for_club', True,
+             lambda: Room.query.filter_by(id=room.id, game_club_id=club.id, is_active=True).first(),
+             lambda: queries.room_for_club(room.id, club.id)),
+            ('computer_by_number', True,
+             lambda: Computer.query.filter_by(room_id=room.id, number=4, is_active=True).first(),
+             lambda: queries.computer_by_number(room.id, 4)),
+            ('conflicting_booking', True,
+             lambda: getattr(legacy_conflict(), 'id', None),
+             lambda: queries.conflicting_booking_id(computer.id, probe_start, probe_end)),
+            ('media_type_counts', False,
+             lambda: sorted(map(tuple, legacy_media())),
+             lambda: sorted(map(tuple, queries.media_type_counts(club.id))))
+        ]
+
+        print('so\'rov'.ljust(22) + 'Model.query'.rjust(14) + 'lambda_stmt'.rjust(14) + 'tejash'.rjust(12))
+        per_request = 0.0
+        for name, in_create, legacy, cached in cases:
+            assert legacy() == cached(), name
+            legacy_time = measure(legacy, args.iterations)
+            cached_time = measure(cached, args.iterations)
+            saved = legacy_time - cached_time
+            if in_create:
+                per_request += saved
+            print(f'{name:<22}{legacy_time * 1e6:>11.1f} us{cached_time * 1e6:>11.1f} us'
+                  f'{saved * 1e6:>9.1f} us')
+        print(f'bron yaratish so\'rovida tejash: {per_request * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
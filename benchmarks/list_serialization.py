@@ -0,0 +1,119 @@
+"""Ro'yxat endpoint lari benchmarki: ORM + to_dict() vs Core qatorlari (listing).
+
+Ishga tushirish (repo ildizidan):
+
+    python benchmarks/list_serialization.py --bookings 20000
+
+Har bir ro'yxat uchun ikkala usul natijasi solishtiriladi, so'ng bitta qator
+uchun vaqt va tracemalloc bo'yicha eng yuqori xotira o'lchanadi.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix='gameport-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+
+    from src.main import app
+    from src.models.user import User, db
+    from src.models.game_club import GameClub
+    from src.models.room import Room
+    from src.models.computer import Computer
+    from src.models.booking import Booking
+    from src.models.media_file import MediaFile
+    from src.services import listing
+    from sqlalchemy import insert
+
+    with app.app_context():
+        admin = User.query.filter_by(role='superadmin').first()
+        club = GameClub(name='Bench', address='Bench', phone='0')
+        db.session.add(club)
+        db.session.flush()
+        room = Room(name='Room', computer_count=50, hourly_price=10000, game_club_id=club.id)
+        db.session.add(room)
+        db.session.flush()
+        computers = [Computer(number=number, room_id=room.id) for number in range(1, 51)]
+        db.session.add_all(computers)
+        db.session.flush()
+        start = datetime(2026, 1, 1)
+        db.session.execute(insert(Booking), [
+            {
+                'customer_username': f'bench{i}', 'start_time': start + timedelta(hours=i),
+                'end_time': start + timedelta(hours=i + 1), 'total_hours': 1, 'total_price': 10000,
+                'computer_id': computers[i % 50].id, 'room_id': room.id, 'game_club_id': club.id,
+                'admin_id': admin.id, 'created_at': start + timedelta(seconds=i)
+            }
+            for i in range(args.bookings)
+        ])
+        db.session.execute(insert(MediaFile), [
+            {
+                'filename': f'{i}.jpg', 'original_filename': f'{i}.jpg', 'file_path': f'/tmp/{i}.jpg',
+                'file_type': 'image', 'file_size': 1000 + i, 'mime_type': 'image/jpeg',
+                'game_club_id': club.id, 'uploaded_by': admin.id, 'created_at': start + timedelta(seconds=i)
+            }
+            for i in range(args.files)
+        ])
+        db.session.commit()
+
+        def orm(query):
+            def run():
+                result = [item.to_dict() for item in query()]
+                db.session.remove()
+                return result
+            return run
+
+        cases = [
+            ('my-bookings', args.bookings,
+             orm(lambda: Booking.query.filter_by(game_club_id=club.id).order_by(Booking.created_at.desc()).all()),
+             lambda: listing.booking_dicts(club.id)),
+            ('my-files', args.files,
+             orm(lambda: MediaFile.query.filter_by(game_club_id=club.id, is_active=True)
+                 .order_by(MediaFile.created_at.desc()).all()),
+             lambda: listing.media_dicts(club.id)),
+            ('rooms', 50,
+             orm(lambda: Room.query.filter_by(game_club_id=club.id, is_active=True).order_by(Room.id).all()),
+             lambda: listing.room_dicts(club.id))
+        ]
+
+        print('ro\'yxat'.ljust(14) + 'qator'.rjust(8) + 'ORM us/qator'.rjust(15) + 'Core us/qator'.rjust(15)
+              + 'ORM KB'.rjust(10) + 'Core KB'.rjust(10))
+        for name, rows, legacy, core in cases:
+            assert json.dumps(legacy(), sort_keys=True) == json.dumps(core(), sort_keys=True), name
+            legacy_time, legacy_peak = measure(legacy, args.repeat)
+            core_time, core_peak = measure(core, args.repeat)
+            print(f'{name:<14}{rows:>8}{legacy_time / rows * 1e6:>15.2f}{core_time / rows * 1e6:>15.2f}'
+                  f'{legacy_peak / 1024:>10.0f}{core_peak / 1024:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
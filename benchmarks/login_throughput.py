@@ -0,0 +1,107 @@
+"""Login o'tkazuvchanligi benchmarki.
+
+Ishga tushirish (repo ildizidan):
+
+    python benchmarks/login_throughput.py --threads 8 --requests 200
+    PASSWORD_HASH_WORKERS=0 python benchmarks/login_throughput.py   # inline xeshlash
+
+Login oqimi davomida arzon endpoint (katalog) kechikishi ham o'lchanadi.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix='gameport-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+
+    from src.main import app
+    from src.models.user import User, db
+    from src.services.hashing import hash_passwords
+
+    app.config['LOGIN_IP_LIMIT'] = 10 ** 9
+    app.config['LOGIN_EMAIL_LIMIT'] = 10 ** 9
+
+    with app.app_context():
+        emails = [f'bench{i}@gameport.uz' for i in range(args.users)]
+        hashes = hash_passwords(['bench-password'] * args.users)
+        db.session.add_all([
+            User(full_name=f'Bench {i}', email=email, password_hash=password_hash, role='admin')
+            for i, (email, password_hash) in enumerate(zip(emails, hashes))
+        ])
+        db.session.commit()
+
+    login_latencies = []
+    cheap_latencies = []
+    done = threading.Event()
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client
+
+    def login(i):
+        started = time.perf_counter()
+        response = client().post('/api/auth/login', json={
+            'email': emails[i % len(emails)],
+            'password': 'bench-password'
+        })
+        login_latencies.append(time.perf_counter() - started)
+        return response.status_code
+
+    def probe():
+        probe_client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            probe_client.get('/api/game-club/catalogue')
+            cheap_latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    probe_thread = threading.Thread(target=probe, daemon=True)
+    probe_thread.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        statuses = list(executor.map(login, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+
+    print(f"hash method:        {app.config['PASSWORD_HASH_METHOD']}")
+    print(f"hash workers:       {app.config['PASSWORD_HASH_WORKERS']}")
+    print(f'threads:            {args.threads}')
+    print(f'logins:             {len(statuses)} ({statuses.count(200)} ok)')
+    print(f'throughput:         {len(statuses) / elapsed:.1f} login/s')
+    print(f'login p50 / p95:    {statistics.median(login_latencies) * 1000:.1f} / '
+          f'{percentile(login_latencies, 95) * 1000:.1f} ms')
+    if cheap_latencies:
+        print(f'catalogue p50 / p95: {statistics.median(cheap_latencies) * 1000:.1f} / '
+              f'{percentile(cheap_latencies, 95) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""So'rov yo'lidagi issiq funksiyalar mikrobenchmarklari (xotiradagi SQLite bilan, tarmoqsiz).
+
+Ishga tushirish (repo ildizidan):
+
+    python benchmarks/microbench.py                  # baseline bilan solishtirish
+    python benchmarks/microbench.py --save           # joriy natijalarni baseline ga yozish
+    python benchmarks/microbench.py -k to_dict       # faqat nomida 'to_dict' borlari
+    python benchmarks/microbench.py --tolerance 0.5  # 50% (+ shovqin) gacha sekinlashishga ruxsat
+
+Har bir benchmark bir necha raund bajariladi va raundlardagi bitta chaqiruv
+vaqtining medianasi olinadi; raundlar orasidagi tarqoqlik (nisbiy IQR) shovqin
+hisoblanadi. Benchmark baseline dan tolerance + NOISE_FACTOR * shovqin dan
+ko'proq sekin bo'lsa qayta o'lchanadi, shunda ham sekin bo'lsa skript 1 kodi
+bilan tugaydi. --save baseline ni SAVE_RUNS marta o'lchab yozadi, shovqin
+sifatida yugurishlar orasidagi tarqoqlik ham saqlanadi. Baseline
+mashinaga bog'liq: boshqa mashina yoki Python versiyasida yozilgan baseline
+bilan faqat hisobot beriladi.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+NOISE_FACTOR = 2
+MIN_ROUND_TIME = 0.02
+ROUNDS = 15
+RETRIES = 3
+SAVE_RUNS = 7
+
+ROOMS = 10
+COMPUTERS_PER_ROOM = 20
+MEDIA_FILES = 7
+
+
+def environment():
+    return {'python': platform.python_version(), 'system': platform.system(), 'machine': platform.machine()}
+
+
+def run_benchmark(function):
+    """Bitta chaqiruv vaqtining raundlar medianasi (soniya), nisbiy shovqin va
+    raund boshiga chaqiruvlar soni.
+
+    timeit kabi o'lchov paytida gc o'chiriladi - yig'ish pauzalari natijani buzmasin.
+    """
+    function()
+    gc.collect()
+    gc.disable()
+    try:
+        return _rounds(function)
+    finally:
+        gc.enable()
+
+
+def _quantile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _rounds(function):
+    iterations = 1
+    while True:
+        began = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        if time.perf_counter() - began >= MIN_ROUND_TIME:
+            break
+        iterations *= 2
+    times = []
+    for _ in range(ROUNDS):
+        began = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        times.append((time.perf_counter() - began) / iterations)
+    times.sort()
+    median = _quantile(times, 0.5)
+    return median, (_quantile(times, 0.75) - _quantile(times, 0.25)) / median, iterations
+
+
+def measure_baseline(function):
+    """SAVE_RUNS o'lchov medianalarining medianasi; shovqin - raundlar va
+    yugurishlar orasidagi tarqoqlikdan kattasi (ikkalasi ham nisbiy IQR)"""
+    runs = [run_benchmark(function) for _ in range(SAVE_RUNS)]
+    medians = sorted(median for median, _, _ in runs)
+    median = _quantile(medians, 0.5)
+    between = (_quantile(medians, 0.75) - _quantile(medians, 0.25)) / median
+    within = _quantile(sorted(noise for _, noise, _ in runs), 0.5)
+    return median, max(between, within), runs[-1][2]
+
+
+def build_fixture():
+    os.environ['DATABASE_URL'] = 'sqlite://'
+
+    from src.main import app
+    from src.models.user import User, db
+    from src.models.game_club import GameClub
+    from src.models.room import Room
+    from src.models.computer import Computer
+    from src.models.booking import Booking
+    from src.models.media_file import MediaFile
+
+    context = app.app_context()
+    context.push()
+
+    club = GameClub(name='Bench', address='Bench', phone='0')
+    db.session.add(club)
+    db.session.flush()
+    admin = User(full_name='Bench Admin', email='bench@gameport.uz', role='admin', game_club_id=club.id)
+    admin.set_password('bench-password')
+    db.session.add(admin)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    rooms = []
+    for index in range(ROOMS):
+        room = Room(name=f'Room {index}', computer_count=COMPUTERS_PER_ROOM, hourly_price=10000, game_club_id=club.id)
+        db.session.add(room)
+        db.session.flush()
+        rooms.append(room)
+        computers = [Computer(number=number, room_id=room.id) for number in range(1, COMPUTERS_PER_ROOM + 1)]
+        db.session.add_all(computers)
+        db.session.flush()
+        # Xonaning yarmi band, har bir kompyuterda o'tgan bronlar ham bor
+        for computer in computers:
+            for day in range(1, 6):
+                db.session.add(Booking(
+                    customer_username='history', start_time=now - timedelta(days=day),
+                    end_time=now - timedelta(days=day) + timedelta(hours=2), total_hours=2,
+                    total_price=20000, computer_id=computer.id, room_id=room.id, game_club_id=club.id,
+                    admin_id=admin.id, is_active=False, is_completed=True
+                ))
+            if computer.number % 2:
+                computer.is_available = False
+                db.session.add(Booking(
+                    customer_username='player', start_time=now - timedelta(hours=1),
+                    end_time=now + timedelta(hours=2), total_hours=3, total_price=30000,
+                    computer_id=computer.id, room_id=room.id, game_club_id=club.id, admin_id=admin.id
+                ))
+    for index in range(MEDIA_FILES):
+        db.session.add(MediaFile(
+            filename=f'{index}.jpg', original_filename=f'{index}.jpg', file_path=f'/tmp/{index}.jpg',
+            file_type='image', file_size=500000, mime_type='image/jpeg', game_club_id=club.id, uploaded_by=admin.id
+        ))
+    db.session.commit()
+    return app, db, club.id, admin.id, [room.id for room in rooms]
+
+
+def collect(app, db, club_id, admin_id, room_ids):
+    from flask import g
+    import jwt
+    from src.models.user import User
+    from src.models.game_club import GameClub
+    from src.models.room import Room
+    from src.models.booking import Booking
+    from src.routes.auth import issue_tokens, token_required
+    from src.routes.booking import booking_price
+    from src.routes.media import allowed_file, get_file_type
+    from src.services.queries import conflicting_booking_id
+
+    admin = db.session.get(User, admin_id)
+    club = db.session.get(GameClub, club_id)
+    room = db.session.get(Room, room_ids[0])
+    booking = Booking.query.filter_by(room_id=room.id, is_active=True).first()
+    access_token, _ = issue_tokens(admin)
+    legacy_token = jwt.encode(
+        {'user_id': admin.id, 'exp': datetime.utcnow() + timedelta(days=1)},
+        app.config['JWT_SECRET_KEY'], algorithm='HS256'
+    )
+    protected = token_required(lambda current_user: current_user)
+
+    def authenticate(token):
+        context = app.test_request_context(headers={'Authorization': f'Bearer {token}'})
+
+        def run():
+            with context:
+                g.pop('auth_cache', None)
+                return protected()
+        # Xatolik javobi emas, foydalanuvchi qaytishi kerak - aks holda xato yo'l o'lchanadi
+        assert not isinstance(run(), tuple), 'token tekshiruvi xatolik qaytardi'
+        return run
+
+    now = datetime.utcnow()
+    free_start, busy_start = now + timedelta(days=1), now
+    filenames = ['photo.JPG', 'clip.mp4', 'archive.tar.gz', 'noextension', 'banner.webp', 'movie.MOV']
+    assert conflicting_booking_id(booking.computer_id, busy_start, busy_start + timedelta(hours=2)) == booking.id
+    assert conflicting_booking_id(booking.computer_id, free_start, free_start + timedelta(hours=2)) is None
+    serve = app.view_functions['serve']
+
+    def serve_path(path):
+        def run():
+            with app.test_request_context(f'/{path}'):
+                serve(path).close()
+        return run
+
+    return {
+        'token_required.access': authenticate(access_token),
+        'token_required.legacy': authenticate(legacy_token),
+        'Booking.to_dict': booking.to_dict,
+        'Room.to_dict': room.to_dict,
+        'GameClub.to_dict': club.to_dict,
+        'conflict_check.free': lambda: conflicting_booking_id(booking.computer_id, free_start, free_start + timedelta(hours=2)),
+        'conflict_check.busy': lambda: conflicting_booking_id(booking.computer_id, busy_start, busy_start + timedelta(hours=2)),
+        'booking_price': lambda: [booking_price(room, club, hours) for hours in (1, 2, 3, 5)],
+        'allowed_file': lambda: [allowed_file(name, kind) for name in filenames for kind in ('image', 'video')],
+        'get_file_type': lambda: [get_file_type(name) for name in filenames],
+        'serve.static': serve_path('favicon.ico'),
+        'serve.spa_fallback': serve_path('dashboard/rooms')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='keyword', default=None, help='Faqat nomida shu so\'z borlarini bajarish')
+    parser.add_argument('--save', action='store_true', help='Natijalarni baseline fayliga yozish')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Shovqin qo\'shimchasisiz ruxsat etilgan sekinlashish ulushi (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    benchmarks = collect(*build_fixture())
+    if args.keyword:
+        benchmarks = {name: function for name, function in benchmarks.items() if args.keyword in name}
+
+    baseline = {}
+    baseline_noise = {}
+    comparable = False
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as stream:
+            saved = json.load(stream)
+        baseline = saved.get('results', {})
+        baseline_noise = saved.get('noise', {})
+        comparable = saved.get('environment') == environment()
+        if baseline and not comparable:
+            print(f"Baseline boshqa muhitda yozilgan ({saved.get('environment')}) - faqat hisobot beriladi")
+
+    results = {}
+    noises = {}
+    regressions = []
+    print('benchmark'.ljust(26) + 'vaqt'.rjust(12) + 'baseline'.rjust(12) + 'farq'.rjust(9) + 'chegara'.rjust(9) + 'raund'.rjust(9))
+    for name, function in benchmarks.items():
+        seconds, noise, iterations = (measure_baseline if args.save else run_benchmark)(function)
+        previous = baseline.get(name)
+
+        def threshold():
+            # Shovqinli benchmark uchun chegara uning raundlar tarqoqligiga qarab kengayadi
+            return args.tolerance + NOISE_FACTOR * max(noise, baseline_noise.get(name, 0.0))
+
+        # Tasodifiy shovqinni ajratish uchun sekinlashgan benchmark qayta o'lchanadi
+        for _ in range(RETRIES):
+            if args.save or not (comparable and previous and seconds * 1e6 / previous - 1 > threshold()):
+                break
+            retry_seconds, retry_noise, _ = run_benchmark(function)
+            if retry_seconds < seconds:
+                seconds, noise = retry_seconds, retry_noise
+        results[name] = round(seconds * 1e6, 3)
+        noises[name] = round(noise, 3)
+        change = ''
+        if previous:
+            ratio = results[name] / previous - 1
+            change = f'{ratio * 100:+.0f}%'
+            if comparable and not args.save and ratio > threshold():
+                regressions.append(name)
+                change += ' !'
+        previous_text = f'{previous:.1f} us' if previous else '-'
+        limit_text = f'{threshold() * 100:.0f}%'
+        print(f'{name:<26}{results[name]:>9.1f} us{previous_text:>12}{change:>9}{limit_text:>9}{iterations:>9}')
+
+    if args.save:
+        merged = dict(baseline if comparable else {}, **results)
+        merged_noise = dict(baseline_noise if comparable else {}, **noises)
+        with open(args.baseline, 'w') as stream:
+            json.dump({'environment': environment(), 'results': merged, 'noise': merged_noise}, stream, indent=2, sort_keys=True)
+            stream.write('\n')
+        print(f'Baseline yozildi: {args.baseline}')
+        return 0
+    if regressions:
+        print(f"Sekinlashgan (chegaradan ko'p): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
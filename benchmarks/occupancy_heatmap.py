@@ -0,0 +1,99 @@
+"""Bandlik issiqlik xaritasi benchmarki.
+
+Ishga tushirish (repo ildizidan):
+
+    python benchmarks/occupancy_heatmap.py --seats 200 --days 365
+
+Vaqtinchalik bazada bitta klub uchun bronlar yaratiladi va yillik tahlil
+vaqti o'lchanadi.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seats', type=int, default=200)
+    parser.add_argument('--rooms', type=int, default=5)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--per-seat-day', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix='gameport-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+
+    from src.main import app
+    from src.models.user import User, db
+    from src.models.game_club import GameClub
+    from src.models.room import Room
+    from src.models.computer import Computer
+    from src.models.booking import Booking
+    from src.services.analytics import occupancy_heatmap
+    from sqlalchemy import insert
+
+    random.seed(1)
+    end = datetime(2026, 1, 1)
+    start = end - timedelta(days=args.days)
+
+    with app.app_context():
+        admin = User.query.filter_by(role='superadmin').first()
+        club = GameClub(name='Bench', address='Bench', phone='0')
+        db.session.add(club)
+        db.session.flush()
+        per_room = args.seats // args.rooms
+        computers = []
+        for index in range(args.rooms):
+            room = Room(name=f'Room {index}', computer_count=per_room, hourly_price=10000, game_club_id=club.id)
+            db.session.add(room)
+            db.session.flush()
+            for number in range(1, per_room + 1):
+                computer = Computer(number=number, room_id=room.id)
+                db.session.add(computer)
+                computers.append(computer)
+        db.session.flush()
+
+        rows = []
+        for day in range(args.days):
+            base = start + timedelta(days=day)
+            for computer in computers:
+                for _ in range(args.per_seat_day):
+                    begin = base + timedelta(minutes=random.randrange(1440))
+                    hours = random.choice((1, 2, 3))
+                    rows.append({
+                        'customer_username': 'bench',
+                        'start_time': begin,
+                        'end_time': begin + timedelta(hours=hours),
+                        'total_hours': hours,
+                        'total_price': hours * 10000,
+                        'game_club_id': club.id,
+                        'room_id': computer.room_id,
+                        'computer_id': computer.id,
+                        'admin_id': admin.id,
+                        'is_active': False,
+                        'is_completed': True
+                    })
+        for offset in range(0, len(rows), 50000):
+            db.session.execute(insert(Booking), rows[offset:offset + 50000])
+        db.session.commit()
+        print(f'{len(rows)} ta bron, {args.seats} ta kompyuter, {args.days} kun')
+
+        timings = []
+        for _ in range(args.repeat):
+            began = time.perf_counter()
+            occupancy_heatmap(club.id, start, end, 'hour')
+            timings.append(time.perf_counter() - began)
+        print(f'occupancy_heatmap: eng yaxshi {min(timings) * 1000:.1f} ms, '
+              f'o\'rtacha {sum(timings) / len(timings) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
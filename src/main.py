@@ -5,12 +5,30 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from src.models.user import db
 from src.models.game_club import GameClub
 from src.models.room import Room
 from src.models.computer import Computer
 from src.models.booking import Booking
+from src.models.booking_archive import BookingArchive
 from src.models.media_file import MediaFile
+from src.models.revoked_token import RevokedToken
+from src.models.live_event import LiveEvent
+from src.models.cache_version import CacheVersion
+from src.models.club_counter import ClubCounter
+from src.models.computer_presence import ComputerPresence, ComputerStateChange
+from src.services.geo import init_geo_index
+from src.services.events import bus
+from src.services.status_board import board
+from src.services.invalidation import bus as invalidation
+from src.services.statistics import statistics
+from src.services.sharding import router as shards
+from src.services.backup import backups
+from src.services.heartbeat import heartbeats
+from src.services.concurrency import limiter
+from src.services.tracing import tracer
+from src.services.slow_queries import slow_queries
 
 # Routes import
 from src.routes.auth import auth_bp
@@ -18,6 +36,7 @@ from src.routes.admin import admin_bp
 from src.routes.game_club import game_club_bp
 from src.routes.booking import booking_bp
 from src.routes.media import media_bp
+from src.routes.batch import batch_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'gameport_secret_key_2024'
@@ -32,18 +51,117 @@ app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(game_club_bp, url_prefix='/api/game-club')
 app.register_blueprint(booking_bp, url_prefix='/api/booking')
 app.register_blueprint(media_bp, url_prefix='/api/media')
+app.register_blueprint(batch_bp, url_prefix='/api/batch')
 
 # Ma'lumotlar bazasi sozlamalari
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
 
+# Parol xeshlash (jarayon puli) va login cheklovlari
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['LOGIN_IP_LIMIT'] = 20     # oynada bitta IP dan (mijoz IP si X-Forwarded-For dan, TRUSTED_PROXY_COUNT)
+app.config['LOGIN_EMAIL_LIMIT'] = 5   # oynada bitta email uchun
+app.config['LOGIN_RATE_WINDOW'] = 60  # soniya
+# Ilova oldidagi ishonchli proksilar soni (Heroku router yoki load balancer - 1, to'g'ridan-to'g'ri - 0).
+# Aks holda barcha mijozlar proksi IP sida bitta login cheklovini bo'lishadi
+app.config['TRUSTED_PROXY_COUNT'] = int(os.environ.get('TRUSTED_PROXY_COUNT', 1))
+
+# JWT muddatlari va bekor qilingan tokenlar ro'yxatini yangilash oralig'i
+app.config['ACCESS_TOKEN_MINUTES'] = 15
+app.config['REFRESH_TOKEN_DAYS'] = 7
+app.config['TOKEN_REVOCATION_REFRESH'] = 2  # soniya
+
+# Jonli hodisalar (SSE) jadvalini so'rash oralig'i va saqlash muddati
+app.config['LIVE_EVENTS_POLL_INTERVAL'] = 0.5  # soniya
+app.config['LIVE_EVENTS_RETENTION'] = 300      # soniya
+
+# Umumiy xotiradagi holat jadvali (slotlar soni = maksimal kompyuter id)
+app.config['STATUS_BOARD_ENABLED'] = True
+app.config['STATUS_BOARD_CAPACITY'] = 65536
+
+# Keshlarni bekor qilish jadvalini so'rash oralig'i
+app.config['CACHE_BUS_POLL_INTERVAL'] = 0.5  # soniya
+
+# Statistika hisoblagichlari (o'chirilsa - har so'rovda bitta agregat so'rov)
+app.config['STATS_COUNTERS_ENABLED'] = True
+
+# Bandlik tahlili kataklari uchun mahalliy vaqt farqi (Toshkent, UTC+5)
+app.config['ANALYTICS_TZ_OFFSET'] = 300  # daqiqa
+
+# Bronlarning oylik ustunli eksporti (superadmin hisobotlari uchun)
+app.config['ANALYTICS_EXPORT_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'analytics')
+app.config['ANALYTICS_EXPORT_MAX_AGE'] = 3600  # soniya, eskirgan bo'lsa jonli so'rov
+
+# Tugaganiga shuncha kun bo'lgan bronlar arxiv jadvaliga ko'chiriladi (kamida 31)
+app.config['BOOKING_ARCHIVE_AFTER_DAYS'] = 90
+app.config['BOOKING_ARCHIVE_BATCH_SIZE'] = 500
+
+# Klub jadvallarini alohida SQLite fayllarga bo'lish: None (o'chiq), 'club' yoki 'fixed'
+app.config['SHARD_MODE'] = os.environ.get('SHARD_MODE') or None
+app.config['SHARD_COUNT'] = 8    # 'fixed' rejimida fayllar soni
+app.config['SHARD_WORKERS'] = 4  # superadmin so'rovlari uchun fan-out oqimlari
+
+# SQLite jurnal rejimi: WAL da o'quvchilar (zaxira ham) yozuvchilarni to'smaydi
+app.config['SQLITE_JOURNAL_MODE'] = 'wal'
+app.config['SQLITE_WAL_AUTOCHECKPOINT'] = 1000  # sahifa
+
+# Onlayn zaxira nusxalar (SQLite backup API, kichik qadamlar bilan)
+app.config['BACKUP_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'backups')
+app.config['BACKUP_PAGES'] = 256            # bitta qadamdagi sahifalar
+app.config['BACKUP_SLEEP'] = 0.005          # qadamlar orasidagi pauza, soniya
+app.config['BACKUP_KEEP'] = 7               # saqlanadigan nusxalar soni
+app.config['BACKUP_CHECKPOINT_MODE'] = 'PASSIVE'
+
+# Kompyuter heartbeat lari: xotiradagi bufer oraliq bilan bazaga yoziladi
+app.config['HEARTBEAT_BUFFER_CAPACITY'] = 65536
+app.config['HEARTBEAT_FLUSH_INTERVAL'] = 2       # soniya
+app.config['HEARTBEAT_OFFLINE_AFTER'] = 30       # soniya, heartbeat kelmasa offline
+app.config['HEARTBEAT_RECONCILE_INTERVAL'] = 30  # soniya
+app.config['HEARTBEAT_FIX_AVAILABILITY'] = False  # is_available ni bronlar bo'yicha tuzatish (faqat hisobot)
+
+# Endpoint lar parallelligi: ishchi oqimlari soni va boshlang'ich chegara (AIMD bilan moslashadi).
+# Sig'im bitta gunicorn ishchisining oqimlari soni (Procfile: -k gthread --threads $GUNICORN_THREADS)
+app.config['CONCURRENCY_ENABLED'] = True
+app.config['CONCURRENCY_CAPACITY'] = int(os.environ.get('GUNICORN_THREADS', 16))
+app.config['CONCURRENCY_INITIAL_LIMIT'] = 8
+app.config['CONCURRENCY_ROUTE_CLASSES'] = {}  # {'endpoint' yoki 'endpoint@rol': 'critical'|'normal'|'heavy'|'exempt'}
+
+# So'rovlar tracing i: namuna ulushi va eksport (jsonl yoki otlp)
+app.config['TRACE_ENABLED'] = True
+app.config['TRACE_SAMPLE_RATE'] = 0.01
+app.config['TRACE_EXPORT_PATH'] = os.path.join(os.path.dirname(__file__), 'database', 'traces', 'traces.jsonl')
+app.config['TRACE_EXPORT_FORMAT'] = 'jsonl'
+app.config['TRACE_WINDOW'] = 10000  # eng sekin 1% shu so'rovlar orasidan
+
+# Sekin SQL so'rovlari jurnali (EXPLAIN QUERY PLAN bilan)
+app.config['SLOW_QUERY_ENABLED'] = True
+app.config['SLOW_QUERY_THRESHOLD_MS'] = 100
+app.config['SLOW_QUERY_LOG_PATH'] = os.path.join(os.path.dirname(__file__), 'database', 'slow_queries', 'slow_queries.jsonl')
+
+# Mijoz IP si (request.remote_addr) ishonchli proksilar qo'shgan X-Forwarded-For dan
+if app.config['TRUSTED_PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
 # Upload papkasini yaratish
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 db.init_app(app)
+shards.init_app(app, db)
+backups.init_app(app, db)
+bus.init_app(app)
+heartbeats.init_app(app)
+tracer.init_app(app, db)
+slow_queries.init_app(app)
+limiter.init_app(app)
+invalidation.init_app(app)
 with app.app_context():
     db.create_all()
+    init_geo_index()
     
     # Superadmin yaratish (agar mavjud bo'lmasa)
     from src.models.user import User
@@ -59,6 +177,10 @@ with app.app_context():
         db.session.commit()
         print("Superadmin yaratildi: superadmin@gameport.uz / admin123")
 
+# Kompyuterlar holati jadvali (ishchilar uchun umumiy xotira)
+board.init_app(app)
+statistics.init_app(app)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
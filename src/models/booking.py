@@ -1,4 +1,6 @@
 from src.models.user import db
+from sqlalchemy import and_
+from sqlalchemy.ext.hybrid import hybrid_method
 from datetime import datetime
 
 class Booking(db.Model):
@@ -28,6 +30,17 @@ class Booking(db.Model):
     def __repr__(self):
         return f'<Booking {self.customer_username} - Computer {self.computer_id}>'
 
+    @hybrid_method
+    def in_progress(self, now):
+        """Kompyuterni band qiladigan bron: faol va hozir davom etayotgan.
+        Kelajakdagi bron kompyuterni boshlanish vaqtigacha band qilmaydi"""
+        # is_active flush gacha None (standart qiymat) - yangi bron faol
+        return self.is_active is not False and self.start_time <= now < self.end_time
+
+    @in_progress.expression
+    def in_progress(cls, now):
+        return and_(cls.is_active == True, cls.start_time <= now, cls.end_time > now)
+
     def to_dict(self):
         return {
             'id': self.id,
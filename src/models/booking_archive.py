@@ -0,0 +1,36 @@
+from src.models.user import db
+from src.models.booking import Booking
+from datetime import datetime
+
+class BookingArchive(db.Model):
+    """Eski (yakunlangan) bronlar - asosiy jadvaldan ko'chirilgan"""
+    __table_args__ = (
+        db.Index('ix_booking_archive_club_created', 'game_club_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # asl bron id
+    customer_username = db.Column(db.String(100), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    total_hours = db.Column(db.Float, nullable=False)
+    total_price = db.Column(db.Integer, nullable=False)
+    game_club_id = db.Column(db.Integer, db.ForeignKey('game_club.id'), nullable=False)
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'), nullable=False)
+    computer_id = db.Column(db.Integer, db.ForeignKey('computer.id'), nullable=False)
+    admin_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    is_active = db.Column(db.Boolean, default=False)
+    is_completed = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relationships (faqat o'qish uchun)
+    game_club = db.relationship('GameClub', viewonly=True)
+    room = db.relationship('Room', viewonly=True)
+    computer = db.relationship('Computer', viewonly=True)
+    admin = db.relationship('User', viewonly=True)
+
+    # Javob shakli asosiy bron bilan bir xil
+    to_dict = Booking.to_dict
+
+    def __repr__(self):
+        return f'<BookingArchive {self.customer_username} - Computer {self.computer_id}>'
@@ -0,0 +1,11 @@
+from src.models.user import db
+
+class CacheVersion(db.Model):
+    """Entity versiyalari - ishchilar keshlarini bekor qilish uchun"""
+    entity = db.Column(db.String(50), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    seq = db.Column(db.Integer, nullable=False, index=True)  # global o'suvchi tartib raqami
+
+    def __repr__(self):
+        return f'<CacheVersion {self.entity}:{self.entity_id} v{self.version}>'
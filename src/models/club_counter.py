@@ -0,0 +1,10 @@
+from src.models.user import db
+
+class ClubCounter(db.Model):
+    """Klub bo'yicha hisoblagichlar - statistika uchun (holat o'zgarishida yangilanadi)"""
+    game_club_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0 - xizmat yozuvlari
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ClubCounter {self.game_club_id}:{self.name}={self.value}>'
@@ -15,8 +15,11 @@ class Computer(db.Model):
     def __repr__(self):
         return f'<Computer {self.number} in Room {self.room_id}>'
 
-    def to_dict(self):
-        current_booking = self.get_current_booking()
+    def to_dict(self, current_bookings=None):
+        if current_bookings is None:
+            current_booking = self.get_current_booking()
+        else:
+            current_booking = current_bookings.get(self.id)
         return {
             'id': self.id,
             'number': self.number,
@@ -37,6 +40,33 @@ class Computer(db.Model):
             Booking.end_time > datetime.utcnow()
         ).first()
 
+    @staticmethod
+    def get_current_bookings(computer_ids):
+        """Bir nechta kompyuterning hozirgi bronlari (bitta so'rov)"""
+        from src.models.booking import Booking
+        from src.services.status_board import board
+        if not computer_ids:
+            return {}
+        
+        # Umumiy holat jadvalidan; unda yo'q kompyuterlar bazadan tekshiriladi
+        statuses = board.statuses(computer_ids)
+        booking_ids = [booking_id for busy, booking_id in statuses.values() if busy]
+        unknown_ids = [computer_id for computer_id in computer_ids if computer_id not in statuses]
+        
+        current = {}
+        if booking_ids:
+            for booking in Booking.query.filter(Booking.id.in_(booking_ids)).all():
+                current[booking.computer_id] = booking
+        if unknown_ids:
+            now = datetime.utcnow()
+            bookings = Booking.query.filter(
+                Booking.computer_id.in_(unknown_ids),
+                Booking.in_progress(now)
+            ).order_by(Booking.id).all()
+            for booking in bookings:
+                current.setdefault(booking.computer_id, booking)
+        return current
+
     def book(self, customer_username, start_time, end_time):
         """Kompyuterni bron qilish"""
         if not self.is_available:
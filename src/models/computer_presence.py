@@ -0,0 +1,40 @@
+from src.models.user import db
+from datetime import datetime
+
+class ComputerPresence(db.Model):
+    """Kompyuterning oxirgi heartbeat holati (har kompyuterga bitta qator)"""
+    game_club_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    computer_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    state = db.Column(db.String(10), nullable=False)  # session, idle, offline
+    state_since = db.Column(db.DateTime, nullable=False)
+    last_seen = db.Column(db.DateTime, nullable=False)
+    heartbeats = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ComputerPresence {self.computer_id}: {self.state}>'
+
+    def to_dict(self):
+        return {
+            'computer_id': self.computer_id,
+            'state': self.state,
+            'state_since': self.state_since.isoformat() if self.state_since else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
+
+
+class ComputerStateChange(db.Model):
+    """Kompyuter holati o'zgarishlari jurnali"""
+    __table_args__ = (
+        db.Index('ix_computer_state_change_club_changed', 'game_club_id', 'changed_at'),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    game_club_id = db.Column(db.Integer, nullable=False)
+    computer_id = db.Column(db.Integer, nullable=False)
+    from_state = db.Column(db.String(10))  # birinchi heartbeat da None
+    to_state = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<ComputerStateChange {self.computer_id}: {self.from_state} -> {self.to_state}>'
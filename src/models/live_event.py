@@ -0,0 +1,16 @@
+from src.models.user import db
+from datetime import datetime
+
+class LiveEvent(db.Model):
+    """Ishchilar orasida tarqatiladigan jonli hodisalar jurnali"""
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    game_club_id = db.Column(db.Integer, nullable=False, index=True)
+    type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    origin = db.Column(db.String(100), nullable=False)  # yozgan ishchi
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<LiveEvent {self.type} - Club {self.game_club_id}>'
@@ -37,7 +37,7 @@ class MediaFile(db.Model):
             'uploader_name': self.uploader.full_name if self.uploader else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'is_active': self.is_active,
-            'url': f'/api/media/{self.id}'
+            'url': f'/api/media/{self.id}?club_id={self.game_club_id}'
         }
 
     def delete_file(self):
@@ -0,0 +1,15 @@
+from src.models.user import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    # jti bo'lsa - bitta token, bo'lmasa - foydalanuvchining created_at dan oldingi barcha tokenlari
+    jti = db.Column(db.String(36), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti or "user"} - User {self.user_id}>'
@@ -25,6 +25,9 @@ class Room(db.Model):
         return f'<Room {self.name}>'
 
     def to_dict(self):
+        from src.models.computer import Computer
+        computers = [comp for comp in self.computers if comp.is_active]
+        current_bookings = Computer.get_current_bookings([comp.id for comp in computers])
         return {
             'id': self.id,
             'name': self.name,
@@ -37,8 +40,8 @@ class Room(db.Model):
             'game_club_id': self.game_club_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'is_active': self.is_active,
-            'computers': [comp.to_dict() for comp in self.computers] if self.computers else [],
-            'available_computers': len([comp for comp in self.computers if comp.is_available]) if self.computers else 0
+            'computers': [comp.to_dict(current_bookings) for comp in computers],
+            'available_computers': len([comp for comp in computers if comp.id not in current_bookings])
         }
 
     def get_available_computers(self):
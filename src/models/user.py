@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.services.hashing import hash_password, verify_password, needs_rehash
+from src.services.sharding import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -20,10 +21,14 @@ class User(db.Model):
     game_club = db.relationship('GameClub', backref='admin', uselist=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Parol eski usul yoki narx bilan xeshlanganmi?"""
+        return needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.email}>'
@@ -1,13 +1,27 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from src.models.user import User, db
 from src.models.game_club import GameClub
 from src.models.booking import Booking
 from src.routes.auth import token_required, superadmin_required
-from sqlalchemy import func
+from src.services.revocation import revocations
+from src.services.onboarding import detect_format, iter_rows, import_admins, DEFAULT_BATCH_SIZE
+from src.services.columnar import GROUP_KEYS, SUM_FIELDS, get_store, fresh_store
+from src.services.analytics import parse_utc
+from src.services.sharding import club_scope, fan_out, router as shards
+from src.services.backup import BackupError, CHECKPOINT_MODES, backups
+from src.services.concurrency import limiter
+from src.services.tracing import tracer
+from src.services.slow_queries import slow_queries
+from src.services.listing import user_dicts
+from sqlalchemy import func, select
 from datetime import datetime, timedelta
+import click
+import os
 
 admin_bp = Blueprint('admin', __name__)
 
+SLOW_QUERY_ORDERS = ('total_ms', 'count', 'avg_ms', 'p95_ms', 'max_ms')
+
 @admin_bp.route('/list', methods=['GET'])
 @token_required
 @superadmin_required
@@ -18,20 +32,21 @@ def get_admins(current_user):
         per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         
-        query = User.query.filter_by(role='admin')
+        query = select(User.id).where(User.role == 'admin')
         
         if search:
-            query = query.filter(
+            query = query.where(
                 (User.full_name.contains(search)) |
                 (User.email.contains(search))
             )
         
-        admins = query.paginate(
-            page=page, per_page=per_page, error_out=False
+        # Sahifadagi id lar Flask-SQLAlchemy paginate bilan, qatorlar Core orqali
+        admins = db.paginate(
+            query, page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'admins': [admin.to_dict() for admin in admins.items],
+            'admins': user_dicts(admins.items),
             'total': admins.total,
             'pages': admins.pages,
             'current_page': page,
@@ -93,6 +108,52 @@ def create_admin(current_user):
         db.session.rollback()
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@admin_bp.route('/import', methods=['POST'])
+@token_required
+@superadmin_required
+def import_admins_file(current_user):
+    """Klub va adminlarni CSV/NDJSON dan ommaviy yaratish (faqat superadmin)"""
+    try:
+        batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+        
+        if 'file' in request.files:
+            upload = request.files['file']
+            fmt = request.args.get('format') or detect_format(upload.filename, upload.mimetype)
+            stream = upload.stream
+        else:
+            fmt = request.args.get('format') or detect_format(mimetype=request.mimetype)
+            stream = request.stream
+        
+        if fmt not in ('csv', 'ndjson'):
+            return jsonify({'message': 'Format csv yoki ndjson bo\'lishi kerak'}), 400
+        
+        report = import_admins(iter_rows(stream, fmt), batch_size=max(1, batch_size))
+        
+        return jsonify({
+            'message': f'{report.created} ta admin yaratildi, {report.failed} ta qator xato',
+            'report': report.to_dict()
+        }), 200
+        
+    except UnicodeDecodeError:
+        return jsonify({'message': 'Fayl UTF-8 formatida bo\'lishi kerak'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@admin_bp.cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None)
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True)
+def import_admins_command(path, fmt, batch_size):
+    """Klub va adminlarni CSV/NDJSON fayldan yaratish"""
+    with open(path, 'rb') as stream:
+        report = import_admins(iter_rows(stream, fmt or detect_format(path)), batch_size=max(1, batch_size))
+    
+    click.echo(f'Jami: {report.total}, yaratildi: {report.created}, xato: {report.failed}')
+    for error in report.errors:
+        email = f" ({error['email']})" if error['email'] else ''
+        click.echo(f"  {error['line']}-qator{email}: {error['message']}", err=True)
+
 @admin_bp.route('/<int:admin_id>', methods=['GET'])
 @token_required
 @superadmin_required
@@ -142,6 +203,10 @@ def update_admin(current_user, admin_id):
         if data.get('password'):
             admin.set_password(data['password'])
         
+        # Parol o'zgarsa yoki admin o'chirilsa, mavjud tokenlar bekor qilinadi
+        if data.get('password') or ('is_active' in data and not data['is_active']):
+            revocations.revoke_user(admin.id)
+        
         # Game club ma'lumotlarini yangilash
         if admin.game_club and data.get('game_club'):
             club_data = data['game_club']
@@ -159,6 +224,7 @@ def update_admin(current_user, admin_id):
                 admin.game_club.longitude = club_data['longitude']
         
         db.session.commit()
+        revocations.refresh(force=True)
         
         return jsonify({
             'message': 'Admin muvaffaqiyatli yangilandi',
@@ -181,8 +247,11 @@ def delete_admin(current_user, admin_id):
             return jsonify({'message': 'Admin topilmadi'}), 404
         
         # Game club ham o'chiriladi (cascade)
-        db.session.delete(admin)
-        db.session.commit()
+        revocations.revoke_user(admin.id)
+        with club_scope(admin.game_club_id):
+            db.session.delete(admin)
+            db.session.commit()
+        revocations.refresh(force=True)
         
         return jsonify({'message': 'Admin muvaffaqiyatli o\'chirildi'}), 200
         
@@ -190,6 +259,33 @@ def delete_admin(current_user, admin_id):
         db.session.rollback()
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+def _live_rollups(current_month, since):
+    """Bron jadvalidan: oylik tushum va eng faol 5 ta klub"""
+    # Oylik tushum (barcha klublar)
+    monthly_revenue = db.session.query(func.sum(Booking.total_price)).filter(
+        Booking.created_at >= current_month,
+        Booking.is_completed == True
+    ).scalar() or 0
+    
+    # Eng faol klublar (oxirgi 30 kun)
+    top_clubs = [
+        {
+            'name': club.name,
+            'bookings_count': club.bookings_count,
+            'revenue': club.revenue or 0
+        }
+        for club in db.session.query(
+            GameClub.name,
+            func.count(Booking.id).label('bookings_count'),
+            func.sum(Booking.total_price).label('revenue')
+        ).join(Booking).filter(
+            Booking.created_at >= since
+        ).group_by(GameClub.id).order_by(
+            func.count(Booking.id).desc()
+        ).limit(5).all()
+    ]
+    return monthly_revenue, top_clubs
+
 @admin_bp.route('/statistics', methods=['GET'])
 @token_required
 @superadmin_required
@@ -200,39 +296,246 @@ def get_admin_statistics(current_user):
         total_admins = User.query.filter_by(role='admin').count()
         active_admins = User.query.filter_by(role='admin', is_active=True).count()
         
-        # Oylik tushum (barcha klublar)
-        current_month = datetime.now().replace(day=1)
-        monthly_revenue = db.session.query(func.sum(Booking.total_price)).filter(
-            Booking.created_at >= current_month,
-            Booking.is_completed == True
-        ).scalar() or 0
-        
-        # Eng faol klublar (oxirgi 30 kun)
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        top_clubs = db.session.query(
-            GameClub.name,
-            func.count(Booking.id).label('bookings_count'),
-            func.sum(Booking.total_price).label('revenue')
-        ).join(Booking).filter(
-            Booking.created_at >= thirty_days_ago
-        ).group_by(GameClub.id).order_by(
-            func.count(Booking.id).desc()
-        ).limit(5).all()
+        # Ustunli eksport vaqtlari UTC da - oy boshi UTC yarim tunidan
+        now = datetime.utcnow()
+        current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        thirty_days_ago = now - timedelta(days=30)
+        
+        store = fresh_store()
+        if store:
+            # Ustunli eksportdan - bron jadvaliga tegmaydi
+            monthly_revenue = int(sum(
+                group['total_price']
+                for group in store.group_sum('game_club_id', start=current_month, completed=True).values()
+            ))
+            ranked = store.top_k('game_club_id', k=None, start=thirty_days_ago)
+            names = dict(db.session.query(GameClub.id, GameClub.name).filter(
+                GameClub.id.in_([club_id for club_id, _ in ranked])
+            ).all()) if ranked else {}
+            top_clubs = [
+                {
+                    'name': names[club_id],
+                    'bookings_count': group['count'],
+                    'revenue': int(group['total_price'])
+                }
+                for club_id, group in ranked if club_id in names
+            ][:5]
+        else:
+            # Shard rejimida har bir shard alohida hisoblanib birlashtiriladi
+            parts = fan_out(lambda: _live_rollups(current_month, thirty_days_ago))
+            monthly_revenue = sum(revenue for revenue, _ in parts)
+            top_clubs = sorted(
+                (club for _, clubs in parts for club in clubs),
+                key=lambda club: club['bookings_count'], reverse=True
+            )[:5]
         
         return jsonify({
             'total_admins': total_admins,
             'active_admins': active_admins,
             'monthly_revenue': monthly_revenue,
-            'top_clubs': [
-                {
-                    'name': club.name,
-                    'bookings_count': club.bookings_count,
-                    'revenue': club.revenue or 0
-                }
-                for club in top_clubs
-            ]
+            'top_clubs': top_clubs
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@admin_bp.route('/analytics/bookings', methods=['GET'])
+@token_required
+@superadmin_required
+def get_booking_analytics(current_user):
+    """Ustunli eksport bo'yicha guruhlash / yig'indi / top-k"""
+    try:
+        group_by = request.args.get('group_by', 'game_club_id')
+        order_by = request.args.get('order_by', 'count')
+        top = max(1, min(request.args.get('top', 10, type=int), 1000))
+        completed = request.args.get('completed')
+        
+        if group_by not in GROUP_KEYS:
+            return jsonify({'message': f'group_by quyidagilardan biri: {", ".join(GROUP_KEYS)}'}), 400
+        if order_by not in ('count', *SUM_FIELDS):
+            return jsonify({'message': f'order_by quyidagilardan biri: count, {", ".join(SUM_FIELDS)}'}), 400
+        
+        try:
+            start = parse_utc(request.args['from']) if request.args.get('from') else None
+            end = parse_utc(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify({'message': 'from va to ISO formatda bo\'lishi kerak'}), 400
+        
+        store = get_store()
+        exported_at = store.exported_at()
+        if exported_at is None:
+            return jsonify({'message': 'Eksport topilmadi (flask admin export-bookings)'}), 404
+        
+        ranked = store.top_k(
+            group_by, k=top, by=order_by, start=start, end=end,
+            completed=None if completed is None else completed.lower() in ('1', 'true', 'yes')
+        )
+        
+        return jsonify({
+            'exported_at': datetime.utcfromtimestamp(exported_at).isoformat(),
+            'months': store.months(),
+            'group_by': group_by,
+            'groups': [dict(group, key=key) for key, group in ranked]
         }), 200
         
     except Exception as e:
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@admin_bp.cli.command('export-bookings')
+@click.option('--months', default=2, show_default=True, help='Joriy oydan boshlab nechta oy')
+@click.option('--all', 'export_all', is_flag=True, help='Bazadagi barcha oylar')
+def export_bookings_command(months, export_all):
+    """Bronlarni oylik ustunli fayllarga eksport qilish"""
+    store = get_store()
+    exported = store.export(None if export_all else store.recent_months(max(1, months)))
+    for month, rows in exported.items():
+        click.echo(f'{month}: {rows} ta bron')
+
+@admin_bp.cli.command('shard-migrate')
+def shard_migrate_command():
+    """Markaziy bazadagi xona/kompyuter/bron/media jadvallarini shard fayllarga ko'chirish"""
+    if not shards.enabled:
+        click.echo('SHARD_MODE o\'rnatilmagan')
+        return
+    for table, rows in shards.migrate(db.engine).items():
+        click.echo(f'{table}: {rows} ta qator')
+
+@admin_bp.route('/backups', methods=['GET'])
+@token_required
+@superadmin_required
+def get_backups(current_user):
+    """Zaxira nusxalar ro'yxati va oxirgi ishga tushirish hisoboti"""
+    try:
+        return jsonify({
+            'running': backups.running,
+            'last_report': backups.last_report,
+            'backups': backups.snapshots()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@admin_bp.route('/backups', methods=['POST'])
+@token_required
+@superadmin_required
+def create_backup(current_user):
+    """Zaxira nusxani fon rejimida boshlash"""
+    try:
+        if not backups.available:
+            return jsonify({'message': 'Zaxira fayldagi SQLite bazani talab qiladi'}), 400
+        if not backups.start(current_app._get_current_object()):
+            return jsonify({'message': 'Zaxira allaqachon olinmoqda'}), 409
+        
+        return jsonify({'message': 'Zaxira boshlandi'}), 202
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@admin_bp.route('/concurrency', methods=['GET'])
+@token_required
+@superadmin_required
+def get_concurrency(current_user):
+    """Endpoint lar parallellik chegaralari, navbat vaqti va rad etilganlar (shu ishchi)"""
+    try:
+        return jsonify(limiter.metrics()), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@admin_bp.route('/traces/slowest', methods=['GET'])
+@token_required
+@superadmin_required
+def get_slowest_traces(current_user):
+    """Oxirgi so'rovlarning eng sekin 1% i span lari bilan (shu ishchi)"""
+    try:
+        if not tracer.enabled:
+            return jsonify({'message': 'Tracing o\'chirilgan'}), 400
+        threshold, traces = tracer.slow.slowest()
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        
+        return jsonify({
+            'p99_ms': round(threshold * 1000, 3),
+            'traces': [trace.to_dict() for trace in traces[:limit]]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@token_required
+@superadmin_required
+def get_slow_queries(current_user):
+    """Sekin / to'liq o'qiydigan so'rovlar fingerprint bo'yicha"""
+    try:
+        if not slow_queries.enabled:
+            return jsonify({'message': 'Sekin so\'rovlar jurnali o\'chirilgan'}), 400
+        order_by = request.args.get('order_by', 'total_ms')
+        if order_by not in SLOW_QUERY_ORDERS:
+            return jsonify({'message': f'order_by quyidagilardan biri: {", ".join(SLOW_QUERY_ORDERS)}'}), 400
+        
+        return jsonify({
+            'threshold_ms': round(slow_queries.threshold * 1000, 3),
+            'queries': slow_queries.summary(
+                hours=request.args.get('hours', type=float),
+                top=max(1, min(request.args.get('top', 20, type=int), 200)),
+                order_by=order_by
+            )
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@admin_bp.cli.command('backup')
+def backup_command():
+    """Bazaning onlayn zaxira nusxasini olish (yozuvchilarni to'xtatmasdan)"""
+    try:
+        report = backups.run()
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{report['name']}: {report['duration_seconds']} s, tekshiruv {report['verify_seconds']} s")
+    for name, stats in report['files'].items():
+        click.echo(
+            f"  {name}: {stats['pages']} sahifa, {stats['steps']} qadam, "
+            f"{stats['restarts']} qayta boshlash, eng uzun qadam {stats['max_step_ms']} ms"
+        )
+    for phase, latency in report['write_latency'].items():
+        if latency:
+            click.echo(f"  yozuvchi kechikishi ({phase}): p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, max {latency['max_ms']} ms")
+    if report['removed']:
+        click.echo(f"  o'chirildi: {', '.join(report['removed'])}")
+
+@admin_bp.cli.command('checkpoint')
+@click.option('--mode', type=click.Choice(CHECKPOINT_MODES, case_sensitive=False), default=None,
+              help='Standart: BACKUP_CHECKPOINT_MODE')
+def checkpoint_command(mode):
+    """WAL faylini asosiy bazaga ko'chirish"""
+    result = backups.checkpoint(mode)
+    click.echo(f"{result['mode']}: {result['checkpointed']}/{result['log']} sahifa, busy={result['busy']}")
+
+@admin_bp.cli.command('restore-backup')
+@click.argument('name')
+@click.argument('target', type=click.Path(dir_okay=False))
+@click.option('--file', 'file_name', default='app.db', show_default=True, help='Nusxadagi fayl (masalan shards/shard_1.db)')
+def restore_backup_command(name, target, file_name):
+    """Nusxani yangi faylga tiklash (ishlayotgan bazani almashtirmaydi)"""
+    try:
+        backups.restore(os.path.join(backups.directory, name, file_name), target)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{target} tiklandi')
+
+@admin_bp.cli.command('slow-queries')
+@click.option('--top', default=20, show_default=True)
+@click.option('--hours', type=float, default=None, help='Faqat oxirgi N soat')
+@click.option('--order-by', type=click.Choice(SLOW_QUERY_ORDERS), default='total_ms', show_default=True)
+def slow_queries_command(top, hours, order_by):
+    """Sekin so'rovlar jurnalini fingerprint bo'yicha yig'ish"""
+    for group in slow_queries.summary(hours=hours, top=top, order_by=order_by):
+        click.echo(
+            f"{group['fingerprint']}  {group['count']} ta, jami {group['total_ms']} ms, "
+            f"o'rtacha {group['avg_ms']} ms, p95 {group['p95_ms']} ms  {' '.join(group['flags'])}"
+        )
+        click.echo(f"  {group['statement'][:200]}")
+        click.echo(f"  parametrlar: {group['parameters']}  endpoint: {', '.join(group['endpoints'])}")
+        for detail in group['plan']:
+            click.echo(f'    {detail}')
@@ -1,11 +1,112 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, g
 from src.models.user import User, db
+from src.services.hashing import HashingBusy
+from src.services.rate_limit import get_limiter
+from src.services.revocation import revocations
+from src.services.queries import user_by_id
+from src.services.sharding import bind_request
+from src.services.tracing import span
 import jwt
+import uuid
+import click
 from datetime import datetime, timedelta
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
 
+LOGIN_RATE_WINDOW = 60  # soniya
+LOGIN_IP_LIMIT = 20
+LOGIN_EMAIL_LIMIT = 5
+ACCESS_TOKEN_MINUTES = 15
+REFRESH_TOKEN_DAYS = 7
+
+def _too_many_attempts(retry_after):
+    response = jsonify({'message': 'Juda ko\'p urinish, keyinroq qayta urinib ko\'ring'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+class TokenUser:
+    """Access token ma'lumotlari asosidagi foydalanuvchi.
+
+    id, email, role va game_club_id tokendan olinadi; boshqa maydonlar
+    birinchi murojaatda bazadan yuklanadi.
+    """
+
+    def __init__(self, payload):
+        self.id = payload['user_id']
+        self.email = payload.get('email')
+        self.role = payload.get('role')
+        self.game_club_id = payload.get('game_club_id')
+        self._user = None
+
+    def _load(self):
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+            if self._user is None:
+                raise LookupError('Foydalanuvchi topilmadi')
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+def issue_tokens(user):
+    """Qisqa muddatli access va uzoq muddatli refresh token juftligi"""
+    now = datetime.utcnow()
+    claims = {
+        'user_id': user.id,
+        'email': user.email,
+        'role': user.role,
+        'game_club_id': user.game_club_id,
+        'iat': now
+    }
+    secret = current_app.config['JWT_SECRET_KEY']
+    access_minutes = current_app.config.get('ACCESS_TOKEN_MINUTES', ACCESS_TOKEN_MINUTES)
+    refresh_days = current_app.config.get('REFRESH_TOKEN_DAYS', REFRESH_TOKEN_DAYS)
+    access_token = jwt.encode(dict(
+        claims, type='access', jti=uuid.uuid4().hex, exp=now + timedelta(minutes=access_minutes)
+    ), secret, algorithm='HS256')
+    refresh_token = jwt.encode(dict(
+        claims, type='refresh', jti=uuid.uuid4().hex, exp=now + timedelta(days=refresh_days)
+    ), secret, algorithm='HS256')
+    return access_token, refresh_token
+
+def authenticate_token(token):
+    """Tokenni tekshirish; (foydalanuvchi, xatolik javobi) qaytaradi"""
+    # Batch ichidagi so'rovlar bir app context da - token bir marta tekshiriladi
+    cached = g.get('auth_cache')
+    if cached and cached[0] == token:
+        g.token_payload = cached[2]
+        return cached[1], None
+    
+    try:
+        # Token ni decode qilish
+        data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+        
+        if data.get('type') == 'refresh':
+            return None, (jsonify({'message': 'Noto\'g\'ri token'}), 401)
+        
+        if revocations.is_revoked(data):
+            return None, (jsonify({'message': 'Token bekor qilingan'}), 401)
+        
+        if data.get('type') == 'access':
+            # Bekor qilish ro'yxati faol bo'lmagan foydalanuvchilarni ham qamraydi
+            current_user = TokenUser(data)
+        else:
+            # Eski (jti siz) tokenlar uchun bazadan tekshirish
+            current_user = user_by_id(data['user_id'])
+            
+            if not current_user or not current_user.is_active:
+                return None, (jsonify({'message': 'Foydalanuvchi topilmadi yoki faol emas'}), 401)
+        
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'message': 'Token muddati tugagan'}), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({'message': 'Noto\'g\'ri token'}), 401)
+    
+    g.token_payload = data
+    g.auth_cache = (token, current_user, data)
+    return current_user, None
+
 def token_required(f):
     """JWT token tekshirish decorator"""
     @wraps(f)
@@ -23,18 +124,13 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token topilmadi'}), 401
         
-        try:
-            # Token ni decode qilish
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.filter_by(id=data['user_id']).first()
-            
-            if not current_user or not current_user.is_active:
-                return jsonify({'message': 'Foydalanuvchi topilmadi yoki faol emas'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token muddati tugagan'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Noto\'g\'ri token'}), 401
+        with span('auth.token_required'):
+            current_user, error = authenticate_token(token)
+        if error:
+            return error
+        
+        # Shard rejimida admin so'rovlari o'z klubi faylida bajariladi
+        bind_request(current_user.game_club_id)
         
         return f(current_user, *args, **kwargs)
     
@@ -64,9 +160,20 @@ def login():
     try:
         data = request.get_json()
         
+        window = current_app.config.get('LOGIN_RATE_WINDOW', LOGIN_RATE_WINDOW)
+        ip_limiter = get_limiter('login_ip', current_app.config.get('LOGIN_IP_LIMIT', LOGIN_IP_LIMIT), window)
+        allowed, retry_after = ip_limiter.hit(request.remote_addr)
+        if not allowed:
+            return _too_many_attempts(retry_after)
+        
         if not data or not data.get('email') or not data.get('password'):
             return jsonify({'message': 'Email va parol talab qilinadi'}), 400
         
+        email_limiter = get_limiter('login_email', current_app.config.get('LOGIN_EMAIL_LIMIT', LOGIN_EMAIL_LIMIT), window)
+        allowed, retry_after = email_limiter.hit(data['email'].lower())
+        if not allowed:
+            return _too_many_attempts(retry_after)
+        
         user = User.query.filter_by(email=data['email']).first()
         
         if not user or not user.check_password(data['password']):
@@ -75,20 +182,27 @@ def login():
         if not user.is_active:
             return jsonify({'message': 'Foydalanuvchi faol emas'}), 401
         
-        # JWT token yaratish
-        token = jwt.encode({
-            'user_id': user.id,
-            'email': user.email,
-            'role': user.role,
-            'exp': datetime.utcnow() + timedelta(days=7)  # 7 kun
-        }, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+        email_limiter.reset(data['email'].lower())
+        
+        # Xeshlash sozlamalari o'zgargan bo'lsa, parolni qayta xeshlash
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+        
+        # JWT tokenlar yaratish
+        token, refresh_token = issue_tokens(user)
         
         return jsonify({
             'message': 'Muvaffaqiyatli kirildi',
             'token': token,
+            'refresh_token': refresh_token,
             'user': user.to_dict()
         }), 200
         
+    except HashingBusy:
+        response = jsonify({'message': 'Server band, keyinroq qayta urinib ko\'ring'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
     except Exception as e:
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
@@ -101,11 +215,70 @@ def verify_token(current_user):
         'user': current_user.to_dict()
     }), 200
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Refresh token orqali yangi token juftligini olish"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if not data.get('refresh_token'):
+            return jsonify({'message': 'refresh_token talab qilinadi'}), 400
+        
+        try:
+            payload = jwt.decode(data['refresh_token'], current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token muddati tugagan'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Noto\'g\'ri token'}), 401
+        
+        if payload.get('type') != 'refresh' or revocations.is_revoked(payload):
+            return jsonify({'message': 'Noto\'g\'ri token'}), 401
+        
+        user = User.query.filter_by(id=payload['user_id']).first()
+        
+        if not user or not user.is_active:
+            return jsonify({'message': 'Foydalanuvchi topilmadi yoki faol emas'}), 401
+        
+        # Refresh token bir martalik - eskisi bekor qilinadi
+        revocations.revoke_token(payload)
+        db.session.commit()
+        revocations.refresh(force=True)
+        
+        token, refresh_token = issue_tokens(user)
+        
+        return jsonify({
+            'token': token,
+            'refresh_token': refresh_token
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout(current_user):
-    """Chiqish (frontend da token o'chiriladi)"""
-    return jsonify({'message': 'Muvaffaqiyatli chiqildi'}), 200
+    """Chiqish (joriy token va berilgan refresh token bekor qilinadi)"""
+    try:
+        revocations.revoke_token(g.token_payload)
+        
+        data = request.get_json(silent=True) or {}
+        if data.get('refresh_token'):
+            try:
+                payload = jwt.decode(data['refresh_token'], current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+                if payload.get('user_id') == current_user.id:
+                    revocations.revoke_token(payload)
+            except jwt.InvalidTokenError:
+                pass
+        
+        db.session.commit()
+        revocations.refresh(force=True)
+        
+        return jsonify({'message': 'Muvaffaqiyatli chiqildi'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
 @auth_bp.route('/change-password', methods=['POST'])
 @token_required
@@ -124,10 +297,27 @@ def change_password(current_user):
             return jsonify({'message': 'Yangi parol kamida 6 ta belgidan iborat bo\'lishi kerak'}), 400
         
         current_user.set_password(data['new_password'])
+        
+        # Avvalgi barcha sessiyalarni yopish
+        revocations.revoke_user(current_user.id)
+        revocations.revoke_token(g.token_payload)
         db.session.commit()
+        revocations.refresh(force=True)
+        
+        token, refresh_token = issue_tokens(current_user)
         
-        return jsonify({'message': 'Parol muvaffaqiyatli o\'zgartirildi'}), 200
+        return jsonify({
+            'message': 'Parol muvaffaqiyatli o\'zgartirildi',
+            'token': token,
+            'refresh_token': refresh_token
+        }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@auth_bp.cli.command('prune-tokens')
+def prune_tokens_command():
+    """Muddati o'tgan bekor qilingan token yozuvlarini o'chirish"""
+    click.echo(f'{revocations.prune()} ta yozuv o\'chirildi')
+
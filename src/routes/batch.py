@@ -0,0 +1,82 @@
+from flask import Blueprint, request, jsonify, current_app
+from src.routes.auth import token_required
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+from urllib.parse import urlsplit
+
+batch_bp = Blueprint('batch', __name__)
+
+MAX_BATCH_REQUESTS = 20
+ALLOWED_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+# Oqimli yoki ichma-ich so'rovlar batch ichida bajarilmaydi
+FORBIDDEN_PREFIXES = ('/api/batch', '/api/game-club/events')
+
+def _dispatch(sub_request, authorization):
+    """Bitta so'rovni Flask URL map orqali jarayon ichida bajarish"""
+    method = str(sub_request.get('method', 'GET')).upper()
+    path = sub_request.get('path')
+    
+    if method not in ALLOWED_METHODS:
+        return 400, {'message': 'Noto\'g\'ri method'}
+    if not isinstance(path, str) or not path.startswith('/api/') or path.startswith(FORBIDDEN_PREFIXES):
+        return 400, {'message': 'Noto\'g\'ri path'}
+    
+    # Faqat API blueprint endpointlari (statik fayllar uchun catch-all emas)
+    try:
+        endpoint, _ = current_app.url_map.bind('localhost').match(urlsplit(path).path, method=method)
+    except HTTPException as e:
+        return e.code, {'message': e.name}
+    if '.' not in endpoint:
+        return 404, {'message': 'Not Found'}
+    
+    builder = EnvironBuilder(
+        path=path,
+        method=method,
+        json=sub_request.get('body') if method != 'GET' else None,
+        headers={'Authorization': authorization},
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    try:
+        # Ichki so'rovlar bir xil app context (g, sessiya va identity map) dan foydalanadi
+        with current_app.request_context(builder.get_environ()):
+            response = current_app.full_dispatch_request()
+    except Exception as e:
+        return 500, {'message': f'Xatolik: {str(e)}'}
+    finally:
+        builder.close()
+    
+    if response.is_json:
+        return response.status_code, response.get_json()
+    return response.status_code, None
+
+@batch_bp.route('', methods=['POST'])
+@token_required
+def batch(current_user):
+    """Bir nechta API so'rovini bitta so'rovda bajarish"""
+    try:
+        data = request.get_json(silent=True) or {}
+        sub_requests = data.get('requests')
+        
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return jsonify({'message': 'requests ro\'yxati talab qilinadi'}), 400
+        
+        if len(sub_requests) > MAX_BATCH_REQUESTS:
+            return jsonify({'message': f'Maksimal {MAX_BATCH_REQUESTS} ta so\'rov yuborish mumkin'}), 400
+        
+        authorization = request.headers['Authorization']
+        results = []
+        for index, sub_request in enumerate(sub_requests):
+            if not isinstance(sub_request, dict):
+                status, body = 400, {'message': 'So\'rov obyekt bo\'lishi kerak'}
+            else:
+                status, body = _dispatch(sub_request, authorization)
+            results.append({
+                'id': sub_request.get('id', index) if isinstance(sub_request, dict) else index,
+                'status': status,
+                'body': body
+            })
+        
+        return jsonify({'responses': results}), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
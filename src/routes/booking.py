@@ -1,15 +1,124 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from src.models.user import User, db
 from src.models.game_club import GameClub
-from src.models.room import Room
 from src.models.computer import Computer
 from src.models.booking import Booking
 from src.routes.auth import token_required, admin_required, superadmin_required
+from src.services.events import bus
+from src.services.status_board import board
+from src.services.statistics import statistics
+from src.services.archive import archive_bookings
+from src.services.sharding import bind_request, fan_out, router as shards
+from src.services.queries import room_for_club, computer_by_number, conflicting_booking_id
+from src.services.listing import booking_dicts, booking_dicts_by_id
+from src.services.recurrence import (
+    MAX_BOOKINGS as MAX_BULK_BOOKINGS, MODES as RECURRENCE_MODES, RecurrenceError,
+    expand, find_conflicts, parse_time, room_computers
+)
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_
+import click
+import heapq
+from sqlalchemy import and_, func
 
 booking_bp = Blueprint('booking', __name__)
 
+# Kompyuter bandligi bitta qoida bo'yicha: Booking.in_progress (faol va hozir davom
+# etayotgan bron). Yaratish, boshlanish, yakunlash, bekor qilish va muddati o'tishi
+# is_available, hodisalar va holat jadvalini shu yordamchilar orqali o'zgartiradi
+
+def _current_booking(computer_id, now):
+    """Kompyuterda hozir davom etayotgan bron (id, tugash) yoki None"""
+    return db.session.query(Booking.id, Booking.end_time).filter(
+        Booking.computer_id == computer_id,
+        Booking.in_progress(now)
+    ).order_by(Booking.id).first()
+
+def _occupy(booking, computer, now):
+    """Bron hozir davom etayotgan bo'lsa kompyuterni band qilish (flush dan keyin); band qilindimi"""
+    if not booking.in_progress(now):
+        return False
+    computer.is_available = False
+    bus.publish(booking.game_club_id, 'computer.busy', {
+        'computer_id': computer.id,
+        'room_id': computer.room_id,
+        'computer_number': computer.number,
+        'booking_id': booking.id
+    })
+    return True
+
+def _release(booking, computer, event_type, now):
+    """Bron yopilgani haqida hodisa; kompyuterda boshqa davom etayotgan bron bo'lmasa uni bo'shatish"""
+    bus.publish(booking.game_club_id, event_type, {
+        'booking_id': booking.id,
+        'computer_id': booking.computer_id
+    })
+    if computer and _current_booking(computer.id, now) is None:
+        computer.is_available = True
+        computer.current_booking_id = None
+        bus.publish(booking.game_club_id, 'computer.free', {
+            'computer_id': computer.id,
+            'room_id': computer.room_id,
+            'computer_number': computer.number
+        })
+
+def _board_booked(entries, now):
+    """Commit dan keyin: [(kompyuter id, bron id, boshlanish, tugash, band)] holat jadvaliga"""
+    for computer_id, booking_id, start_time, end_time, occupied in entries:
+        if occupied:
+            board.mark_busy(computer_id, booking_id, end_time)
+        elif start_time > now:
+            board.mark_upcoming(computer_id, start_time)
+
+def _board_released(computer_id, booking_id, now):
+    """Commit dan keyin: yopilgan bronni holat jadvalidan olib tashlash"""
+    if not board.enabled:
+        return
+    current = _current_booking(computer_id, now)
+    if current:
+        board.mark_busy(computer_id, *current)
+        return
+    next_start = db.session.query(func.min(Booking.start_time)).filter(
+        Booking.computer_id == computer_id,
+        Booking.is_active == True,
+        Booking.start_time > now
+    ).scalar()
+    board.mark_free(computer_id, booking_id, next_start)
+
+def _bind_booking_club(current_user, booking_id):
+    """Superadmin uchun bron shardini tanlash (admin so'rovi token_required da bog'langan).
+
+    Shard fayllarida bron id lari takrorlanadi, shuning uchun club_id parametri
+    berilmasa bron barcha shardlardan qidiriladi; bir nechta klubda topilsa 400.
+    Xato javobi yoki None qaytaradi.
+    """
+    if current_user.role != 'superadmin' or not shards.enabled:
+        return None
+    club_id = request.args.get('club_id', type=int)
+    
+    def lookup():
+        query = db.session.query(Booking.game_club_id).filter_by(id=booking_id)
+        if club_id:
+            query = query.filter_by(game_club_id=club_id)
+        return query.scalar()
+    
+    found = {club for club in fan_out(lookup, [shards.shard_for(club_id)] if club_id else None) if club}
+    if not found:
+        return jsonify({'message': 'Bron topilmadi'}), 404
+    if len(found) > 1:
+        return jsonify({'message': 'Bron bir nechta klubda topildi, club_id parametri talab qilinadi'}), 400
+    club_id = found.pop()
+    bind_request(club_id)
+    return None
+
+def booking_price(room, club, duration_hours):
+    """Bron narxi: aksiya soatidan oshsa aksiya narxi, aks holda soatlik narx (xona yoki klub)"""
+    hourly_price = room.hourly_price if room.hourly_price else club.day_price
+    
+    # Aksiya tekshirish
+    if duration_hours >= club.promo_hours and club.promo_price:
+        return club.promo_price
+    return hourly_price * duration_hours
+
 @booking_bp.route('/create', methods=['POST'])
 @token_required
 @admin_required
@@ -27,28 +136,20 @@ def create_booking(current_user):
                 return jsonify({'message': f'{field} talab qilinadi'}), 400
         
         # Xonani tekshirish
-        room = Room.query.filter_by(
-            id=data['room_id'],
-            game_club_id=current_user.game_club.id,
-            is_active=True
-        ).first()
+        room = room_for_club(data['room_id'], current_user.game_club.id)
         
         if not room:
             return jsonify({'message': 'Xona topilmadi'}), 404
         
         # Kompyuterni tekshirish
-        computer = Computer.query.filter_by(
-            room_id=room.id,
-            number=data['computer_number'],
-            is_active=True
-        ).first()
+        computer = computer_by_number(room.id, data['computer_number'])
         
         if not computer:
             return jsonify({'message': 'Kompyuter topilmadi'}), 404
         
         # Vaqtni parse qilish
         try:
-            start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
+            start_time = parse_time(data['start_time'])
         except:
             return jsonify({'message': 'Noto\'g\'ri vaqt formati'}), 400
         
@@ -56,54 +157,44 @@ def create_booking(current_user):
         end_time = start_time + timedelta(hours=duration_hours)
         
         # Vaqt to'qnashuvini tekshirish
-        conflicting_booking = Booking.query.filter(
-            and_(
-                Booking.computer_id == computer.id,
-                Booking.is_active == True,
-                or_(
-                    and_(Booking.start_time <= start_time, Booking.end_time > start_time),
-                    and_(Booking.start_time < end_time, Booking.end_time >= end_time),
-                    and_(Booking.start_time >= start_time, Booking.end_time <= end_time)
-                )
-            )
-        ).first()
-        
-        if conflicting_booking:
+        if conflicting_booking_id(computer.id, start_time, end_time) is not None:
             return jsonify({'message': 'Bu vaqtda kompyuter band'}), 400
         
         # Narxni hisoblash
-        club = current_user.game_club
-        total_price = 0
-        
-        # Soatlik narxni hisoblash (xona narxi yoki klub narxi)
-        hourly_price = room.hourly_price if room.hourly_price else club.day_price
-        
-        # Aksiya tekshirish
-        if duration_hours >= club.promo_hours and club.promo_price:
-            total_price = club.promo_price
-        else:
-            total_price = hourly_price * duration_hours
+        total_price = booking_price(room, current_user.game_club, duration_hours)
         
         # Bronni yaratish
         booking = Booking(
-            customer_name=data['customer_name'],
+            customer_username=data['customer_name'],
             start_time=start_time,
             end_time=end_time,
-            duration_hours=duration_hours,
+            total_hours=duration_hours,
             total_price=total_price,
             computer_id=computer.id,
             room_id=room.id,
             game_club_id=current_user.game_club.id,
-            created_by=current_user.id
+            admin_id=current_user.id
         )
         
         db.session.add(booking)
-        
-        # Kompyuterni band qilish
-        computer.is_available = False
-        computer.current_booking_id = booking.id
+        db.session.flush()  # ID olish uchun
+        
+        bus.publish(booking.game_club_id, 'booking.created', {
+            'booking_id': booking.id,
+            'computer_id': computer.id,
+            'room_id': room.id,
+            'computer_number': computer.number,
+            'start_time': booking.start_time.isoformat(),
+            'end_time': booking.end_time.isoformat()
+        })
+        
+        # Kompyuterni band qilish (bron hozir davom etayotgan bo'lsa)
+        now = datetime.utcnow()
+        occupied = _occupy(booking, computer, now)
+        entry = (computer.id, booking.id, start_time, end_time, occupied)
         
         db.session.commit()
+        _board_booked([entry], now)
         
         return jsonify({
             'message': 'Bron muvaffaqiyatli yaratildi',
@@ -114,24 +205,138 @@ def create_booking(current_user):
         db.session.rollback()
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@booking_bp.route('/bulk', methods=['POST'])
+@token_required
+@admin_required
+def create_bulk_bookings(current_user):
+    """Takrorlanuvchi va bir nechta kompyuterga bronlar (turnir, haftalik liga).
+
+    {"customer_name", "room_id", "computer_numbers": [1, 2], "start_time",
+     "duration_hours", "recurrence": {"frequency": "weekly", "interval": 1, "count": 8},
+     "mode": "all_or_nothing" | "skip_conflicts"}
+    Barcha bronlar bitta tranzaksiyada yaratiladi.
+    """
+    try:
+        if not current_user.game_club:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
+        data = request.get_json() or {}
+        
+        required_fields = ['customer_name', 'room_id', 'computer_numbers', 'start_time', 'duration_hours']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'message': f'{field} talab qilinadi'}), 400
+        
+        mode = data.get('mode', 'all_or_nothing')
+        if mode not in RECURRENCE_MODES:
+            return jsonify({'message': f'mode quyidagilardan biri bo\'lishi kerak: {", ".join(RECURRENCE_MODES)}'}), 400
+        
+        club = current_user.game_club
+        room = room_for_club(data['room_id'], club.id)
+        if not room:
+            return jsonify({'message': 'Xona topilmadi'}), 404
+        
+        duration_hours = int(data['duration_hours'])
+        try:
+            computers = room_computers(room.id, data['computer_numbers'])
+            occurrences = expand(parse_time(data['start_time']), duration_hours, data.get('recurrence'))
+        except RecurrenceError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        if len(computers) * len(occurrences) > MAX_BULK_BOOKINGS:
+            return jsonify({'message': f'Bir so\'rovda ko\'pi bilan {MAX_BULK_BOOKINGS} ta bron'}), 400
+        
+        # Barcha takrorlanishlar uchun bitta oraliq so'rovi
+        conflicts = find_conflicts([computer.id for computer in computers], occurrences)
+        conflict_list = [
+            {
+                'computer_number': computer.number,
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat(),
+                'conflicting_booking_id': conflicts[(computer.id, start_time)]
+            }
+            for computer in computers
+            for start_time, end_time in occurrences
+            if (computer.id, start_time) in conflicts
+        ]
+        if conflict_list and mode == 'all_or_nothing':
+            return jsonify({'message': 'Bu vaqtda kompyuter band', 'conflicts': conflict_list}), 400
+        
+        total_price = booking_price(room, club, duration_hours)
+        bookings = []
+        for computer in computers:
+            for start_time, end_time in occurrences:
+                if (computer.id, start_time) in conflicts:
+                    continue
+                booking = Booking(
+                    customer_username=data['customer_name'],
+                    start_time=start_time,
+                    end_time=end_time,
+                    total_hours=duration_hours,
+                    total_price=total_price,
+                    computer_id=computer.id,
+                    room_id=room.id,
+                    game_club_id=club.id,
+                    admin_id=current_user.id
+                )
+                bookings.append((booking, computer))
+        
+        if not bookings:
+            return jsonify({'message': 'Barcha bronlar to\'qnashdi', 'conflicts': conflict_list}), 400
+        
+        db.session.add_all([booking for booking, _ in bookings])
+        db.session.flush()  # ID olish uchun
+        
+        now = datetime.utcnow()
+        entries = []
+        for booking, computer in bookings:
+            bus.publish(booking.game_club_id, 'booking.created', {
+                'booking_id': booking.id,
+                'computer_id': computer.id,
+                'room_id': room.id,
+                'computer_number': computer.number,
+                'start_time': booking.start_time.isoformat(),
+                'end_time': booking.end_time.isoformat()
+            })
+            # Faqat hozir davom etayotgan bron kompyuterni band qiladi
+            occupied = _occupy(booking, computer, now)
+            entries.append((computer.id, booking.id, booking.start_time, booking.end_time, occupied))
+        
+        booking_ids = [booking.id for booking, _ in bookings]
+        db.session.commit()
+        _board_booked(entries, now)
+        
+        return jsonify({
+            'message': f'{len(booking_ids)} ta bron yaratildi',
+            'bookings': booking_dicts_by_id(booking_ids),
+            'skipped': conflict_list
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
 @booking_bp.route('/my-bookings', methods=['GET'])
 @token_required
 def get_my_bookings(current_user):
-    """O'z bronlarimni olish"""
+    """O'z bronlarimni olish (?archived=1 - arxivdagilari bilan)"""
     try:
+        archived = request.args.get('archived', '').lower() in ('1', 'true', 'yes')
+        
         if current_user.role == 'superadmin':
-            # Superadmin barcha bronlarni ko'radi
-            bookings = Booking.query.order_by(Booking.created_at.desc()).all()
+            # Superadmin barcha bronlarni ko'radi (shard rejimida har bir shard dan)
+            parts = fan_out(lambda: booking_dicts(archived=archived))
+            bookings = list(heapq.merge(
+                *parts, key=lambda booking: booking['created_at'] or '', reverse=True
+            ))
         elif current_user.role == 'admin' and current_user.game_club:
             # Admin faqat o'z klubidagi bronlarni ko'radi
-            bookings = Booking.query.filter_by(
-                game_club_id=current_user.game_club.id
-            ).order_by(Booking.created_at.desc()).all()
+            bookings = booking_dicts(current_user.game_club.id, archived)
         else:
             return jsonify({'message': 'Ruxsat yo\'q'}), 403
         
         return jsonify({
-            'bookings': [booking.to_dict() for booking in bookings]
+            'bookings': bookings
         }), 200
         
     except Exception as e:
@@ -143,6 +348,10 @@ def get_my_bookings(current_user):
 def complete_booking(current_user, booking_id):
     """Bronni yakunlash"""
     try:
+        error = _bind_booking_club(current_user, booking_id)
+        if error:
+            return error
+        
         booking = Booking.query.filter_by(id=booking_id).first()
         
         if not booking:
@@ -161,12 +370,11 @@ def complete_booking(current_user, booking_id):
         booking.completed_at = datetime.utcnow()
         
         # Kompyuterni bo'shatish
+        now = datetime.utcnow()
         computer = Computer.query.get(booking.computer_id)
-        if computer:
-            computer.is_available = True
-            computer.current_booking_id = None
-        
+        _release(booking, computer, 'booking.completed', now)
         db.session.commit()
+        _board_released(booking.computer_id, booking.id, now)
         
         return jsonify({
             'message': 'Bron muvaffaqiyatli yakunlandi',
@@ -183,6 +391,10 @@ def complete_booking(current_user, booking_id):
 def cancel_booking(current_user, booking_id):
     """Bronni bekor qilish"""
     try:
+        error = _bind_booking_club(current_user, booking_id)
+        if error:
+            return error
+        
         booking = Booking.query.filter_by(id=booking_id).first()
         
         if not booking:
@@ -201,12 +413,11 @@ def cancel_booking(current_user, booking_id):
         booking.cancelled_at = datetime.utcnow()
         
         # Kompyuterni bo'shatish
+        now = datetime.utcnow()
         computer = Computer.query.get(booking.computer_id)
-        if computer:
-            computer.is_available = True
-            computer.current_booking_id = None
-        
+        _release(booking, computer, 'booking.cancelled', now)
         db.session.commit()
+        _board_released(booking.computer_id, booking.id, now)
         
         return jsonify({
             'message': 'Bron muvaffaqiyatli bekor qilindi',
@@ -217,6 +428,49 @@ def cancel_booking(current_user, booking_id):
         db.session.rollback()
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+def _expire_bookings(current_time):
+    """Muddati tugagan faol bronlarni yopish; yopilganlar soni"""
+    # Muddati tugagan faol bronlarni topish
+    expired_bookings = Booking.query.filter(
+        and_(
+            Booking.is_active == True,
+            Booking.end_time <= current_time
+        )
+    ).all()
+    
+    for booking in expired_bookings:
+        booking.is_active = False
+        booking.is_expired = True
+        booking.expired_at = current_time
+        
+        # Kompyuterni bo'shatish
+        computer = Computer.query.get(booking.computer_id)
+        _release(booking, computer, 'booking.expired', current_time)
+    
+    released = [(booking.computer_id, booking.id) for booking in expired_bookings]
+    db.session.commit()
+    for computer_id, booking_id in released:
+        _board_released(computer_id, booking_id, current_time)
+    return len(expired_bookings)
+
+def _start_bookings(current_time):
+    """Boshlangan (kelajakda yaratilgan) bronlar kompyuterlarini band qilish; band qilinganlar soni"""
+    started = db.session.query(Booking, Computer).join(
+        Computer, Computer.id == Booking.computer_id
+    ).filter(
+        Booking.in_progress(current_time),
+        Computer.is_available == True
+    ).order_by(Booking.id).all()
+    
+    entries = {}
+    for booking, computer in started:
+        if computer.id not in entries and _occupy(booking, computer, current_time):
+            entries[computer.id] = (computer.id, booking.id, booking.start_time, booking.end_time, True)
+    
+    db.session.commit()
+    _board_booked(entries.values(), current_time)
+    return len(entries)
+
 @booking_bp.route('/expired/update', methods=['POST'])
 @token_required
 def update_expired_bookings(current_user):
@@ -224,33 +478,17 @@ def update_expired_bookings(current_user):
     try:
         current_time = datetime.utcnow()
         
-        # Muddati tugagan faol bronlarni topish
-        expired_bookings = Booking.query.filter(
-            and_(
-                Booking.is_active == True,
-                Booking.end_time <= current_time
-            )
-        ).all()
-        
-        updated_count = 0
-        
-        for booking in expired_bookings:
-            booking.is_active = False
-            booking.is_expired = True
-            booking.expired_at = current_time
-            
-            # Kompyuterni bo'shatish
-            computer = Computer.query.get(booking.computer_id)
-            if computer:
-                computer.is_available = True
-                computer.current_booking_id = None
-            
-            updated_count += 1
-        
-        db.session.commit()
+        if current_user.role == 'superadmin':
+            # Shard rejimida barcha shardlar bo'yicha
+            updated_count = sum(fan_out(lambda: _expire_bookings(current_time)))
+            started_count = sum(fan_out(lambda: _start_bookings(current_time)))
+        else:
+            updated_count = _expire_bookings(current_time)
+            started_count = _start_bookings(current_time)
         
         return jsonify({
-            'message': f'{updated_count} ta muddati tugagan bron yangilandi'
+            'message': f'{updated_count} ta muddati tugagan bron yangilandi',
+            'started_count': started_count
         }), 200
         
     except Exception as e:
@@ -264,29 +502,41 @@ def get_booking_statistics(current_user):
     try:
         if current_user.role == 'superadmin':
             # Superadmin uchun barcha statistika
-            total_bookings = Booking.query.count()
-            active_bookings = Booking.query.filter_by(is_active=True).count()
-            completed_bookings = Booking.query.filter_by(is_completed=True).count()
-            expired_bookings = Booking.query.filter_by(is_expired=True).count()
+            stats = statistics.booking_stats()
             
-        elif current_user.role == 'admin' and current_user.game_club:
+        elif current_user.role == 'admin' and current_user.game_club_id:
             # Admin uchun faqat o'z klubidagi statistika
-            club_id = current_user.game_club.id
-            total_bookings = Booking.query.filter_by(game_club_id=club_id).count()
-            active_bookings = Booking.query.filter_by(game_club_id=club_id, is_active=True).count()
-            completed_bookings = Booking.query.filter_by(game_club_id=club_id, is_completed=True).count()
-            expired_bookings = Booking.query.filter_by(game_club_id=club_id, is_expired=True).count()
+            stats = statistics.booking_stats(current_user.game_club_id)
             
         else:
             return jsonify({'message': 'Ruxsat yo\'q'}), 403
         
-        return jsonify({
-            'total_bookings': total_bookings,
-            'active_bookings': active_bookings,
-            'completed_bookings': completed_bookings,
-            'expired_bookings': expired_bookings
-        }), 200
+        return jsonify(stats), 200
         
     except Exception as e:
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@booking_bp.cli.command('check-stats')
+@click.option('--fix', is_flag=True, help='Farq bo\'lsa hisoblagichlarni qayta qurish')
+def check_stats_command(fix):
+    """Statistika hisoblagichlarini jadvallar bilan solishtirish"""
+    if not statistics.counters_enabled:
+        click.echo('Hisoblagichlar o\'chirilgan (STATS_COUNTERS_ENABLED)')
+        return
+    mismatches = statistics.check(fix=fix)
+    for club_id, name, stored, actual in mismatches:
+        click.echo(f'klub {club_id}: {name} = {stored}, haqiqiy {actual}')
+    if not mismatches:
+        click.echo('Hisoblagichlar to\'g\'ri')
+    elif fix:
+        click.echo(f'{len(mismatches)} ta farq tuzatildi')
+
+@booking_bp.cli.command('archive')
+@click.option('--days', type=int, default=None, help='Tugaganiga necha kun bo\'lgan bronlar (standart: BOOKING_ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', type=int, default=None, help='Bitta tranzaksiyadagi bronlar soni')
+@click.option('--max-batches', type=int, default=None, help='Bir ishga tushirishdagi partiyalar chegarasi')
+def archive_command(days, batch_size, max_batches):
+    """Eski nofaol bronlarni arxiv jadvaliga ko'chirish"""
+    batch_size = batch_size or current_app.config.get('BOOKING_ARCHIVE_BATCH_SIZE', 500)
+    moved = sum(fan_out(lambda: archive_bookings(days=days, batch_size=max(1, batch_size), max_batches=max_batches)))
+    click.echo(f'{moved} ta bron arxivga ko\'chirildi')
@@ -1,15 +1,169 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response, Response, current_app
 from src.models.user import User, db
 from src.models.game_club import GameClub
 from src.models.room import Room
 from src.models.computer import Computer
 from src.models.booking import Booking
-from src.routes.auth import token_required, admin_required
-from sqlalchemy import func
+from src.routes.auth import token_required, admin_required, authenticate_token
+from src.services.events import bus
+from src.services.status_board import board
+from src.services.snapshot import snapshots
+from src.services.sharding import club_scope
+from src.services.queries import room_for_club
+from src.services.listing import room_dicts
+from src.services.geo import find_nearby_clubs
+from src.services.catalogue import catalogue
+from src.services.analytics import AnalyticsError, occupancy_heatmap, parse_utc
+from src.services.heartbeat import STATES as HEARTBEAT_STATES, heartbeats
+from src.services.layout import (
+    LayoutError, parse_layout_json, parse_layout_csv, export_layout, import_layout,
+    add_computers, remove_computers, busy_computer_ids
+)
+from sqlalchemy import func, select
 from datetime import datetime, timedelta
+import click
+import itertools
+import queue
 
 game_club_bp = Blueprint('game_club', __name__)
 
+MAX_NEARBY_RADIUS_KM = 100
+MAX_NEARBY_LIMIT = 100
+MAX_CATALOGUE_PER_PAGE = 100
+CATALOGUE_MAX_AGE = 30  # soniya
+EVENTS_HEARTBEAT = 15  # soniya
+OCCUPANCY_DEFAULT_DAYS = 28
+MAX_HEARTBEAT_BATCH = 1000
+
+@game_club_bp.route('/nearby', methods=['GET'])
+def get_nearby_clubs():
+    """Yaqin atrofdagi klublar (ommaviy)"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        radius = request.args.get('radius', 5, type=float)
+        limit = request.args.get('limit', 20, type=int)
+        free_only = request.args.get('free', '').lower() in ('1', 'true', 'yes')
+        
+        if lat is None or lng is None:
+            return jsonify({'message': 'lat va lng talab qilinadi'}), 400
+        
+        if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+            return jsonify({'message': 'Noto\'g\'ri koordinatalar'}), 400
+        
+        if radius <= 0 or radius > MAX_NEARBY_RADIUS_KM:
+            return jsonify({'message': f'radius 0 dan katta va {MAX_NEARBY_RADIUS_KM} km dan oshmasligi kerak'}), 400
+        
+        limit = max(1, min(limit, MAX_NEARBY_LIMIT))
+        clubs = find_nearby_clubs(lat, lng, radius, limit, free_only=free_only)
+        
+        return jsonify({
+            'clubs': clubs,
+            'count': len(clubs)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@game_club_bp.route('/catalogue', methods=['GET'])
+def get_catalogue():
+    """Klublar katalogi (ommaviy, keshlangan)"""
+    try:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = request.args.get('per_page', 20, type=int)
+        per_page = max(1, min(per_page, MAX_CATALOGUE_PER_PAGE))
+        
+        version, records = catalogue.snapshot()
+        etag = f'"catalogue-{version}-{page}-{per_page}"'
+        
+        if request.headers.get('If-None-Match') == etag:
+            response = make_response('', 304)
+        else:
+            total = len(records)
+            start = (page - 1) * per_page
+            response = make_response(jsonify({
+                'clubs': list(records[start:start + per_page]),
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'current_page': page,
+                'per_page': per_page,
+                'version': version
+            }), 200)
+        
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = f'public, max-age={CATALOGUE_MAX_AGE}'
+        return response
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+def _format_event(event_id, event_type, payload):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+
+@game_club_bp.route('/events', methods=['GET'])
+def stream_events():
+    """Kompyuter va bronlar holati o'zgarishlari (Server-Sent Events)"""
+    # EventSource header yubora olmaydi, shuning uchun ?token= ham qabul qilinadi
+    token = request.args.get('token')
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        token = auth_header[7:]
+    if not token:
+        return jsonify({'message': 'Token topilmadi'}), 401
+    
+    current_user, error = authenticate_token(token)
+    if error:
+        return error
+    if current_user.role not in ['admin', 'superadmin']:
+        return jsonify({'message': 'Admin huquqi talab qilinadi'}), 403
+    if not current_user.game_club_id:
+        return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+    
+    club_id = current_user.game_club_id
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'message': 'Noto\'g\'ri Last-Event-ID'}), 400
+    
+    subscription = bus.subscribe(club_id)
+    try:
+        if last_event_id is not None:
+            backlog = bus.replay(club_id, last_event_id)
+        else:
+            backlog = []
+            last_event_id = bus.latest_id(club_id)
+    except Exception:
+        bus.unsubscribe(subscription)
+        raise
+    
+    def generate():
+        # Poller hodisalarni id tartibida yuboradi - yuborilgan eng katta id dan
+        # kichiklari faqat replay bilan takrorlanganlar
+        last_sent = last_event_id
+        try:
+            yield f'retry: 3000\nid: {last_sent}\n\n'
+            for event_id, _, event_type, payload in backlog:
+                last_sent = event_id
+                yield _format_event(event_id, event_type, payload)
+            while not subscription.overflowed:
+                try:
+                    event_id, _, event_type, payload = subscription.queue.get(timeout=EVENTS_HEARTBEAT)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                if event_id <= last_sent:
+                    continue
+                last_sent = event_id
+                yield _format_event(event_id, event_type, payload)
+        finally:
+            bus.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @game_club_bp.route('/my-club', methods=['GET'])
 @token_required
 @admin_required
@@ -73,6 +227,77 @@ def update_my_club(current_user):
         db.session.rollback()
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@game_club_bp.route('/snapshot', methods=['GET'])
+@token_required
+@admin_required
+def get_club_snapshot(current_user):
+    """Klub, xonalar, kompyuterlar va joriy bronlar - bitta hujjatda"""
+    try:
+        club_id = current_user.game_club_id
+        if current_user.role == 'superadmin':
+            club_id = request.args.get('club_id', club_id, type=int)
+        
+        if not club_id:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
+        with club_scope(club_id):
+            cached = snapshots.get(club_id)
+        if cached is None:
+            return jsonify({'message': 'Klub topilmadi'}), 404
+        
+        version, content_hash, document = cached
+        etag = f'"{content_hash}"'
+        
+        if request.headers.get('If-None-Match') == etag:
+            response = make_response('', 304)
+        else:
+            response = make_response(jsonify({
+                'version': version,
+                'hash': content_hash,
+                'snapshot': document
+            }), 200)
+        
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@game_club_bp.route('/analytics/occupancy', methods=['GET'])
+@token_required
+@admin_required
+def get_occupancy_heatmap(current_user):
+    """Hafta soatlari x xonalar bo'yicha bandlik"""
+    try:
+        club_id = current_user.game_club_id
+        if current_user.role == 'superadmin':
+            club_id = request.args.get('club_id', club_id, type=int)
+        
+        if not club_id:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
+        try:
+            end = parse_utc(request.args['to']) if request.args.get('to') else datetime.utcnow()
+            start = parse_utc(request.args['from']) if request.args.get('from') \
+                else end - timedelta(days=OCCUPANCY_DEFAULT_DAYS)
+        except ValueError:
+            return jsonify({'message': 'from va to ISO formatda bo\'lishi kerak'}), 400
+        
+        granularity = request.args.get('granularity', 'hour')
+        tz_offset = request.args.get('tz_offset', current_app.config.get('ANALYTICS_TZ_OFFSET', 0), type=int)
+        
+        try:
+            with club_scope(club_id):
+                heatmap = occupancy_heatmap(club_id, start, end, granularity, tz_offset)
+        except AnalyticsError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify(heatmap), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
 @game_club_bp.route('/rooms', methods=['GET'])
 @token_required
 @admin_required
@@ -82,13 +307,8 @@ def get_my_rooms(current_user):
         if not current_user.game_club:
             return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
         
-        rooms = Room.query.filter_by(
-            game_club_id=current_user.game_club.id,
-            is_active=True
-        ).all()
-        
         return jsonify({
-            'rooms': [room.to_dict() for room in rooms]
+            'rooms': room_dicts(current_user.game_club.id)
         }), 200
         
     except Exception as e:
@@ -126,12 +346,7 @@ def create_room(current_user):
         db.session.flush()  # ID olish uchun
         
         # Kompyuterlarni yaratish
-        for i in range(1, data['computer_count'] + 1):
-            computer = Computer(
-                number=i,
-                room_id=room.id
-            )
-            db.session.add(computer)
+        add_computers(room.id, range(1, data['computer_count'] + 1))
         
         db.session.commit()
         
@@ -150,10 +365,7 @@ def create_room(current_user):
 def update_room(current_user, room_id):
     """Xonani yangilash"""
     try:
-        room = Room.query.filter_by(
-            id=room_id,
-            game_club_id=current_user.game_club.id
-        ).first()
+        room = room_for_club(room_id, current_user.game_club.id, active_only=False)
         
         if not room:
             return jsonify({'message': 'Xona topilmadi'}), 404
@@ -177,22 +389,22 @@ def update_room(current_user, room_id):
         # Kompyuter sonini yangilash
         if data.get('computer_count') and data['computer_count'] != room.computer_count:
             new_count = data['computer_count']
-            current_count = room.computer_count
+            # Import qilingan xonada raqamlar uzluksiz bo'lmasligi mumkin (masalan 1-10,12)
+            active = dict(db.session.query(Computer.number, Computer.id).filter(
+                Computer.room_id == room.id,
+                Computer.is_active == True
+            ).all())
             
-            if new_count > current_count:
-                # Kompyuter qo'shish
-                for i in range(current_count + 1, new_count + 1):
-                    computer = Computer(number=i, room_id=room.id)
-                    db.session.add(computer)
-            elif new_count < current_count:
-                # Kompyuter o'chirish (oxirgisidan)
-                computers_to_delete = Computer.query.filter_by(room_id=room.id).filter(
-                    Computer.number > new_count
-                ).all()
-                for comp in computers_to_delete:
-                    if not comp.is_available:
-                        return jsonify({'message': 'Band kompyuterlar mavjud, avval ularni bo\'shating'}), 400
-                    db.session.delete(comp)
+            if new_count > len(active):
+                # Kompyuter qo'shish: bo'sh raqamlar, keyin oxirgisidan keyingilar
+                free_numbers = (number for number in itertools.count(1) if number not in active)
+                add_computers(room.id, list(itertools.islice(free_numbers, new_count - len(active))))
+            elif new_count < len(active):
+                # Kompyuter o'chirish (eng katta raqamlardan)
+                ids_to_delete = [active[number] for number in sorted(active)[new_count:]]
+                if busy_computer_ids(ids_to_delete):
+                    return jsonify({'message': 'Band kompyuterlar mavjud, avval ularni bo\'shating'}), 400
+                remove_computers(ids_to_delete)
             
             room.computer_count = new_count
         
@@ -207,16 +419,66 @@ def update_room(current_user, room_id):
         db.session.rollback()
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@game_club_bp.route('/layout', methods=['GET'])
+@token_required
+@admin_required
+def get_layout(current_user):
+    """Klub joylashuvini eksport qilish"""
+    try:
+        if not current_user.game_club:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
+        return jsonify({'rooms': export_layout(current_user.game_club.id)}), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@game_club_bp.route('/layout/import', methods=['POST'])
+@token_required
+@admin_required
+def import_club_layout(current_user):
+    """Klub joylashuvini JSON yoki CSV dan import qilish"""
+    try:
+        if not current_user.game_club:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
+        prune = request.args.get('prune', '').lower() in ('1', 'true', 'yes')
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        
+        if 'file' in request.files:
+            specs = parse_layout_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            specs = parse_layout_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            if data is None:
+                return jsonify({'message': 'JSON yoki CSV ma\'lumot talab qilinadi'}), 400
+            specs = parse_layout_json(data)
+            prune = prune or bool(data.get('prune'))
+            dry_run = dry_run or bool(data.get('dry_run'))
+        
+        report = import_layout(current_user.game_club.id, specs, prune=prune, dry_run=dry_run)
+        
+        return jsonify({
+            'message': 'Joylashuv tekshirildi' if dry_run else 'Joylashuv muvaffaqiyatli import qilindi',
+            'report': report
+        }), 200
+        
+    except LayoutError as e:
+        return jsonify({'message': str(e)}), 400
+    except UnicodeDecodeError:
+        return jsonify({'message': 'Fayl UTF-8 formatida bo\'lishi kerak'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
 @game_club_bp.route('/rooms/<int:room_id>', methods=['DELETE'])
 @token_required
 @admin_required
 def delete_room(current_user, room_id):
     """Xonani o'chirish"""
     try:
-        room = Room.query.filter_by(
-            id=room_id,
-            game_club_id=current_user.game_club.id
-        ).first()
+        room = room_for_club(room_id, current_user.game_club.id, active_only=False)
         
         if not room:
             return jsonify({'message': 'Xona topilmadi'}), 404
@@ -253,17 +515,22 @@ def get_dashboard_stats(current_user):
         # Xonalar statistikasi
         total_rooms = Room.query.filter_by(game_club_id=club_id, is_active=True).count()
         
-        # Kompyuterlar statistikasi
-        total_computers = Computer.query.join(Room).filter(
+        # Kompyuterlar statistikasi (band/bo'sh - holat jadvalidan, unda yo'qlari davom etayotgan bronlardan)
+        computer_ids = [computer_id for (computer_id,) in db.session.query(Computer.id).join(Room).filter(
             Room.game_club_id == club_id,
             Computer.is_active == True
-        ).count()
-        
-        available_computers = Computer.query.join(Room).filter(
-            Room.game_club_id == club_id,
-            Computer.is_active == True,
-            Computer.is_available == True
-        ).count()
+        )]
+        statuses = board.statuses(computer_ids)
+        unknown_ids = [computer_id for computer_id in computer_ids if computer_id not in statuses]
+        busy_ids = {computer_id for computer_id, (busy, _) in statuses.items() if busy}
+        if unknown_ids:
+            busy_ids.update(db.session.execute(select(Booking.computer_id).where(
+                Booking.computer_id.in_(unknown_ids),
+                Booking.in_progress(datetime.utcnow())
+            )).scalars())
+        
+        total_computers = len(computer_ids)
+        available_computers = total_computers - len(busy_ids)
         
         busy_computers = total_computers - available_computers
         
@@ -313,3 +580,77 @@ def get_dashboard_stats(current_user):
     except Exception as e:
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
 
+@game_club_bp.route('/heartbeats', methods=['POST'])
+@token_required
+@admin_required
+def ingest_heartbeats(current_user):
+    """Kompyuterlar holati paketi: {"heartbeats": [{"computer_id", "state"}]}"""
+    try:
+        items = (request.get_json(silent=True) or {}).get('heartbeats')
+        if not isinstance(items, list) or not items:
+            return jsonify({'message': 'heartbeats ro\'yxati talab qilinadi'}), 400
+        if len(items) > MAX_HEARTBEAT_BATCH:
+            return jsonify({'message': f'Bir paketda ko\'pi bilan {MAX_HEARTBEAT_BATCH} ta heartbeat'}), 400
+        
+        if not current_user.game_club_id:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
+        known = heartbeats.club_computers(current_user.game_club_id)
+        accepted, rejected = [], []
+        for item in items:
+            computer_id = item.get('computer_id') if isinstance(item, dict) else None
+            state = item.get('state') if isinstance(item, dict) else None
+            if computer_id in known and state in HEARTBEAT_STATES:
+                accepted.append((computer_id, state))
+            else:
+                rejected.append(computer_id)
+        
+        heartbeats.ingest(current_user.game_club_id, accepted)
+        return jsonify({'accepted': len(accepted), 'rejected': rejected}), 202
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@game_club_bp.route('/presence', methods=['GET'])
+@token_required
+@admin_required
+def get_presence(current_user):
+    """Kompyuterlarning oxirgi heartbeat holati va bronlar bilan nomuvofiqliklar"""
+    try:
+        club_id = current_user.game_club_id
+        if current_user.role == 'superadmin':
+            club_id = request.args.get('club_id', club_id, type=int)
+        
+        if not club_id:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
+        presence = heartbeats.presence(club_id)
+        
+        return jsonify({
+            'computers': [presence[computer_id].to_dict() for computer_id in sorted(presence)],
+            'issues': heartbeats.reconcile([club_id]).get(club_id, {}),
+            'offline_after': heartbeats.offline_after
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Xatolik: {str(e)}'}), 500
+
+@game_club_bp.cli.command('reconcile-heartbeats')
+@click.option('--fix', is_flag=True, help='is_available ni faol bronlar bo\'yicha tuzatish')
+def reconcile_heartbeats_command(fix):
+    """Jim kompyuterlarni offline qilish va holatlarni bronlar bilan solishtirish"""
+    click.echo(f'{heartbeats.mark_offline()} ta kompyuter offline qilindi')
+    report = heartbeats.reconcile(fix=fix)
+    if not report:
+        click.echo('Nomuvofiqlik topilmadi')
+    for club_id, issues in report.items():
+        click.echo(f'Klub {club_id}: ' + ', '.join(f'{name}={ids}' for name, ids in issues.items() if ids))
+
+@game_club_bp.cli.command('rebuild-board')
+def rebuild_board_command():
+    """Umumiy xotiradagi kompyuterlar holati jadvalini bazadan qayta qurish"""
+    if not board.enabled:
+        click.echo('Holat jadvali yoqilmagan')
+        return
+    board.rebuild()
+    click.echo('Holat jadvali qayta qurildi')
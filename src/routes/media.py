@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify, send_file
 from src.models.user import User, db
+from src.models.game_club import GameClub
 from src.models.media_file import MediaFile
 from src.routes.auth import token_required, admin_required
+from src.services.statistics import statistics
+from src.services.listing import media_dicts
+from src.services.sharding import fan_out, router as shards
 from werkzeug.utils import secure_filename
 import os
 import uuid
@@ -80,25 +84,14 @@ def upload_file(current_user):
         
         # Mavjud fayllar sonini tekshirish
         club_id = current_user.game_club.id
+        counts = statistics.media_counts(club_id)
         
         if file_type == 'image':
-            current_images = MediaFile.query.filter_by(
-                game_club_id=club_id,
-                file_type='image',
-                is_active=True
-            ).count()
-            
-            if current_images >= MAX_IMAGES_PER_CLUB:
+            if counts['image'] >= MAX_IMAGES_PER_CLUB:
                 return jsonify({'message': f'Maksimal {MAX_IMAGES_PER_CLUB} ta rasm yuklash mumkin'}), 400
         
         elif file_type == 'video':
-            current_videos = MediaFile.query.filter_by(
-                game_club_id=club_id,
-                file_type='video',
-                is_active=True
-            ).count()
-            
-            if current_videos >= MAX_VIDEOS_PER_CLUB:
+            if counts['video'] >= MAX_VIDEOS_PER_CLUB:
                 return jsonify({'message': f'Maksimal {MAX_VIDEOS_PER_CLUB} ta video yuklash mumkin'}), 400
         
         # Fayl nomini xavfsiz qilish
@@ -146,13 +139,8 @@ def get_my_files(current_user):
         if not current_user.game_club:
             return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
         
-        files = MediaFile.query.filter_by(
-            game_club_id=current_user.game_club.id,
-            is_active=True
-        ).order_by(MediaFile.created_at.desc()).all()
-        
         return jsonify({
-            'files': [file.to_dict() for file in files]
+            'files': media_dicts(current_user.game_club.id)
         }), 200
         
     except Exception as e:
@@ -167,19 +155,9 @@ def get_upload_limits(current_user):
         if not current_user.game_club:
             return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
         
-        club_id = current_user.game_club.id
-        
-        current_images = MediaFile.query.filter_by(
-            game_club_id=club_id,
-            file_type='image',
-            is_active=True
-        ).count()
-        
-        current_videos = MediaFile.query.filter_by(
-            game_club_id=club_id,
-            file_type='video',
-            is_active=True
-        ).count()
+        counts = statistics.media_counts(current_user.game_club.id)
+        current_images = counts['image']
+        current_videos = counts['video']
         
         return jsonify({
             'images': {
@@ -203,17 +181,40 @@ def get_upload_limits(current_user):
 
 @media_bp.route('/<int:file_id>', methods=['GET'])
 def get_file(file_id):
-    """Faylni olish"""
+    """Faylni olish.
+
+    Shard fayllarida fayl id lari takrorlanadi, shuning uchun havolalarda
+    club_id parametri bor; u berilmasa fayl barcha shardlardan qidiriladi
+    va bir nechta klubda topilsa 400.
+    """
     try:
-        media_file = MediaFile.query.filter_by(id=file_id, is_active=True).first()
-        
-        if not media_file:
+        club_id = request.args.get('club_id', type=int)
+        keys = None
+        if club_id and shards.enabled:
+            # Mavjud bo'lmagan klub uchun shard fayli ochilmaydi
+            if not db.session.get(GameClub, club_id):
+                return jsonify({'message': 'Fayl topilmadi'}), 404
+            keys = [shards.shard_for(club_id)]
+        
+        def lookup():
+            query = db.session.query(MediaFile.game_club_id, MediaFile.file_path).filter_by(
+                id=file_id, is_active=True
+            )
+            if club_id:
+                query = query.filter_by(game_club_id=club_id)
+            return [tuple(row) for row in query]
+        
+        found = [row for part in fan_out(lookup, keys) for row in part]
+        if not found:
             return jsonify({'message': 'Fayl topilmadi'}), 404
+        if len(found) > 1:
+            return jsonify({'message': 'Fayl bir nechta klubda topildi, club_id parametri talab qilinadi'}), 400
+        file_path = found[0][1]
         
-        if not os.path.exists(media_file.file_path):
+        if not os.path.exists(file_path):
             return jsonify({'message': 'Fayl mavjud emas'}), 404
         
-        return send_file(media_file.file_path, as_attachment=False)
+        return send_file(file_path, as_attachment=False)
         
     except Exception as e:
         return jsonify({'message': f'Xatolik: {str(e)}'}), 500
@@ -224,6 +225,9 @@ def get_file(file_id):
 def delete_file(current_user, file_id):
     """Faylni o'chirish"""
     try:
+        if not current_user.game_club:
+            return jsonify({'message': 'Sizga tegishli klub topilmadi'}), 404
+        
         media_file = MediaFile.query.filter_by(
             id=file_id,
             game_club_id=current_user.game_club.id,
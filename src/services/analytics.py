@@ -0,0 +1,149 @@
+from src.models.user import db
+from src.models.room import Room
+from src.models.computer import Computer
+from src.models.booking import Booking
+from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+import numpy as np
+
+# Hafta ichidagi katak o'lchami (daqiqa)
+GRANULARITIES = {'15min': 15, '30min': 30, 'hour': 60, 'day': 1440}
+MINUTES_PER_WEEK = 7 * 24 * 60
+MAX_RANGE_DAYS = 366
+FETCH_CHUNK = 20000
+WEEKDAYS = ('Du', 'Se', 'Ch', 'Pa', 'Ju', 'Sh', 'Ya')
+
+
+class AnalyticsError(ValueError):
+    """Noto'g'ri tahlil parametrlari"""
+
+
+def parse_utc(value):
+    """ISO vaqt -> naive UTC (bazadagi vaqtlar kabi); Z yoki offset bo'lsa UTC ga o'tkaziladi"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# Bir klub yili yuz minglab qator bo'lishi mumkin - ORM qatorlari o'rniga
+# to'g'ridan-to'g'ri DB-API kursori, vaqt esa SQLite ichida epoch daqiqaga aylantiriladi.
+# Arxivdagi bronlar ham o'qiladi
+_INTERVALS_SQL = ' UNION ALL '.join(
+    'SELECT room_id, '
+    'CAST(ROUND((julianday(start_time) - 2440587.5) * 86400) AS INTEGER) / 60, '
+    'CAST(ROUND((julianday(end_time) - 2440587.5) * 86400) AS INTEGER) / 60 '
+    f'FROM {table} WHERE game_club_id = ? AND start_time < ? AND end_time > ?'
+    for table in ('booking', 'booking_archive')
+)
+
+
+def _db_datetime(value):
+    # SQLAlchemy SQLite DateTime saqlash formati
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def load_intervals(club_id, start, end):
+    """Oraliqqa tushgan bronlar: (xona id, boshlanish, tugash) - epoch daqiqalarda"""
+    cursor = db.session.connection(bind_arguments={'mapper': Booking.__mapper__}).connection.cursor()
+    try:
+        cursor.execute(_INTERVALS_SQL, (club_id, _db_datetime(end), _db_datetime(start)) * 2)
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(FETCH_CHUNK)
+            if not rows:
+                break
+            chunks.append(np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 3))
+    finally:
+        cursor.close()
+    data = np.concatenate(chunks).reshape(-1, 3) if chunks else np.empty((0, 3), np.int64)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def _bucket_labels(step):
+    labels = []
+    for offset in range(0, MINUTES_PER_WEEK, step):
+        day, minute = divmod(offset, 1440)
+        labels.append(WEEKDAYS[day] if step >= 1440 else f'{WEEKDAYS[day]} {minute // 60:02d}:{minute % 60:02d}')
+    return labels
+
+
+def occupancy_heatmap(club_id, start, end, granularity='hour', tz_offset=0):
+    """Hafta kataklari x xonalar bandlik matritsasi.
+
+    Har bir daqiqa uchun band kompyuterlar soni farq massivi (difference array)
+    bilan hisoblanadi, so'ng hafta katagiga yig'iladi. Bandlik - band
+    kompyuter-daqiqalarning xonadagi kompyuterlar x katak daqiqalariga nisbati.
+    tz_offset - mahalliy vaqt farqi (daqiqa), kataklar mahalliy vaqtda.
+    """
+    step = GRANULARITIES.get(granularity)
+    if step is None:
+        raise AnalyticsError(f'granularity quyidagilardan biri bo\'lishi kerak: {", ".join(GRANULARITIES)}')
+    start = start.replace(second=0, microsecond=0)
+    if end <= start:
+        raise AnalyticsError('to from dan keyin bo\'lishi kerak')
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise AnalyticsError(f'Oraliq {MAX_RANGE_DAYS} kundan oshmasligi kerak')
+
+    rooms = Room.query.filter_by(game_club_id=club_id, is_active=True).order_by(Room.id).all()
+    seats = dict(db.session.query(Computer.room_id, func.count(Computer.id)).filter(
+        Computer.room_id.in_([room.id for room in rooms]),
+        Computer.is_active == True
+    ).group_by(Computer.room_id).all()) if rooms else {}
+
+    room_ids = np.array([room.id for room in rooms], dtype=np.int64)
+    origin = int((start - datetime(1970, 1, 1)).total_seconds() // 60)
+    total = int((end - start).total_seconds() // 60)
+
+    booking_rooms, starts, ends = load_intervals(club_id, start, end)
+    # O'chirilgan xonalarning bronlari hisobga olinmaydi
+    positions = np.searchsorted(room_ids, booking_rooms)
+    positions = np.minimum(positions, max(len(room_ids) - 1, 0))
+    known = (room_ids[positions] == booking_rooms) if len(room_ids) else np.zeros(len(booking_rooms), bool)
+    positions = positions[known]
+    starts = np.clip(starts[known] - origin, 0, total)
+    ends = np.clip(ends[known] - origin, 0, total)
+
+    # Farq massivi: boshlanishda +1, tugashda -1, keyin yig'indi
+    width = total + 1
+    diff = np.bincount(positions * width + starts, minlength=len(room_ids) * width).astype(np.int32)
+    diff -= np.bincount(positions * width + ends, minlength=len(room_ids) * width).astype(np.int32)
+    busy = np.cumsum(diff.reshape(len(room_ids), width)[:, :total], axis=1, dtype=np.int32)
+
+    # Har bir daqiqaning hafta katagi (Dushanba 00:00 dan, mahalliy vaqtda)
+    first = start + timedelta(minutes=tz_offset)
+    week_offset = first.weekday() * 1440 + first.hour * 60 + first.minute
+    buckets = ((np.arange(total, dtype=np.int64) + week_offset) % MINUTES_PER_WEEK) // step
+    bucket_count = MINUTES_PER_WEEK // step
+    minutes_per_bucket = np.bincount(buckets, minlength=bucket_count)
+
+    busy_minutes = np.zeros((len(room_ids), bucket_count))
+    for index, row in enumerate(busy):
+        busy_minutes[index] = np.bincount(buckets, weights=row, minlength=bucket_count)
+
+    capacity = np.array([seats.get(room.id, 0) for room in rooms], dtype=np.float64)
+    denominator = capacity[:, None] * minutes_per_bucket[None, :]
+    utilization = np.divide(busy_minutes, denominator, out=np.zeros_like(busy_minutes), where=denominator > 0)
+    total_capacity = capacity * total
+
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'tz_offset': tz_offset,
+        'buckets': _bucket_labels(step),
+        'rooms': [
+            {
+                'id': room.id,
+                'name': room.name,
+                'computers': int(capacity[index]),
+                'busy_hours': round(float(busy_minutes[index].sum()) / 60, 2),
+                'utilization': round(float(busy_minutes[index].sum() / total_capacity[index]), 4)
+                if total_capacity[index] else 0.0
+            }
+            for index, room in enumerate(rooms)
+        ],
+        # utilization[katak][xona]
+        'utilization': np.round(utilization.T, 4).tolist()
+    }
@@ -0,0 +1,69 @@
+from src.models.user import db
+from src.models.booking import Booking
+from src.models.booking_archive import BookingArchive
+from flask import current_app
+from sqlalchemy import delete, insert, literal, select, union_all
+from datetime import datetime, timedelta
+import time
+
+DEFAULT_AFTER_DAYS = 90
+# Joriy oy tushumi va oxirgi 30 kun reytingi jonli jadvaldan hisoblanadi
+MIN_AFTER_DAYS = 31
+DEFAULT_BATCH_SIZE = 500
+BATCH_PAUSE = 0.05  # soniya, partiyalar orasida yozuvchilarga navbat berish
+
+# Arxiv jadvalining archived_at dan boshqa barcha ustunlari bron bilan bir xil
+HISTORY_COLUMNS = tuple(column.name for column in Booking.__table__.columns)
+
+
+def booking_history(*names):
+    """Jonli va arxivdagi bronlar birlashmasi (faqat o'qish uchun subquery)"""
+    names = names or HISTORY_COLUMNS
+    return union_all(
+        select(*[Booking.__table__.c[name] for name in names]),
+        select(*[BookingArchive.__table__.c[name] for name in names])
+    ).subquery('booking_history')
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = current_app.config.get('BOOKING_ARCHIVE_AFTER_DAYS', DEFAULT_AFTER_DAYS)
+    return datetime.utcnow() - timedelta(days=max(days, MIN_AFTER_DAYS))
+
+
+def archive_bookings(days=None, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Tugashiga days kundan ko'p bo'lgan nofaol bronlarni arxivga ko'chirish.
+
+    Har partiya alohida qisqa tranzaksiya: arxivga INSERT ... SELECT va
+    asosiy jadvaldan DELETE. Ko'chirilgan bronlar soni qaytariladi.
+    """
+    cutoff = archive_cutoff(days)
+    columns = [Booking.__table__.c[name] for name in HISTORY_COLUMNS]
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = db.session.execute(
+            select(Booking.id).where(
+                Booking.is_active == False,
+                Booking.end_time < cutoff
+            ).order_by(Booking.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.session.execute(
+            insert(BookingArchive).from_select(
+                [*HISTORY_COLUMNS, 'archived_at'],
+                select(*columns, literal(datetime.utcnow(), BookingArchive.archived_at.type))
+                .where(Booking.id.in_(ids))
+            )
+        )
+        db.session.execute(
+            delete(Booking).where(Booking.id.in_(ids)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        moved += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+        time.sleep(BATCH_PAUSE)
+    return moved
@@ -0,0 +1,389 @@
+from src.services.sharding import SHARDED_TABLES, router as shards
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+DEFAULT_PAGES = 256           # bitta qadamda nusxalanadigan sahifalar
+DEFAULT_SLEEP = 0.005         # qadamlar orasidagi pauza, soniya
+DEFAULT_KEEP = 7
+DEFAULT_MAX_RESTARTS = 3
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+PROBE_INTERVAL = 0.05         # soniya
+BASELINE_PROBES = 20
+LATENCY_WINDOW = 60           # zaxiradan oldingi so'rovlar, soniya
+MANIFEST = 'manifest.json'
+
+_journal = {'mode': None, 'autocheckpoint': None}
+
+
+class BackupError(RuntimeError):
+    """Zaxira nusxa olinmadi yoki tekshiruvdan o'tmadi"""
+
+
+class BackupBusy(BackupError):
+    """Boshqa zaxira jarayoni ishlayapti"""
+
+
+class _Restarted(Exception):
+    pass
+
+
+@event.listens_for(Engine, 'connect')
+def _set_journal_mode(dbapi_connection, connection_record):
+    # WAL rejimida o'quvchilar (zaxira ham) yozuvchilarni to'smaydi
+    if _journal['mode'] and isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute(f"PRAGMA journal_mode={_journal['mode']}")
+        if _journal['autocheckpoint'] is not None:
+            dbapi_connection.execute(f"PRAGMA wal_autocheckpoint={int(_journal['autocheckpoint'])}")
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(fraction):
+        return round(values[min(len(values) - 1, int(fraction * len(values)))] * 1000, 2)
+
+    return {'count': len(values), 'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'max_ms': round(values[-1] * 1000, 2)}
+
+
+class _WriteProbe:
+    """Zaxira davomida yozuvchi qulfini olish vaqtini o'lchash (BEGIN EXCLUSIVE)"""
+
+    def __init__(self, path, interval=PROBE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self, connection):
+        started = time.perf_counter()
+        connection.execute('BEGIN EXCLUSIVE')
+        connection.execute('ROLLBACK')
+        return time.perf_counter() - started
+
+    def baseline(self, count=BASELINE_PROBES):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            samples = []
+            for _ in range(count):
+                samples.append(self.sample(connection))
+                time.sleep(self.interval / 5)
+            return samples
+        finally:
+            connection.close()
+
+    def _run(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            while not self._stop.is_set():
+                self.samples.append(self.sample(connection))
+                self._stop.wait(self.interval)
+        finally:
+            connection.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='backup-probe', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+
+class BackupManager:
+    """SQLite online backup API orqali bloklamaydigan zaxira nusxalar.
+
+    Nusxa kichik qadamlarda (BACKUP_PAGES sahifa) olinadi, har qadam orasida
+    yozuvchilarga navbat beriladi. Har bir nusxa <dir>/<vaqt>/ katalogida:
+    app.db, shard rejimida shards/*.db va manifest.json (davomiylik, sahifalar,
+    qatorlar soni, yozuvchi kechikishi). Katalog avval '.partial' nomi bilan
+    yoziladi va tiklash tekshiruvidan o'tgandan keyingina nomlanadi.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.pages = DEFAULT_PAGES
+        self.sleep = DEFAULT_SLEEP
+        self.keep = DEFAULT_KEEP
+        self.max_restarts = DEFAULT_MAX_RESTARTS
+        self.checkpoint_mode = 'PASSIVE'
+        self.last_report = None
+        self._central_path = None
+        self._metadata = None
+        self._thread = None
+        self._requests = deque(maxlen=5000)
+        self._state_lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.directory = app.config.get('BACKUP_DIR') or os.path.join(
+            os.path.dirname(app.root_path), 'database', 'backups'
+        )
+        self.pages = app.config.get('BACKUP_PAGES', DEFAULT_PAGES)
+        self.sleep = app.config.get('BACKUP_SLEEP', DEFAULT_SLEEP)
+        self.keep = app.config.get('BACKUP_KEEP', DEFAULT_KEEP)
+        self.max_restarts = app.config.get('BACKUP_MAX_RESTARTS', DEFAULT_MAX_RESTARTS)
+        self.checkpoint_mode = app.config.get('BACKUP_CHECKPOINT_MODE', 'PASSIVE').upper()
+        self._metadata = db.metadata
+        with app.app_context():
+            self._central_path = db.engine.url.database
+            if app.config.get('SQLITE_JOURNAL_MODE'):
+                _journal['mode'] = app.config['SQLITE_JOURNAL_MODE']
+                _journal['autocheckpoint'] = app.config.get('SQLITE_WAL_AUTOCHECKPOINT')
+                # Mavjud ulanishlar ham yangi rejim bilan qayta ochilsin
+                db.engine.dispose()
+
+        @app.before_request
+        def _mark_request_start():
+            g.backup_request_started = time.perf_counter()
+
+        @app.after_request
+        def _record_request(response):
+            started = g.get('backup_request_started')
+            if started is not None:
+                self._requests.append((time.time(), time.perf_counter() - started))
+            return response
+
+    @property
+    def available(self):
+        return bool(self._central_path) and self._central_path != ':memory:'
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _sources(self):
+        """[(nusxadagi nisbiy yo'l, manba fayl, jadvallar)]"""
+        central_tables = [name for name in self._metadata.tables if not (shards.enabled and name in SHARDED_TABLES)]
+        sources = [('app.db', self._central_path, central_tables)]
+        if shards.enabled:
+            for key in shards.keys():
+                path = os.path.join(shards.directory, f'{key}.db')
+                if os.path.exists(path):
+                    sources.append((os.path.join('shards', f'{key}.db'), path, sorted(SHARDED_TABLES)))
+        return sources
+
+    @contextmanager
+    def _exclusive(self):
+        # Bir nechta gunicorn ishchisi / CLI bir vaqtda zaxira olmasligi uchun
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, '.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise BackupBusy('Zaxira allaqachon olinmoqda')
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def checkpoint(self, mode=None, path=None):
+        """WAL checkpoint: {'busy', 'log', 'checkpointed'} (WAL bo'lmasa log=-1)"""
+        mode = (mode or self.checkpoint_mode).upper()
+        if mode not in CHECKPOINT_MODES:
+            raise BackupError(f'Checkpoint rejimi quyidagilardan biri: {", ".join(CHECKPOINT_MODES)}')
+        connection = sqlite3.connect(path or self._central_path, timeout=30)
+        try:
+            busy, log, checkpointed = connection.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        finally:
+            connection.close()
+        return {'mode': mode, 'busy': busy, 'log': log, 'checkpointed': checkpointed}
+
+    def _copy(self, source_path, target_path):
+        """Manbani qadamma-qadam nusxalash; qadam/qayta boshlash statistikasi"""
+        stats = {'steps': 0, 'restarts': 0, 'pages': 0, 'max_step_ms': 0.0, 'single_step': False}
+        state = {'remaining': None, 'tick': None}
+
+        def progress(status, remaining, total):
+            now = time.perf_counter()
+            stats['steps'] += 1
+            stats['pages'] = total
+            if state['tick'] is not None:
+                # Qadam vaqti = oldingi chaqiruvdan beri o'tgan vaqt - pauza
+                stats['max_step_ms'] = max(stats['max_step_ms'], round((now - state['tick'] - self.sleep) * 1000, 2))
+            state['tick'] = now
+            # Boshqa ulanish manbani o'zgartirsa backup boshidan boshlanadi
+            if state['remaining'] is not None and remaining > state['remaining']:
+                stats['restarts'] += 1
+                if stats['restarts'] > self.max_restarts:
+                    raise _Restarted()
+            state['remaining'] = remaining
+
+        source = sqlite3.connect(source_path, timeout=30)
+        try:
+            target = sqlite3.connect(target_path)
+            try:
+                state['tick'] = time.perf_counter()
+                try:
+                    source.backup(target, pages=self.pages, progress=progress, sleep=self.sleep)
+                except _Restarted:
+                    # Yozuvlar juda tez-tez - bitta qadamda (WAL da yozuvchilar baribir to'silmaydi)
+                    stats['single_step'] = True
+                    started = time.perf_counter()
+                    source.backup(target, pages=-1)
+                    stats['max_step_ms'] = max(stats['max_step_ms'], round((time.perf_counter() - started) * 1000, 2))
+            finally:
+                target.close()
+        finally:
+            source.close()
+        return stats
+
+    def verify(self, path, tables):
+        """Nusxani vaqtinchalik faylga tiklab tekshirish; {jadval: qatorlar}"""
+        restored = f'{path}.restore-check'
+        try:
+            self.restore(path, restored)
+            connection = sqlite3.connect(f'file:{restored}?mode=ro', uri=True)
+            try:
+                result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+                if result != 'ok':
+                    raise BackupError(f'{os.path.basename(path)}: integrity_check - {result}')
+                existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                missing = sorted(set(tables) - existing)
+                if missing:
+                    raise BackupError(f'{os.path.basename(path)}: jadvallar yo\'q - {", ".join(missing)}')
+                return {name: connection.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in sorted(tables)}
+            finally:
+                connection.close()
+        finally:
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(restored + suffix):
+                    os.remove(restored + suffix)
+
+    def restore(self, backup_path, target_path):
+        """Nusxani yangi faylga tiklash (mavjud faylni ustidan yozmaydi)"""
+        if os.path.exists(target_path):
+            raise BackupError(f'{target_path} allaqachon mavjud')
+        if not os.path.exists(backup_path):
+            raise BackupError(f'{backup_path} topilmadi')
+        source = sqlite3.connect(f'file:{backup_path}?mode=ro', uri=True)
+        try:
+            target = sqlite3.connect(target_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+    def run(self):
+        """Zaxira nusxa olish, tekshirish va eskilarini o'chirish; hisobot qaytaradi"""
+        if not self.available:
+            raise BackupError('Zaxira fayldagi SQLite bazani talab qiladi')
+        with self._exclusive():
+            return self._run_locked()
+
+    def _run_locked(self):
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')
+        partial = os.path.join(self.directory, f'{stamp}.partial')
+        os.makedirs(partial)
+        report = {'name': stamp, 'started_at': datetime.utcnow().isoformat(), 'files': {}}
+        try:
+            report['checkpoint'] = {name: self.checkpoint(path=path) for name, path, _ in self._sources()}
+            probe = _WriteProbe(self._central_path)
+            baseline = probe.baseline()
+            requests_before = [
+                duration for finished, duration in list(self._requests) if finished >= time.time() - LATENCY_WINDOW
+            ]
+            started_wall = time.time()
+            started = time.perf_counter()
+            probe.start()
+            try:
+                for name, path, tables in self._sources():
+                    target = os.path.join(partial, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    file_started = time.perf_counter()
+                    stats = self._copy(path, target)
+                    stats['seconds'] = round(time.perf_counter() - file_started, 3)
+                    stats['bytes'] = os.path.getsize(target)
+                    report['files'][name] = stats
+            finally:
+                during = probe.stop()
+            report['duration_seconds'] = round(time.perf_counter() - started, 3)
+
+            verify_started = time.perf_counter()
+            for name, path, tables in self._sources():
+                report['files'][name]['rows'] = self.verify(os.path.join(partial, name), tables)
+            report['verify_seconds'] = round(time.perf_counter() - verify_started, 3)
+
+            report['write_latency'] = {'baseline': _percentiles(baseline), 'during': _percentiles(during)}
+            # Faqat shu jarayon (ishchi) ko'rgan so'rovlar
+            report['request_latency'] = {
+                'before': _percentiles(requests_before),
+                'during': _percentiles([
+                    duration for finished, duration in list(self._requests) if finished >= started_wall
+                ])
+            }
+            report['finished_at'] = datetime.utcnow().isoformat()
+            with open(os.path.join(partial, MANIFEST), 'w') as stream:
+                json.dump(report, stream, indent=2)
+            os.rename(partial, os.path.join(self.directory, stamp))
+        except Exception:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+        report['removed'] = self.rotate()
+        self.last_report = report
+        return report
+
+    def start(self, app):
+        """Zaxirani fon oqimida boshlash (admin endpoint uchun); False - allaqachon ishlayapti"""
+        with self._state_lock:
+            if self.running:
+                return False
+
+            def work():
+                with app.app_context():
+                    try:
+                        self.run()
+                    except Exception as e:
+                        self.last_report = {'error': str(e), 'finished_at': datetime.utcnow().isoformat()}
+
+            self._thread = threading.Thread(target=work, name='backup', daemon=True)
+            self._thread.start()
+            return True
+
+    def snapshots(self):
+        """Tayyor nusxalar manifestlari (yangilari birinchi)"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        backups = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            manifest = os.path.join(self.directory, name, MANIFEST)
+            if os.path.exists(manifest):
+                with open(manifest) as stream:
+                    backups.append(json.load(stream))
+        return backups
+
+    def rotate(self):
+        """Oxirgi BACKUP_KEEP tadan eskilarini va chala qolganlarini o'chirish"""
+        removed = []
+        names = sorted(os.listdir(self.directory), reverse=True)
+        complete = [name for name in names if os.path.exists(os.path.join(self.directory, name, MANIFEST))]
+        for name in complete[self.keep:]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            removed.append(name)
+        for name in names:
+            if name.endswith('.partial'):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                removed.append(name)
+        return removed
+
+
+backups = BackupManager()
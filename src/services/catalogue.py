@@ -0,0 +1,130 @@
+from src.models.user import db
+from src.models.game_club import GameClub
+from src.models.room import Room
+from src.models.media_file import MediaFile
+from src.services.geo import free_computer_counts, free_count_changes
+from src.services.invalidation import bus as invalidation
+from src.services.sharding import per_club
+from sqlalchemy import func
+from datetime import datetime
+import threading
+
+
+class ClubCatalogue:
+    """Ommaviy klublar katalogining xotiradagi versiyali nusxasi"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._dirty_clubs = set()
+        self._loaded = False
+        self._snapshot = (0, ())
+        # Bron boshlanishi/tugashi bo'sh kompyuterlar sonini yozuvsiz o'zgartiradi:
+        # klub yozuvi shu vaqtgacha amal qiladi
+        self._expires = {}
+        self._next_expiry = None
+
+    def mark_dirty(self, club_ids):
+        with self._lock:
+            self._dirty_clubs.update(club_ids)
+
+    def invalidate(self):
+        """Butun katalogni keyingi so'rovda qayta qurish"""
+        with self._lock:
+            self._loaded = False
+
+    def snapshot(self):
+        """(versiya, yozuvlar) juftligini qaytarish"""
+        # Boshqa ishchilardagi o'zgarishlar
+        invalidation.poll()
+        self._expire()
+        if self._loaded and not self._dirty_clubs:
+            return self._snapshot
+        with self._lock:
+            if not self._loaded:
+                self._expires.clear()
+                self._records = self._build(None)
+                self._dirty_clubs.clear()
+                self._loaded = True
+            elif self._dirty_clubs:
+                club_ids = set(self._dirty_clubs)
+                self._dirty_clubs.clear()
+                for club_id in club_ids:
+                    self._records.pop(club_id, None)
+                self._records.update(self._build(club_ids))
+            else:
+                return self._snapshot
+
+            ordered = tuple(sorted(self._records.values(), key=lambda record: record['id']))
+            self._snapshot = (self._snapshot[0] + 1, ordered)
+            return self._snapshot
+
+    def _expire(self):
+        now = datetime.utcnow()
+        if self._next_expiry is None or self._next_expiry > now:
+            return
+        with self._lock:
+            expired = {club_id for club_id, expires_at in self._expires.items() if expires_at <= now}
+            for club_id in expired:
+                del self._expires[club_id]
+            self._dirty_clubs.update(expired)
+            self._next_expiry = min(self._expires.values(), default=None)
+
+    def _build(self, club_ids):
+        """Berilgan klublar (None - barchasi) uchun yozuvlarni yig'ish"""
+        clubs_query = db.session.query(
+            GameClub.id, GameClub.name, GameClub.address, GameClub.phone, GameClub.is_active
+        ).filter(GameClub.is_active == True)
+
+        if club_ids is not None:
+            if not club_ids:
+                return {}
+            clubs_query = clubs_query.filter(GameClub.id.in_(club_ids))
+
+        clubs = clubs_query.all()
+        if not clubs:
+            return {}
+
+        ids = [club.id for club in clubs]
+        rooms_count = per_club(ids, _rooms_count)
+        first_images = per_club(ids, _first_images)
+        free_counts = free_computer_counts(ids)
+        for club_id in ids:
+            self._expires.pop(club_id, None)
+        self._expires.update(free_count_changes(ids))
+        self._next_expiry = min(self._expires.values(), default=None)
+
+        records = {}
+        for club in clubs:
+            image_id = first_images.get(club.id)
+            records[club.id] = {
+                'id': club.id,
+                'name': club.name,
+                'address': club.address,
+                'phone': club.phone,
+                'is_active': club.is_active,
+                'rooms_count': rooms_count.get(club.id, 0),
+                'image_url': f'/api/media/{image_id}?club_id={club.id}' if image_id else None,
+                'free_computers': free_counts.get(club.id, 0)
+            }
+        return records
+
+
+def _rooms_count(club_ids):
+    return dict(db.session.query(
+        Room.game_club_id, func.count(Room.id)
+    ).filter(Room.game_club_id.in_(club_ids)).group_by(Room.game_club_id).all())
+
+
+def _first_images(club_ids):
+    return dict(db.session.query(
+        MediaFile.game_club_id, func.min(MediaFile.id)
+    ).filter(
+        MediaFile.game_club_id.in_(club_ids),
+        MediaFile.file_type == 'image',
+        MediaFile.is_active == True
+    ).group_by(MediaFile.game_club_id).all())
+
+
+catalogue = ClubCatalogue()
+invalidation.subscribe('game_club', catalogue.mark_dirty)
@@ -0,0 +1,224 @@
+from src.models.user import db
+from src.models.booking import Booking
+from src.services.sharding import fan_out
+from flask import current_app
+from sqlalchemy import text
+from datetime import datetime, timedelta
+from itertools import chain
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+# Ustunlar: nom -> numpy turi. Vaqtlar epoch soniyalarda (UTC)
+COLUMNS = {
+    'id': np.int64,
+    'game_club_id': np.int32,
+    'room_id': np.int32,
+    'computer_id': np.int32,
+    'admin_id': np.int32,
+    'created_at': np.int64,
+    'start_time': np.int64,
+    'end_time': np.int64,
+    'total_hours': np.float64,
+    'total_price': np.int64,
+    'is_active': np.bool_,
+    'is_completed': np.bool_
+}
+GROUP_KEYS = ('game_club_id', 'room_id', 'computer_id', 'admin_id')
+SUM_FIELDS = ('total_price', 'total_hours')
+FETCH_CHUNK = 20000
+KEEP_GENERATIONS = 2
+
+
+def _epoch_seconds(column):
+    return f'CAST(ROUND((julianday({column}) - 2440587.5) * 86400) AS INTEGER)'
+
+
+_SELECT_COLUMNS = ', '.join(
+    _epoch_seconds(name) if COLUMNS[name] is np.int64 and name.endswith(('_at', '_time'))
+    else f'COALESCE({name}, 0)'
+    for name in COLUMNS
+)
+# Jonli va arxivdagi bronlar birga eksport qilinadi
+_EXPORT_SQL = ' UNION ALL '.join(
+    f'SELECT {_SELECT_COLUMNS} FROM {table} WHERE created_at >= ? AND created_at < ?'
+    for table in ('booking', 'booking_archive')
+)
+_MONTHS_SQL = ' UNION '.join(
+    f"SELECT strftime('%Y-%m', created_at) FROM {table} WHERE created_at IS NOT NULL"
+    for table in ('booking', 'booking_archive')
+)
+
+
+def _db_datetime(value):
+    # SQLAlchemy SQLite DateTime saqlash formati
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _epoch(value):
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+def _month_bounds(month):
+    start = datetime.strptime(month, '%Y-%m')
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def _read_rows(start, end):
+    """Oy bronlari oqim bilan: (qatorlar x ustunlar) float64 massiv"""
+    cursor = db.session.connection(bind_arguments={'mapper': Booking.__mapper__}).connection.cursor()
+    try:
+        cursor.execute(_EXPORT_SQL, (_db_datetime(start), _db_datetime(end)) * 2)
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(FETCH_CHUNK)
+            if not rows:
+                break
+            chunks.append(np.fromiter(
+                chain.from_iterable(rows), dtype=np.float64, count=len(rows) * len(COLUMNS)
+            ).reshape(-1, len(COLUMNS)))
+    finally:
+        cursor.close()
+    return np.concatenate(chunks) if chunks else np.empty((0, len(COLUMNS)))
+
+
+class ColumnStore:
+    """Bronlarning oylik ustunli nusxasi (.npy fayllar, mmap bilan o'qiladi).
+
+    Tuzilishi: <root>/<YYYY-MM>/current -> g<vaqt>/<ustun>.npy + meta.json.
+    Eksport yangi avlod katalogiga yoziladi va 'current' havolasi atomar
+    almashtiriladi - o'quvchilar hech qachon yarim yozilgan faylni ko'rmaydi.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def months(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, 'current', 'meta.json'))
+        )
+
+    def meta(self, month):
+        with open(os.path.join(self.root, month, 'current', 'meta.json')) as stream:
+            return json.load(stream)
+
+    def exported_at(self):
+        """Oxirgi eksport vaqti (epoch) yoki None"""
+        months = self.months()
+        if not months:
+            return None
+        return max(self.meta(month)['exported_at'] for month in months)
+
+    def load(self, month, fields):
+        """Oy bo'limi ustunlari - xotiraga o'qilmaydi, mmap qilinadi"""
+        directory = os.path.realpath(os.path.join(self.root, month, 'current'))
+        return {field: np.load(os.path.join(directory, f'{field}.npy'), mmap_mode='r') for field in fields}
+
+    def export_month(self, month):
+        """Bitta oyni bazadan (shard rejimida - har bir shard dan) o'qib, ustunlarga yozish"""
+        start, end = _month_bounds(month)
+        data = np.concatenate([np.empty((0, len(COLUMNS))), *fan_out(lambda: _read_rows(start, end))])
+        data = data[np.argsort(data[:, 0], kind='stable')]
+
+        partition = os.path.join(self.root, month)
+        generation = f'g{time.time_ns()}'
+        target = os.path.join(partition, generation)
+        os.makedirs(target)
+        for index, (name, dtype) in enumerate(COLUMNS.items()):
+            np.save(os.path.join(target, f'{name}.npy'), data[:, index].astype(dtype))
+        with open(os.path.join(target, 'meta.json'), 'w') as stream:
+            json.dump({'month': month, 'rows': len(data), 'exported_at': time.time()}, stream)
+
+        link = os.path.join(partition, f'current.{generation}')
+        os.symlink(generation, link)
+        os.replace(link, os.path.join(partition, 'current'))
+        self._prune(partition)
+        return len(data)
+
+    def recent_months(self, count):
+        """Joriy oy va undan oldingi count-1 oy"""
+        month = datetime.utcnow().replace(day=1)
+        months = []
+        for _ in range(count):
+            months.append(month.strftime('%Y-%m'))
+            month = (month - timedelta(days=1)).replace(day=1)
+        return sorted(months)
+
+    def export(self, months=None):
+        """Oylarni eksport qilish (None - bazadagi barcha oylar); {oy: qatorlar}"""
+        if months is None:
+            months = sorted({
+                month
+                for part in fan_out(lambda: db.session.execute(
+                    text(_MONTHS_SQL), bind_arguments={'mapper': Booking.__mapper__}
+                ).scalars().all())
+                for month in part if month
+            })
+        return {month: self.export_month(month) for month in months}
+
+    def _prune(self, partition):
+        current = os.readlink(os.path.join(partition, 'current'))
+        generations = sorted(name for name in os.listdir(partition) if name.startswith('g'))
+        # Eski avlodlar: mmap qilgan o'quvchilar uchun ochiq fayllar o'chirilgandan keyin ham ishlaydi
+        for name in generations[:-KEEP_GENERATIONS]:
+            if name != current:
+                shutil.rmtree(os.path.join(partition, name), ignore_errors=True)
+
+    def _partitions(self, start, end):
+        for month in self.months():
+            month_start, month_end = _month_bounds(month)
+            if (start is None or month_end > start) and (end is None or month_start < end):
+                yield month
+
+    def group_sum(self, key, start=None, end=None, completed=None, sums=SUM_FIELDS):
+        """created_at oralig'idagi bronlarni key bo'yicha guruhlash.
+
+        {kalit: {'count': n, 'total_price': ..., 'total_hours': ...}}
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f'Guruhlash kaliti: {", ".join(GROUP_KEYS)}')
+        fields = [key, 'created_at', 'is_completed', *sums]
+        totals = {}
+        for month in self._partitions(start, end):
+            columns = self.load(month, fields)
+            mask = np.ones(len(columns[key]), dtype=bool)
+            if start is not None:
+                mask &= columns['created_at'] >= _epoch(start)
+            if end is not None:
+                mask &= columns['created_at'] < _epoch(end)
+            if completed is not None:
+                mask &= columns['is_completed'] == completed
+            keys, inverse = np.unique(columns[key][mask], return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(keys))
+            partial = {name: np.bincount(inverse, weights=columns[name][mask], minlength=len(keys)) for name in sums}
+            for index, value in enumerate(keys.tolist()):
+                group = totals.setdefault(value, dict.fromkeys(('count', *sums), 0))
+                group['count'] += int(counts[index])
+                for name in sums:
+                    group[name] += partial[name][index].item()
+        return totals
+
+    def top_k(self, key, k=5, by='count', **filters):
+        """Eng katta k ta guruh: [(kalit, guruh)] (k=None - hammasi, tartiblangan)"""
+        groups = self.group_sum(key, **filters)
+        return sorted(groups.items(), key=lambda item: (-item[1][by], item[0]))[:k]
+
+
+def get_store():
+    return ColumnStore(current_app.config['ANALYTICS_EXPORT_DIR'])
+
+
+def fresh_store():
+    """Eksport yetarlicha yangi bo'lsa ColumnStore, aks holda None"""
+    store = get_store()
+    exported_at = store.exported_at()
+    max_age = current_app.config.get('ANALYTICS_EXPORT_MAX_AGE', 3600)
+    if exported_at is None or time.time() - exported_at > max_age:
+        return None
+    return store
@@ -0,0 +1,224 @@
+from flask import g, jsonify, request
+from collections import deque
+import jwt
+import math
+import threading
+import time
+
+# Sinf: global sig'imning qancha qismigacha qabul qilinadi, navbatda kutish va
+# maqsadli kechikish (soniya). Og'ir so'rovlar hech qachon barcha oqimlarni egallamaydi
+PRIORITIES = {
+    'critical': {'share': 1.0, 'max_wait': 1.0, 'target_latency': 0.3},
+    'normal': {'share': 0.8, 'max_wait': 0.25, 'target_latency': 0.5},
+    'heavy': {'share': 0.5, 'max_wait': 0.0, 'target_latency': 2.0}
+}
+EXEMPT = 'exempt'
+DEFAULT_CLASS = 'normal'
+
+# endpoint yoki endpoint@rol -> sinf
+DEFAULT_ROUTE_CLASSES = {
+    'auth.login': 'critical',
+    'auth.refresh': 'critical',
+    'booking.create_booking': 'critical',
+    'booking.complete_booking': 'critical',
+    'booking.cancel_booking': 'critical',
+    'admin.get_concurrency': 'critical',
+    'game_club.get_dashboard_stats': 'heavy',
+    'game_club.get_occupancy_heatmap': 'heavy',
+    'booking.get_my_bookings@superadmin': 'heavy',
+    'booking.get_booking_statistics@superadmin': 'heavy',
+    'admin.get_admin_statistics': 'heavy',
+    'admin.get_booking_analytics': 'heavy',
+    'game_club.stream_events': EXEMPT,
+    'static': EXEMPT,
+    'serve': EXEMPT
+}
+
+DEFAULT_CAPACITY = 16
+DEFAULT_INITIAL_LIMIT = 8
+MIN_LIMIT = 1
+DECREASE_FACTOR = 0.9
+GROWTH_UTILISATION = 0.5  # chegara kamida shu ulushi band bo'lganda oshiriladi
+LATENCY_SMOOTHING = 0.2
+QUEUE_SAMPLES = 1000
+_SLOT_KEY = 'gameport.concurrency_slot'
+
+
+def _percentile(values, fraction):
+    return round(values[min(len(values) - 1, int(fraction * len(values)))] * 1000, 2) if values else None
+
+
+class RouteLimit:
+    """Bitta endpoint uchun AIMD chegarasi.
+
+    Kechikish sinf maqsadidan oshsa chegara DECREASE_FACTOR ga ko'paytiriladi
+    (bir kechikish oralig'ida ko'pi bilan bir marta), aks holda so'rov
+    boshlanganda chegaraning kamida GROWTH_UTILISATION qismi band bo'lsa
+    chegara 1/limit ga oshiriladi.
+    """
+
+    def __init__(self, name, priority, limit, max_limit):
+        self.name = name
+        self.priority = priority
+        self.limit = float(limit)
+        self.max_limit = max_limit
+        self.inflight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.latency = None
+        self._last_decrease = 0.0
+        self.queue_times = deque(maxlen=QUEUE_SAMPLES)
+
+    def record(self, latency, inflight_at_start):
+        now = time.monotonic()
+        self.latency = latency if self.latency is None else (
+            self.latency + LATENCY_SMOOTHING * (latency - self.latency)
+        )
+        if latency > PRIORITIES[self.priority]['target_latency']:
+            if now - self._last_decrease >= latency:
+                self.limit = max(MIN_LIMIT, self.limit * DECREASE_FACTOR)
+                self._last_decrease = now
+        elif inflight_at_start >= self.limit * GROWTH_UTILISATION:
+            self.limit = float(min(self.max_limit, self.limit + 1 / self.limit))
+
+    def retry_after(self):
+        return max(1, math.ceil(self.latency or 0))
+
+    def to_dict(self):
+        queue_times = sorted(self.queue_times)
+        return {
+            'route': self.name,
+            'priority': self.priority,
+            'limit': round(self.limit, 2),
+            'inflight': self.inflight,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'shed': self.shed,
+            'latency_ms': round(self.latency * 1000, 2) if self.latency is not None else None,
+            'queue_p50_ms': _percentile(queue_times, 0.5),
+            'queue_p95_ms': _percentile(queue_times, 0.95),
+            'queue_max_ms': round(queue_times[-1] * 1000, 2) if queue_times else None
+        }
+
+
+class ConcurrencyLimiter:
+    """Endpoint lar bo'yicha moslashuvchan parallellik chegarasi (jarayon ichida).
+
+    So'rov ikki shart bajarilganda qabul qilinadi: jarayondagi jami faol
+    so'rovlar sinf ulushidan (CONCURRENCY_CAPACITY * share) kam va endpoint
+    chegarasi to'lmagan. Aks holda so'rov sinfning max_wait vaqtigacha
+    navbatda kutadi, keyin darhol 503 + Retry-After bilan rad etiladi.
+
+    Holat har bir ishchi jarayonga tegishli, shuning uchun ishchilar gthread
+    bo'lishi va CONCURRENCY_CAPACITY ishchi oqimlari soniga teng bo'lishi kerak
+    (sync ishchida bir vaqtda faqat bitta so'rov bo'ladi va hech narsa rad etilmaydi).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.capacity = DEFAULT_CAPACITY
+        self.initial_limit = DEFAULT_INITIAL_LIMIT
+        self.route_classes = dict(DEFAULT_ROUTE_CLASSES)
+        self.inflight = 0
+        self._routes = {}
+        self._condition = threading.Condition()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CONCURRENCY_ENABLED', True)
+        self.capacity = app.config.get('CONCURRENCY_CAPACITY', DEFAULT_CAPACITY)
+        self.initial_limit = min(self.capacity, app.config.get('CONCURRENCY_INITIAL_LIMIT', DEFAULT_INITIAL_LIMIT))
+        self.route_classes.update(app.config.get('CONCURRENCY_ROUTE_CLASSES') or {})
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def classify(self, endpoint):
+        """(qoida nomi, sinf); rolga bog'liq qoidalar uchun token imzosiz o'qiladi
+        (faqat sinflash uchun - haqiqiy tekshiruv token_required da)"""
+        if endpoint is None:
+            return None, EXEMPT
+        if f'{endpoint}@superadmin' in self.route_classes or f'{endpoint}@admin' in self.route_classes:
+            role = None
+            header = request.headers.get('Authorization', '')
+            if header.startswith('Bearer '):
+                try:
+                    role = jwt.decode(header[7:], options={'verify_signature': False}).get('role')
+                except jwt.InvalidTokenError:
+                    pass
+            if f'{endpoint}@{role}' in self.route_classes:
+                return f'{endpoint}@{role}', self.route_classes[f'{endpoint}@{role}']
+        return endpoint, self.route_classes.get(endpoint, DEFAULT_CLASS)
+
+    def _route(self, name, priority):
+        route = self._routes.get(name)
+        if route is None:
+            route = self._routes[name] = RouteLimit(name, priority, self.initial_limit, self.capacity)
+        return route
+
+    def _has_room(self, route):
+        return (
+            self.inflight < self.capacity * PRIORITIES[route.priority]['share']
+            and route.inflight < int(route.limit)
+        )
+
+    def _admit(self):
+        # Batch ichidagi so'rovlar tashqi so'rov slotidan foydalanadi
+        if not self.enabled or g.get('concurrency_admitted'):
+            return None
+        name, priority = self.classify(request.endpoint)
+        if priority == EXEMPT:
+            return None
+
+        started = time.monotonic()
+        with self._condition:
+            route = self._route(name, priority)
+            if not self._has_room(route):
+                deadline = started + PRIORITIES[priority]['max_wait']
+                route.queued += 1
+                while not self._has_room(route):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        route.shed += 1
+                        response = jsonify({'message': 'Server band, birozdan keyin qayta urinib ko\'ring'})
+                        response.status_code = 503
+                        response.headers['Retry-After'] = str(route.retry_after())
+                        return response
+                    self._condition.wait(remaining)
+            waited = time.monotonic() - started
+            route.queue_times.append(waited)
+            route.inflight += 1
+            route.admitted += 1
+            self.inflight += 1
+            request.environ[_SLOT_KEY] = (route, time.monotonic(), route.inflight)
+        g.concurrency_admitted = True
+        return None
+
+    def _release(self, exc=None):
+        slot = request.environ.pop(_SLOT_KEY, None)
+        if slot is None:
+            return
+        route, started, inflight_at_start = slot
+        with self._condition:
+            route.inflight -= 1
+            self.inflight -= 1
+            route.record(time.monotonic() - started, inflight_at_start)
+            self._condition.notify_all()
+
+    def metrics(self):
+        with self._condition:
+            routes = [route.to_dict() for route in self._routes.values()]
+        by_priority = {}
+        for route in routes:
+            totals = by_priority.setdefault(route['priority'], {'admitted': 0, 'shed': 0, 'inflight': 0})
+            for name in totals:
+                totals[name] += route[name]
+        return {
+            'enabled': self.enabled,
+            'capacity': self.capacity,
+            'inflight': self.inflight,
+            'priorities': by_priority,
+            'routes': sorted(routes, key=lambda route: route['route'])
+        }
+
+
+limiter = ConcurrencyLimiter()
@@ -0,0 +1,196 @@
+from src.models.user import db
+from src.models.live_event import LiveEvent
+from src.services.sharding import club_scope, router as shards
+from sqlalchemy import event, select, delete
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+DEFAULT_POLL_INTERVAL = 0.5   # soniya
+DEFAULT_RETENTION = 300       # soniya
+SUBSCRIBER_QUEUE_SIZE = 1000
+_PENDING_KEY = 'live_events'
+
+
+class Subscription:
+    def __init__(self, game_club_id):
+        self.game_club_id = game_club_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Sekin mijoz - ulanish yopiladi, u Last-Event-ID bilan qayta ulanadi
+            self.overflowed = True
+
+
+class EventBus:
+    """Jarayon ichidagi pub/sub + SQLite jadvali orqali ishchilararo tarqatish.
+
+    Obunachilarga hodisalarni faqat poller yuboradi - har bir fayl (shard)
+    bo'yicha id tartibida. Bitta SQLite faylga yozuvchilar navbat bilan
+    ishlaydi, shuning uchun commit tartibi id tartibiga teng va Last-Event-ID
+    dan davom etganda hodisa tushib qolmaydi. Lokal commit pollerni uyg'otadi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._app = None
+        self._poller = None
+        self._poller_pid = None
+        self._wake = threading.Event()
+        self._last_ids = {}
+
+    def init_app(self, app):
+        self._app = app
+
+    @property
+    def origin(self):
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def publish(self, game_club_id, event_type, data):
+        """Hodisani sessiyaga yozish; commit dan keyin obunachilarga yuboriladi"""
+        db.session.add(LiveEvent(
+            game_club_id=game_club_id,
+            type=event_type,
+            payload=json.dumps(data, separators=(',', ':')),
+            origin=self.origin
+        ))
+
+    def wake(self):
+        self._wake.set()
+
+    def subscribe(self, game_club_id):
+        subscription = Subscription(game_club_id)
+        # Fayl hali kuzatilmayotgan bo'lsa poller shu paytdan boshlaydi (oldingilari - replay orqali)
+        latest = self.latest_id(game_club_id)
+        with self._lock:
+            self._subscribers.setdefault(game_club_id, set()).add(subscription)
+            self._last_ids.setdefault(self._key(game_club_id), latest)
+        self._ensure_poller()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.game_club_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.game_club_id]
+                    key = self._key(subscription.game_club_id)
+                    if not any(self._key(club_id) == key for club_id in self._subscribers):
+                        self._last_ids.pop(key, None)
+
+    def latest_id(self, game_club_id):
+        with club_scope(game_club_id):
+            return db.session.execute(
+                select(db.func.coalesce(db.func.max(LiveEvent.id), 0))
+            ).scalar()
+
+    def replay(self, game_club_id, after_id):
+        """Last-Event-ID dan keyingi hodisalar (qayta ulanishda)"""
+        with club_scope(game_club_id):
+            rows = db.session.execute(
+                select(LiveEvent.id, LiveEvent.game_club_id, LiveEvent.type, LiveEvent.payload).where(
+                    LiveEvent.game_club_id == game_club_id,
+                    LiveEvent.id > after_id
+                ).order_by(LiveEvent.id)
+            ).all()
+        return [tuple(row) for row in rows]
+
+    def dispatch(self, items):
+        """(id, club_id, type, payload) yozuvlarini lokal obunachilarga yuborish"""
+        with self._lock:
+            targets = {club_id: list(subs) for club_id, subs in self._subscribers.items()}
+        for item in items:
+            for subscription in targets.get(item[1], ()):
+                subscription.push(item)
+
+    @staticmethod
+    def _key(game_club_id):
+        # Shard rejimi o'chiq bo'lsa barcha hodisalar markaziy bazada
+        return shards.shard_for(game_club_id) if shards.enabled else None
+
+    @staticmethod
+    def _engine(key):
+        return db.engine if key is None else shards.engine(key)
+
+    def _ensure_poller(self):
+        if self._app is None:
+            return
+        with self._lock:
+            if self._poller is not None and self._poller_pid == os.getpid() and self._poller.is_alive():
+                return
+            self._poller = threading.Thread(target=self._poll_loop, name='live-events', daemon=True)
+            self._poller_pid = os.getpid()
+            self._poller.start()
+
+    def _poll_loop(self):
+        with self._app.app_context():
+            interval = self._app.config.get('LIVE_EVENTS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+            retention = self._app.config.get('LIVE_EVENTS_RETENTION', DEFAULT_RETENTION)
+            last_prune = 0.0
+            while True:
+                self._wake.wait(interval)
+                self._wake.clear()
+                with self._lock:
+                    positions = dict(self._last_ids)
+                for key, last_id in positions.items():
+                    try:
+                        self._poll(key, last_id)
+                    except Exception as e:
+                        print(f"Jonli hodisalarni o'qishda xatolik: {e}")
+                if time.monotonic() - last_prune > retention / 2:
+                    self._prune(retention)
+                    last_prune = time.monotonic()
+
+    def _poll(self, key, last_id):
+        with self._engine(key).connect() as connection:
+            rows = connection.execute(
+                select(LiveEvent.id, LiveEvent.game_club_id, LiveEvent.type, LiveEvent.payload)
+                .where(LiveEvent.id > last_id).order_by(LiveEvent.id)
+            ).all()
+        if not rows:
+            return
+        self.dispatch([tuple(row) for row in rows])
+        with self._lock:
+            # Obunachilar o'zgargan bo'lsa (fayl qayta kuzatila boshlangan) joy yangidan olingan
+            if self._last_ids.get(key) == last_id:
+                self._last_ids[key] = rows[-1].id
+
+    def _prune(self, retention):
+        cutoff = datetime.utcnow() - timedelta(seconds=retention)
+        for key in shards.keys() if shards.enabled else [None]:
+            try:
+                with self._engine(key).begin() as connection:
+                    connection.execute(delete(LiveEvent).where(LiveEvent.created_at < cutoff))
+            except Exception as e:
+                print(f"Jonli hodisalarni tozalashda xatolik: {e}")
+
+
+bus = EventBus()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_events(session, flush_context):
+    if any(isinstance(obj, LiveEvent) for obj in session.new):
+        session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_poller(session):
+    if session.info.pop(_PENDING_KEY, False):
+        bus.wake()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_events(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,188 @@
+from src.models.user import db
+from src.models.game_club import GameClub
+from src.models.room import Room
+from src.models.computer import Computer
+from src.models.booking import Booking
+from src.services.sharding import per_club
+from sqlalchemy import case, event, func, select, text
+from datetime import datetime
+import math
+
+# R*Tree virtual jadvali: har bir klub uchun nuqta (min == max)
+GEO_TABLE = 'game_club_geo'
+EARTH_RADIUS_KM = 6371.0088
+
+_UPSERT_SQL = text(
+    f'INSERT OR REPLACE INTO {GEO_TABLE} (id, min_lat, max_lat, min_lng, max_lng) '
+    'VALUES (:id, :lat, :lat, :lng, :lng)'
+)
+_DELETE_SQL = text(f'DELETE FROM {GEO_TABLE} WHERE id = :id')
+_BBOX_SQL = text(
+    f'SELECT g.id, g.name, g.address, g.phone, g.latitude, g.longitude '
+    f'FROM {GEO_TABLE} AS i JOIN game_club AS g ON g.id = i.id '
+    'WHERE i.max_lat >= :lat_min AND i.min_lat <= :lat_max '
+    'AND i.max_lng >= :lng_min AND i.min_lng <= :lng_max '
+    'AND g.is_active = 1'
+)
+
+
+def init_geo_index():
+    """R*Tree indeksini yaratish va mavjud klublar bilan to'ldirish"""
+    db.session.execute(text(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {GEO_TABLE} '
+        'USING rtree(id, min_lat, max_lat, min_lng, max_lng)'
+    ))
+    db.session.execute(text(f'DELETE FROM {GEO_TABLE}'))
+    db.session.execute(text(
+        f'INSERT INTO {GEO_TABLE} (id, min_lat, max_lat, min_lng, max_lng) '
+        'SELECT id, latitude, latitude, longitude, longitude FROM game_club '
+        'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+    ))
+    db.session.commit()
+
+
+def _sync_club(connection, club):
+    if club.latitude is None or club.longitude is None:
+        connection.execute(_DELETE_SQL, {'id': club.id})
+    else:
+        connection.execute(_UPSERT_SQL, {
+            'id': club.id,
+            'lat': float(club.latitude),
+            'lng': float(club.longitude)
+        })
+
+
+def index_clubs(clubs):
+    """Bulk insert bilan yaratilgan klublarni indeksga qo'shish"""
+    params = [
+        {'id': club['id'], 'lat': float(club['latitude']), 'lng': float(club['longitude'])}
+        for club in clubs
+        if club.get('latitude') is not None and club.get('longitude') is not None
+    ]
+    if params:
+        db.session.execute(_UPSERT_SQL, params)
+
+
+@event.listens_for(GameClub, 'after_insert')
+def _club_inserted(mapper, connection, target):
+    _sync_club(connection, target)
+
+
+@event.listens_for(GameClub, 'after_update')
+def _club_updated(mapper, connection, target):
+    _sync_club(connection, target)
+
+
+@event.listens_for(GameClub, 'after_delete')
+def _club_deleted(mapper, connection, target):
+    connection.execute(_DELETE_SQL, {'id': target.id})
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Ikki nuqta orasidagi katta doira masofasi (km)"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _bounding_boxes(lat, lng, radius_km):
+    """R*Tree uchun (lat_min, lat_max, lng_min, lng_max) oraliqlari.
+
+    Quti ±180 uzunlikdan oshsa u ikkiga bo'linadi (antimeridianning ikki tomoni).
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6 or lat + dlat >= 90 or lat - dlat <= -90:
+        # Qutb yaqinida uzunlik bo'yicha cheklab bo'lmaydi
+        return [(max(lat - dlat, -90.0), min(lat + dlat, 90.0), -180.0, 180.0)]
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    if dlng >= 180.0:
+        return [(lat - dlat, lat + dlat, -180.0, 180.0)]
+    lng_min, lng_max = lng - dlng, lng + dlng
+    if lng_min < -180.0:
+        return [(lat - dlat, lat + dlat, -180.0, lng_max), (lat - dlat, lat + dlat, lng_min + 360.0, 180.0)]
+    if lng_max > 180.0:
+        return [(lat - dlat, lat + dlat, lng_min, 180.0), (lat - dlat, lat + dlat, -180.0, lng_max - 360.0)]
+    return [(lat - dlat, lat + dlat, lng_min, lng_max)]
+
+
+def free_computer_counts(club_ids):
+    """Klublar bo'yicha hozir bo'sh kompyuterlar soni (har shard uchun bitta so'rov)"""
+    if not club_ids:
+        return {}
+    return per_club(club_ids, _free_computer_counts)
+
+
+def _free_computer_counts(club_ids):
+    # Band - hozir davom etayotgan bron bor (Booking.in_progress), is_available emas
+    busy = select(Booking.computer_id).where(Booking.in_progress(datetime.utcnow()))
+    rows = db.session.query(
+        Room.game_club_id, func.count(Computer.id)
+    ).join(Computer, Computer.room_id == Room.id).filter(
+        Room.game_club_id.in_(club_ids),
+        Room.is_active == True,
+        Computer.is_active == True,
+        Computer.id.notin_(busy)
+    ).group_by(Room.game_club_id).all()
+    return {club_id: count for club_id, count in rows}
+
+
+def free_count_changes(club_ids):
+    """Klublar bo'yicha bo'sh kompyuterlar soni keyingi o'zgaradigan vaqt
+    (eng yaqin bron boshlanishi yoki tugashi); faol broni yo'q klublar natijaga kirmaydi"""
+    if not club_ids:
+        return {}
+    return per_club(club_ids, _free_count_changes)
+
+
+def _free_count_changes(club_ids):
+    now = datetime.utcnow()
+    change = case((Booking.start_time > now, Booking.start_time), else_=Booking.end_time)
+    rows = db.session.query(Booking.game_club_id, func.min(change)).filter(
+        Booking.game_club_id.in_(club_ids),
+        Booking.is_active == True,
+        Booking.end_time > now
+    ).group_by(Booking.game_club_id).all()
+    return {club_id: changes_at for club_id, changes_at in rows}
+
+
+def find_nearby_clubs(lat, lng, radius_km, limit, free_only=False):
+    """Radius ichidagi klublar, masofa bo'yicha tartiblangan"""
+    rows = {}
+    for lat_min, lat_max, lng_min, lng_max in _bounding_boxes(lat, lng, radius_km):
+        for row in db.session.execute(_BBOX_SQL, {
+            'lat_min': lat_min, 'lat_max': lat_max,
+            'lng_min': lng_min, 'lng_max': lng_max
+        }):
+            rows[row.id] = row
+
+    candidates = []
+    for row in rows.values():
+        distance = haversine_km(lat, lng, row.latitude, row.longitude)
+        if distance <= radius_km:
+            candidates.append((distance, row))
+    candidates.sort(key=lambda item: item[0])
+
+    free_counts = free_computer_counts([row.id for _, row in candidates])
+
+    clubs = []
+    for distance, row in candidates:
+        free = free_counts.get(row.id, 0)
+        if free_only and free == 0:
+            continue
+        clubs.append({
+            'id': row.id,
+            'name': row.name,
+            'address': row.address,
+            'phone': row.phone,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'distance_km': round(distance, 3),
+            'free_computers': free
+        })
+        if len(clubs) >= limit:
+            break
+    return clubs
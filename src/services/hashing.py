@@ -0,0 +1,106 @@
+from flask import current_app, has_app_context
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+import os
+import threading
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT = 10  # soniya
+
+_lock = threading.Lock()
+_pool = None
+_pool_key = None
+_slots = None
+
+
+class HashingBusy(Exception):
+    """Xeshlash navbati to'lgan"""
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def hash_method():
+    """Joriy xeshlash usuli va narxi, masalan 'scrypt:32768:8:1'"""
+    return _config('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def _get_pool():
+    """Cheklangan jarayon puli (gunicorn fork qilgandan keyin qayta yaratiladi)"""
+    global _pool, _pool_key, _slots
+    workers = _config('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+    if workers <= 0:
+        return None, None
+    queue_size = _config('PASSWORD_HASH_QUEUE', workers * 4)
+    key = (os.getpid(), workers, queue_size)
+    with _lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None and _pool_key[0] == os.getpid():
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_key = key
+            _slots = threading.BoundedSemaphore(queue_size)
+        return _pool, _slots
+
+
+def _run(fn, *args):
+    pool, slots = _get_pool()
+    if pool is None:
+        return fn(*args)
+    # Navbat to'lgan bo'lsa kutmasdan darhol 503
+    if not slots.acquire(blocking=False):
+        raise HashingBusy('Parol xeshlash navbati to\'lgan')
+    try:
+        future = pool.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_config('PASSWORD_HASH_TIMEOUT', DEFAULT_TIMEOUT))
+    except FutureTimeout:
+        future.cancel()
+        raise HashingBusy('Parol xeshlash juda uzoq davom etdi')
+
+
+def hash_password(password):
+    """Parolni jarayon pulida xeshlash"""
+    return _run(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash, password):
+    """Parolni jarayon pulida tekshirish"""
+    return _run(check_password_hash, password_hash, password)
+
+
+def normalize_method(method):
+    """Usulni werkzeug xeshga yozadigan to'liq shaklga keltirish:
+    'scrypt' -> 'scrypt:32768:8:1', 'pbkdf2:sha256' -> 'pbkdf2:sha256:1000000'"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    return method
+
+
+def needs_rehash(password_hash):
+    """Xesh joriy usul va narxdan farq qiladimi?"""
+    return password_hash.split('$', 1)[0] != normalize_method(hash_method())
+
+
+def hash_passwords(passwords):
+    """Parollarni parallel ravishda xeshlash (tartib saqlanadi)"""
+    passwords = list(passwords)
+    method = hash_method()
+    pool, _ = _get_pool()
+    if pool is None or len(passwords) < 2:
+        return [generate_password_hash(password, method) for password in passwords]
+    return list(pool.map(generate_password_hash, passwords, [method] * len(passwords), chunksize=8))
@@ -0,0 +1,345 @@
+from src.models.user import db
+from src.models.room import Room
+from src.models.computer import Computer
+from src.models.booking import Booking
+from src.models.computer_presence import ComputerPresence, ComputerStateChange
+from src.services.events import bus
+from src.services.invalidation import bus as invalidation
+from src.services.sharding import club_scope
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, timedelta
+import os
+import threading
+import time
+
+STATES = ('session', 'idle', 'offline')
+DEFAULT_CAPACITY = 65536
+DEFAULT_FLUSH_INTERVAL = 2.0        # soniya
+DEFAULT_OFFLINE_AFTER = 30          # soniya, heartbeat kelmasa offline
+DEFAULT_RECONCILE_INTERVAL = 30     # soniya
+MAX_CACHED_CLUBS = 1000
+
+
+class HeartbeatRing:
+    """Belgilangan sig'imli halqa bufer: yozish O(1), to'lsa eng eskilari tashlanadi"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._head = 0  # jami yozilganlar
+        self._tail = 0  # o'qib olinganlar
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._head - self._tail
+
+    def extend(self, items):
+        with self._lock:
+            for item in items:
+                self._slots[self._head % self.capacity] = item
+                self._head += 1
+            overflow = self._head - self._tail - self.capacity
+            if overflow > 0:
+                # Oraliq holatlar yo'qoladi, har kompyuterning eng yangisi qoladi
+                self._tail += overflow
+                self.dropped += overflow
+
+    def drain(self):
+        with self._lock:
+            items = [self._slots[index % self.capacity] for index in range(self._tail, self._head)]
+            self._tail = self._head
+        return items
+
+
+def coalesce(items):
+    """(klub, kompyuter, holat, vaqt) yozuvlari -> {(klub, kompyuter): [(holat, birinchi, oxirgi, soni), ...]}
+
+    Ketma-ket bir xil holatlar bittaga qisqartiriladi (faqat oxirgi vaqti
+    saqlanadi), shuning uchun ro'yxat - holat o'tishlari zanjiri.
+    """
+    chains = {}
+    for club_id, computer_id, state, seen_at in items:
+        chain = chains.setdefault((club_id, computer_id), [])
+        if chain and chain[-1][0] == state:
+            chain[-1] = (state, chain[-1][1], seen_at, chain[-1][3] + 1)
+        else:
+            chain.append((state, seen_at, seen_at, 1))
+    return chains
+
+
+class HeartbeatIngestor:
+    """Kompyuter heartbeat larini xotirada yig'ib, oraliq bilan bazaga yozish.
+
+    So'rov faqat halqa buferga qo'shadi. Fon oqimi har FLUSH_INTERVAL da
+    buferni bo'shatadi: har kompyuter uchun oxirgi holat va last_seen bitta
+    executemany UPSERT bilan, holat o'tishlari jurnalga va jonli hodisalarga
+    yoziladi. Har RECONCILE_INTERVAL da jim qolgan kompyuterlar offline
+    qilinadi va holatlar bronlar bilan solishtiriladi.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._ring = HeartbeatRing()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+        self._club_computers = {}
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self.offline_after = DEFAULT_OFFLINE_AFTER
+        self.reconcile_interval = DEFAULT_RECONCILE_INTERVAL
+        self.fix_availability = True
+        self.stats = {'received': 0, 'flushed': 0, 'transitions': 0, 'last_flush_ms': None}
+
+    def init_app(self, app):
+        self._app = app
+        self._ring = HeartbeatRing(app.config.get('HEARTBEAT_BUFFER_CAPACITY', DEFAULT_CAPACITY))
+        self.flush_interval = app.config.get('HEARTBEAT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        self.offline_after = app.config.get('HEARTBEAT_OFFLINE_AFTER', DEFAULT_OFFLINE_AFTER)
+        self.reconcile_interval = app.config.get('HEARTBEAT_RECONCILE_INTERVAL', DEFAULT_RECONCILE_INTERVAL)
+        self.fix_availability = app.config.get('HEARTBEAT_FIX_AVAILABILITY', False)
+
+    def evict(self, club_ids):
+        with self._lock:
+            for club_id in club_ids:
+                self._club_computers.pop(club_id, None)
+
+    def club_computers(self, club_id):
+        """Klubning faol kompyuter id lari (klub versiyasi bo'yicha keshlanadi)"""
+        version = invalidation.version('game_club', club_id)
+        entry = self._club_computers.get(club_id)
+        if entry and entry[0] == version:
+            return entry[1]
+        with club_scope(club_id):
+            ids = frozenset(db.session.execute(
+                select(Computer.id).join(Room).where(
+                    Room.game_club_id == club_id,
+                    Computer.is_active == True
+                )
+            ).scalars())
+        with self._lock:
+            if len(self._club_computers) >= MAX_CACHED_CLUBS:
+                self._club_computers.pop(next(iter(self._club_computers)))
+            self._club_computers[club_id] = (version, ids)
+        return ids
+
+    def ingest(self, club_id, heartbeats):
+        """[(kompyuter id, holat)] ni buferga qo'shish; qabul qilinganlar soni"""
+        now = datetime.utcnow()
+        self._ring.extend((club_id, computer_id, state, now) for computer_id, state in heartbeats)
+        self.stats['received'] += len(heartbeats)
+        self._ensure_flusher()
+        return len(heartbeats)
+
+    def _ensure_flusher(self):
+        if self._app is None:
+            return
+        if self._flusher is not None and self._flusher_pid == os.getpid() and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid() and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='heartbeats', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _flush_loop(self):
+        with self._app.app_context():
+            last_reconcile = time.monotonic()
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                    if time.monotonic() - last_reconcile >= self.reconcile_interval:
+                        self.mark_offline()
+                        self.reconcile(fix=self.fix_availability)
+                        last_reconcile = time.monotonic()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Heartbeat larni yozishda xatolik: {e}")
+                finally:
+                    db.session.remove()
+
+    def flush(self):
+        """Buferdagi heartbeat larni bazaga yozish; yozilgan kompyuterlar soni"""
+        items = self._ring.drain()
+        if not items:
+            return 0
+        started = time.perf_counter()
+        chains = coalesce(items)
+        table = ComputerPresence.__table__
+        club_ids = sorted({club_id for club_id, _ in chains})
+        # Oldingi holat boshqa ishchi yozgan bo'lishi mumkin - bazadan olinadi
+        previous = {
+            (club_id, computer_id): (state, last_seen)
+            for club_id, computer_id, state, last_seen in db.session.execute(
+                select(table.c.game_club_id, table.c.computer_id, table.c.state, table.c.last_seen).where(
+                    table.c.game_club_id.in_(club_ids)
+                )
+            )
+        }
+
+        rows, changes = [], []
+        for (club_id, computer_id), chain in chains.items():
+            state, last_seen = previous.get((club_id, computer_id), (None, None))
+            if last_seen is not None and chain[-1][2] < last_seen:
+                continue  # boshqa ishchi yangiroq holat yozgan
+            for next_state, first_seen, _, _ in chain:
+                if next_state != state:
+                    changes.append({
+                        'game_club_id': club_id, 'computer_id': computer_id,
+                        'from_state': state, 'to_state': next_state, 'changed_at': first_seen
+                    })
+                    state = next_state
+            final_state, first_seen, seen_at, _ = chain[-1]
+            rows.append({
+                'game_club_id': club_id, 'computer_id': computer_id, 'state': final_state,
+                'state_since': first_seen, 'last_seen': seen_at,
+                'heartbeats': sum(count for *_, count in chain)
+            })
+
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.game_club_id, table.c.computer_id],
+            set_={
+                'state': statement.excluded.state,
+                'state_since': case(
+                    (table.c.state == statement.excluded.state, table.c.state_since),
+                    else_=statement.excluded.state_since
+                ),
+                'last_seen': statement.excluded.last_seen,
+                'heartbeats': table.c.heartbeats + statement.excluded.heartbeats
+            },
+            where=statement.excluded.last_seen >= table.c.last_seen
+        )
+        connection = db.session.connection(bind_arguments={'mapper': ComputerPresence.__mapper__})
+        if rows:
+            connection.execute(statement, rows)
+        self._record_changes(connection, changes)
+        db.session.commit()
+
+        self.stats['flushed'] += len(rows)
+        self.stats['transitions'] += len(changes)
+        self.stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return len(rows)
+
+    def _record_changes(self, connection, changes):
+        if not changes:
+            return
+        connection.execute(insert(ComputerStateChange.__table__), changes)
+        by_club = {}
+        for change in changes:
+            by_club.setdefault(change['game_club_id'], []).append(change)
+        # Shard rejimida hodisalar klub fayliga yoziladi
+        for club_id, club_changes in by_club.items():
+            with club_scope(club_id):
+                for change in club_changes:
+                    bus.publish(club_id, 'computer.state', {
+                        'computer_id': change['computer_id'],
+                        'from': change['from_state'],
+                        'state': change['to_state'],
+                        'at': change['changed_at'].isoformat()
+                    })
+                db.session.flush()
+
+    def mark_offline(self, now=None):
+        """offline_after soniya heartbeat kelmagan kompyuterlarni offline qilish"""
+        now = now or datetime.utcnow()
+        table = ComputerPresence.__table__
+        connection = db.session.connection(bind_arguments={'mapper': ComputerPresence.__mapper__})
+        # RETURNING - bir nechta ishchi bir vaqtda ishlasa ham o'tish bir marta yoziladi
+        changes = []
+        for state in STATES:
+            if state == 'offline':
+                continue
+            changes.extend(
+                {'game_club_id': club_id, 'computer_id': computer_id,
+                 'from_state': state, 'to_state': 'offline', 'changed_at': now}
+                for club_id, computer_id in connection.execute(
+                    update(table).where(
+                        table.c.state == state,
+                        table.c.last_seen < now - timedelta(seconds=self.offline_after)
+                    ).values(state='offline', state_since=now).returning(
+                        table.c.game_club_id, table.c.computer_id
+                    )
+                )
+            )
+        self._record_changes(connection, changes)
+        db.session.commit()
+        return len(changes)
+
+    def presence(self, club_id):
+        """{kompyuter id: ComputerPresence}"""
+        return {
+            row.computer_id: row
+            for row in ComputerPresence.query.filter_by(game_club_id=club_id).all()
+        }
+
+    def reconcile(self, club_ids=None, fix=False):
+        """Heartbeat holatlari, Computer.is_available va faol bronlarni solishtirish.
+
+        {klub: {'stale_unavailable', 'stale_available', 'session_without_booking',
+        'booked_offline'}} - kompyuter id lari. fix=True bo'lsa is_available
+        hozir davom etayotgan bronlar bo'yicha tuzatiladi (bron - haqiqat manbai).
+        """
+        if club_ids is None:
+            club_ids = db.session.execute(
+                select(ComputerPresence.game_club_id).distinct()
+            ).scalars().all()
+        now = datetime.utcnow()
+        report = {}
+        for club_id in club_ids:
+            presence = {
+                computer_id: state
+                for computer_id, state in db.session.execute(
+                    select(ComputerPresence.computer_id, ComputerPresence.state).where(
+                        ComputerPresence.game_club_id == club_id
+                    )
+                )
+            }
+            with club_scope(club_id):
+                computers = db.session.execute(
+                    select(Computer.id, Computer.is_available).join(Room).where(
+                        Room.game_club_id == club_id,
+                        Computer.is_active == True
+                    )
+                ).all()
+                # Band - hozir davom etayotgan bron (Booking.in_progress, kelajakdagilari hisobga olinmaydi)
+                booked = set(db.session.execute(
+                    select(Booking.computer_id).where(
+                        Booking.game_club_id == club_id,
+                        Booking.in_progress(now)
+                    )
+                ).scalars())
+                issues = {
+                    'stale_unavailable': sorted(
+                        computer_id for computer_id, available in computers
+                        if not available and computer_id not in booked
+                    ),
+                    'stale_available': sorted(
+                        computer_id for computer_id, available in computers
+                        if available and computer_id in booked
+                    ),
+                    'session_without_booking': sorted(
+                        computer_id for computer_id, _ in computers
+                        if presence.get(computer_id) == 'session' and computer_id not in booked
+                    ),
+                    'booked_offline': sorted(
+                        computer_id for computer_id, _ in computers
+                        if presence.get(computer_id) == 'offline' and computer_id in booked
+                    )
+                }
+                if fix and (issues['stale_unavailable'] or issues['stale_available']):
+                    for computer in Computer.query.filter(
+                        Computer.id.in_(issues['stale_unavailable'] + issues['stale_available'])
+                    ):
+                        computer.is_available = computer.id not in booked
+                    db.session.commit()
+            if any(issues.values()):
+                report[club_id] = issues
+        return report
+
+
+heartbeats = HeartbeatIngestor()
+invalidation.subscribe('game_club', heartbeats.evict)
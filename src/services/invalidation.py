@@ -0,0 +1,156 @@
+from src.models.user import User, db
+from src.models.game_club import GameClub
+from src.models.room import Room
+from src.models.computer import Computer
+from src.models.booking import Booking
+from src.models.media_file import MediaFile
+from src.models.cache_version import CacheVersion
+from src.services.sharding import router as shards
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+import threading
+import time
+
+DEFAULT_POLL_INTERVAL = 0.5  # soniya
+_PENDING_KEY = 'invalidation_keys'
+_DEFERRED_KEY = 'invalidation_deferred'
+
+_BUMP_SQL = text(
+    'INSERT INTO cache_version (entity, entity_id, version, seq) '
+    'VALUES (:entity, :entity_id, 1, (SELECT COALESCE(MAX(seq), 0) + 1 FROM cache_version)) '
+    'ON CONFLICT (entity, entity_id) DO UPDATE SET version = version + 1, seq = excluded.seq'
+)
+
+
+class InvalidationBus:
+    """Model o'zgarishlari asosida ishchilar keshlarini bekor qilish"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}
+        self._versions = {}
+        self._last_seq = None
+        self._last_poll = 0.0
+        self._interval = DEFAULT_POLL_INTERVAL
+
+    def init_app(self, app):
+        self._interval = app.config.get('CACHE_BUS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        app.before_request(self.poll)
+
+    def subscribe(self, entity, handler):
+        """handler(entity_ids) - shu entity o'zgarganda chaqiriladi"""
+        self._handlers.setdefault(entity, []).append(handler)
+
+    def version(self, entity, entity_id):
+        """Ishchiga ma'lum oxirgi versiya (0 - hali o'zgarmagan)"""
+        self.poll()
+        return self._versions.get((entity, entity_id), 0)
+
+    def bump(self, entity, entity_ids):
+        """Bulk so'rovlar uchun qo'lda versiya oshirish (joriy tranzaksiyada)"""
+        keys = {(entity, entity_id) for entity_id in entity_ids if entity_id is not None}
+        if keys:
+            _record(db.session, keys)
+
+    def poll(self, force=False):
+        """Boshqa ishchilar yozgan o'zgarishlarni o'qish (arzon, indeksli so'rov)"""
+        now = time.monotonic()
+        if not force and now - self._last_poll < self._interval:
+            return
+        with self._lock:
+            if not force and now - self._last_poll < self._interval:
+                return
+            self._last_poll = now
+            query = select(CacheVersion.entity, CacheVersion.entity_id, CacheVersion.version, CacheVersion.seq)
+            if self._last_seq is not None:
+                query = query.where(CacheVersion.seq > self._last_seq)
+            rows = db.session.execute(query.order_by(CacheVersion.seq)).all()
+            first_poll = self._last_seq is None
+            changed = set()
+            for entity, entity_id, version, seq in rows:
+                if self._versions.get((entity, entity_id)) != version:
+                    self._versions[(entity, entity_id)] = version
+                    changed.add((entity, entity_id))
+                self._last_seq = seq
+            if self._last_seq is None:
+                self._last_seq = 0
+        if changed and not first_poll:
+            self.dispatch(changed)
+
+    def dispatch(self, keys):
+        by_entity = {}
+        for entity, entity_id in keys:
+            by_entity.setdefault(entity, set()).add(entity_id)
+        for entity, entity_ids in by_entity.items():
+            for handler in self._handlers.get(entity, ()):
+                handler(entity_ids)
+
+
+bus = InvalidationBus()
+
+
+def _record(session, keys):
+    if shards.enabled and shards.scoped_key() is not None:
+        # Klub doirasida (shard tranzaksiyasi) versiyalar commit dan keyin markaziy
+        # bazaga yoziladi - aks holda har bir bron markaziy baza qulfini commit gacha ushlaydi
+        session.info.setdefault(_DEFERRED_KEY, set()).update(keys)
+    else:
+        # Versiyalar model o'zgarishlari bilan bir tranzaksiyada yoziladi
+        _write_keys(session.connection(bind_arguments={'mapper': CacheVersion.__mapper__}), keys)
+    session.info.setdefault(_PENDING_KEY, set()).update(keys)
+
+
+def _write_keys(connection, keys):
+    connection.execute(_BUMP_SQL, [
+        {'entity': entity, 'entity_id': entity_id} for entity, entity_id in sorted(keys)
+    ])
+
+
+def _changed_keys(session):
+    keys = set()
+    room_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, GameClub):
+            keys.add(('game_club', obj.id))
+        elif isinstance(obj, (Room, Booking, MediaFile)):
+            keys.add(('game_club', obj.game_club_id))
+        elif isinstance(obj, Computer):
+            room_ids.add(obj.room_id)
+        elif isinstance(obj, User):
+            keys.add(('user', obj.id))
+    room_ids.discard(None)
+    if room_ids:
+        # Sessiya orqali - shard rejimida xonalar klub faylida
+        for club_id in session.execute(
+            select(Room.game_club_id).where(Room.id.in_(room_ids)).distinct()
+        ).scalars():
+            keys.add(('game_club', club_id))
+    return {key for key in keys if key[1] is not None}
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_versions(session, flush_context):
+    keys = _changed_keys(session)
+    if keys:
+        _record(session, keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_local(session):
+    deferred = session.info.pop(_DEFERRED_KEY, None)
+    if deferred:
+        try:
+            with db.engine.begin() as connection:
+                _write_keys(connection, deferred)
+        except Exception as e:
+            # Ma'lumotlar commit qilingan - boshqa ishchilar keshlari keyingi versiyagacha eski qoladi
+            print(f"Kesh versiyalarini yozishda xatolik: {e}")
+    keys = session.info.pop(_PENDING_KEY, None)
+    if keys:
+        bus.dispatch(keys)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_DEFERRED_KEY, None)
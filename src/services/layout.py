@@ -0,0 +1,280 @@
+from src.models.user import db
+from src.models.room import Room
+from src.models.computer import Computer
+from src.models.booking import Booking
+from src.services.invalidation import bus as invalidation
+from sqlalchemy import insert, update
+import csv
+import io
+
+ROOM_FIELDS = ('hourly_price', 'cpu', 'gpu', 'ram', 'storage')
+MAX_COMPUTERS_PER_ROOM = 1000
+
+
+class LayoutError(ValueError):
+    """Import faylidagi xatolik"""
+
+
+def parse_numbers(spec):
+    """'1-10,12' yoki [1, 2, 3] ko'rinishidagi raqamlarni to'plamga aylantirish"""
+    if isinstance(spec, (list, tuple)):
+        parts = spec
+    else:
+        parts = [part.strip() for part in str(spec).split(',') if part.strip()]
+
+    numbers = set()
+    for part in parts:
+        try:
+            if isinstance(part, str) and '-' in part:
+                first, last = (int(value) for value in part.split('-', 1))
+                numbers.update(range(first, last + 1))
+            else:
+                numbers.add(int(part))
+        except ValueError:
+            raise LayoutError(f'Noto\'g\'ri kompyuter raqami: {part}')
+    if any(number < 1 for number in numbers):
+        raise LayoutError('Kompyuter raqami 1 dan kichik bo\'lmasligi kerak')
+    return numbers
+
+
+def _room_spec(raw, position):
+    name = (raw.get('name') or raw.get('room_name') or '').strip()
+    if not name:
+        raise LayoutError(f'{position}: xona nomi talab qilinadi')
+
+    try:
+        hourly_price = int(raw.get('hourly_price'))
+    except (TypeError, ValueError):
+        raise LayoutError(f'{position}: hourly_price talab qilinadi')
+
+    if raw.get('computers') not in (None, ''):
+        numbers = parse_numbers(raw['computers'])
+    elif raw.get('computer_count') not in (None, ''):
+        try:
+            numbers = set(range(1, int(raw['computer_count']) + 1))
+        except ValueError:
+            raise LayoutError(f'{position}: noto\'g\'ri computer_count')
+    else:
+        raise LayoutError(f'{position}: computers yoki computer_count talab qilinadi')
+
+    return {
+        'name': name,
+        'hourly_price': hourly_price,
+        'cpu': raw.get('cpu') or None,
+        'gpu': raw.get('gpu') or None,
+        'ram': raw.get('ram') or None,
+        'storage': raw.get('storage') or None,
+        'numbers': numbers
+    }
+
+
+def parse_layout_json(data):
+    """JSON dan xonalar ro'yxatini olish"""
+    rooms = data.get('rooms') if isinstance(data, dict) else None
+    if not isinstance(rooms, list):
+        raise LayoutError('rooms ro\'yxati talab qilinadi')
+    return _merge_specs(_room_spec(raw, f'rooms[{i}]') for i, raw in enumerate(rooms))
+
+
+def parse_layout_csv(text):
+    """CSV dan xonalar ro'yxatini olish (bir xil nomli qatorlar birlashtiriladi)"""
+    reader = csv.DictReader(io.StringIO(text))
+    return _merge_specs(_room_spec(row, f'{reader.line_num}-qator') for row in reader)
+
+
+def _merge_specs(specs):
+    merged = {}
+    for spec in specs:
+        existing = merged.get(spec['name'])
+        if existing:
+            existing['numbers'] |= spec['numbers']
+            existing.update({field: spec[field] for field in ROOM_FIELDS if spec[field] is not None})
+        else:
+            merged[spec['name']] = spec
+    for spec in merged.values():
+        if len(spec['numbers']) > MAX_COMPUTERS_PER_ROOM:
+            raise LayoutError(f'{spec["name"]}: kompyuterlar soni {MAX_COMPUTERS_PER_ROOM} dan oshmasligi kerak')
+    return list(merged.values())
+
+
+def busy_computer_ids(computer_ids):
+    """Band yoki faol broni bor kompyuterlar"""
+    if not computer_ids:
+        return set()
+    busy = {
+        computer_id for (computer_id,) in db.session.query(Computer.id).filter(
+            Computer.id.in_(computer_ids),
+            Computer.is_available == False
+        )
+    }
+    busy.update(
+        computer_id for (computer_id,) in db.session.query(Booking.computer_id).filter(
+            Booking.computer_id.in_(computer_ids),
+            Booking.is_active == True
+        )
+    )
+    return busy
+
+
+def add_computers(room_id, numbers):
+    """Kompyuterlarni bitta executemany bilan qo'shish"""
+    if numbers:
+        db.session.execute(insert(Computer), [
+            {'number': number, 'room_id': room_id} for number in sorted(numbers)
+        ])
+
+
+def remove_computers(computer_ids):
+    """Kompyuterlarni bitta so'rov bilan o'chirish (is_active=False - bron tarixi ularga bog'langan)"""
+    if computer_ids:
+        db.session.execute(
+            update(Computer).where(Computer.id.in_(computer_ids)).values(is_active=False),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def export_layout(game_club_id):
+    """Klubning joriy joylashuvi (import formatida)"""
+    rooms = Room.query.filter_by(game_club_id=game_club_id, is_active=True).order_by(Room.id).all()
+    numbers = {}
+    for room_id, number in db.session.query(Computer.room_id, Computer.number).filter(
+        Computer.room_id.in_([room.id for room in rooms]),
+        Computer.is_active == True
+    ):
+        numbers.setdefault(room_id, []).append(number)
+
+    return [{
+        'name': room.name,
+        'hourly_price': room.hourly_price,
+        'cpu': room.cpu,
+        'gpu': room.gpu,
+        'ram': room.ram,
+        'storage': room.storage,
+        'computers': sorted(numbers.get(room.id, []))
+    } for room in rooms]
+
+
+def import_layout(game_club_id, specs, prune=False, dry_run=False):
+    """Joylashuvni joriy holat bilan solishtirib, farqni bitta tranzaksiyada qo'llash"""
+    rooms = {
+        room.name: room for room in Room.query.filter_by(game_club_id=game_club_id, is_active=True)
+    }
+    computers = {}
+    if rooms:
+        for computer_id, room_id, number in db.session.query(
+            Computer.id, Computer.room_id, Computer.number
+        ).filter(
+            Computer.room_id.in_([room.id for room in rooms.values()]),
+            Computer.is_active == True
+        ):
+            computers.setdefault(room_id, {})[number] = computer_id
+
+    report = {
+        'rooms_created': [],
+        'rooms_updated': [],
+        'rooms_removed': [],
+        'computers_added': {},
+        'computers_removed': {},
+        'dry_run': dry_run
+    }
+    new_rooms = []
+    room_updates = []
+    removals = {}
+
+    spec_names = set()
+    for spec in specs:
+        spec_names.add(spec['name'])
+        room = rooms.get(spec['name'])
+        if not room:
+            new_rooms.append(spec)
+            report['rooms_created'].append(spec['name'])
+            report['computers_added'][spec['name']] = sorted(spec['numbers'])
+            continue
+
+        changes = {
+            field: spec[field] for field in ROOM_FIELDS
+            if spec[field] is not None and spec[field] != getattr(room, field)
+        }
+        current = computers.get(room.id, {})
+        to_add = spec['numbers'] - current.keys()
+        to_remove = current.keys() - spec['numbers']
+        if len(spec['numbers']) != room.computer_count:
+            changes['computer_count'] = len(spec['numbers'])
+        if changes:
+            room_updates.append(dict(changes, id=room.id))
+            report['rooms_updated'].append({'name': room.name, 'changes': changes})
+        if to_add:
+            report['computers_added'][room.name] = sorted(to_add)
+        if to_remove:
+            removals[room.name] = {number: current[number] for number in to_remove}
+            report['computers_removed'][room.name] = sorted(to_remove)
+
+    pruned_rooms = []
+    if prune:
+        for name, room in rooms.items():
+            if name not in spec_names:
+                pruned_rooms.append(room)
+                report['rooms_removed'].append(name)
+                removals[name] = computers.get(room.id, {})
+
+    # Band kompyuterlar o'chirilmaydi - import butunlay rad etiladi
+    removed_ids = [computer_id for numbers in removals.values() for computer_id in numbers.values()]
+    has_active_bookings = bool(pruned_rooms) and db.session.query(Booking.id).filter(
+        Booking.room_id.in_([room.id for room in pruned_rooms]),
+        Booking.is_active == True
+    ).first() is not None
+    if has_active_bookings or busy_computer_ids(removed_ids):
+        raise LayoutError('Band kompyuterlar yoki faol bronlar mavjud, avval ularni bo\'shating')
+
+    if dry_run:
+        return report
+
+    try:
+        if new_rooms:
+            created = db.session.execute(
+                insert(Room).returning(Room.id, Room.name),
+                [{
+                    'name': spec['name'],
+                    'computer_count': len(spec['numbers']),
+                    'hourly_price': spec['hourly_price'],
+                    'cpu': spec['cpu'],
+                    'gpu': spec['gpu'],
+                    'ram': spec['ram'],
+                    'storage': spec['storage'],
+                    'game_club_id': game_club_id
+                } for spec in new_rooms]
+            ).all()
+            specs_by_name = {spec['name']: spec for spec in new_rooms}
+            db.session.execute(insert(Computer), [
+                {'number': number, 'room_id': room_id}
+                for room_id, name in created
+                for number in sorted(specs_by_name[name]['numbers'])
+            ])
+
+        if room_updates:
+            db.session.execute(update(Room), room_updates)
+
+        new_computers = [
+            {'number': number, 'room_id': rooms[name].id}
+            for name, numbers in report['computers_added'].items()
+            if name in rooms
+            for number in numbers
+        ]
+        if new_computers:
+            db.session.execute(insert(Computer), new_computers)
+
+        remove_computers(removed_ids)
+        if pruned_rooms:
+            db.session.execute(
+                update(Room).where(Room.id.in_([room.id for room in pruned_rooms])).values(is_active=False),
+                execution_options={'synchronize_session': False}
+            )
+
+        # Bulk so'rovlar sessiya hodisalarini chetlab o'tadi
+        invalidation.bump('game_club', [game_club_id])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return report
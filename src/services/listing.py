@@ -0,0 +1,282 @@
+from src.models.user import User, db
+from src.models.game_club import GameClub
+from src.models.room import Room
+from src.models.computer import Computer
+from src.models.booking import Booking
+from src.models.booking_archive import BookingArchive
+from src.models.media_file import MediaFile
+from src.services.sharding import per_club
+from sqlalchemy import DateTime, String, func, select, type_coerce, union_all
+from datetime import datetime
+
+# Ro'yxat endpoint lari uchun faqat o'qish qatlami: ORM obyektlari (identity map,
+# lazy load) o'rniga Core select() qatorlari to'g'ridan-to'g'ri to_dict() bilan
+# bir xil dict larga aylantiriladi. DateTime ustunlari SQLite matni sifatida
+# o'qiladi va datetime ga parse qilinmasdan isoformat() shakliga keltiriladi.
+
+
+def iso(value):
+    """SQLite DATETIME matni ('2026-01-01 10:00:00.000000') -> datetime.isoformat() satri"""
+    if value is None:
+        return None
+    if value.endswith('.000000'):
+        value = value[:-7]
+    return value[:10] + 'T' + value[11:]
+
+
+class RowShape:
+    """select() ustunlari va qatorni dict ga aylantiruvchi oldindan kompilyatsiya
+    qilingan funksiya. Maydon: (kalit, ustun) yoki (kalit, ustun, ifoda shabloni),
+    shablonda '{}' qator qiymati o'rniga qo'yiladi."""
+
+    __slots__ = ('name', 'columns', 'serialize')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.columns = []
+        parts = []
+        for index, (key, column, *template) in enumerate(fields):
+            expression = f'row[{index}]'
+            if isinstance(column.type, DateTime):
+                column = type_coerce(column, String)
+                expression = f'iso({expression})'
+            if template:
+                expression = template[0].format(expression)
+            self.columns.append(column.label(key))
+            parts.append(f'{key!r}: {expression}')
+        namespace = {'iso': iso}
+        source = f"def serialize(row):\n    return {{{', '.join(parts)}}}\n"
+        exec(compile(source, f'<RowShape {name}>', 'exec'), namespace)
+        self.serialize = namespace['serialize']
+
+    def select(self):
+        return select(*self.columns)
+
+    def all(self, statement):
+        serialize = self.serialize
+        return [serialize(row) for row in db.session.execute(statement)]
+
+
+def _booking_shape(model):
+    return RowShape(model.__name__, [
+        ('id', model.id),
+        ('customer_username', model.customer_username),
+        ('start_time', model.start_time),
+        ('end_time', model.end_time),
+        ('total_hours', model.total_hours),
+        ('total_price', model.total_price),
+        ('game_club_id', model.game_club_id),
+        ('room_id', model.room_id),
+        ('computer_id', model.computer_id),
+        ('admin_id', model.admin_id),
+        ('is_active', model.is_active),
+        ('is_completed', model.is_completed),
+        ('created_at', model.created_at),
+        ('game_club_name', GameClub.name),
+        ('room_name', Room.name),
+        ('computer_number', Computer.number),
+        ('admin_name', User.full_name)
+    ])
+
+
+BOOKING = _booking_shape(Booking)
+BOOKING_ARCHIVE = _booking_shape(BookingArchive)
+
+ROOM = RowShape('Room', [
+    ('id', Room.id),
+    ('name', Room.name),
+    ('computer_count', Room.computer_count),
+    ('hourly_price', Room.hourly_price),
+    ('cpu', Room.cpu),
+    ('gpu', Room.gpu),
+    ('ram', Room.ram),
+    ('storage', Room.storage),
+    ('game_club_id', Room.game_club_id),
+    ('created_at', Room.created_at),
+    ('is_active', Room.is_active)
+])
+
+COMPUTER = RowShape('Computer', [
+    ('id', Computer.id),
+    ('number', Computer.number),
+    ('room_id', Computer.room_id),
+    ('is_available', Computer.is_available),
+    ('created_at', Computer.created_at),
+    ('is_active', Computer.is_active)
+])
+
+MEDIA_FILE = RowShape('MediaFile', [
+    ('id', MediaFile.id),
+    ('filename', MediaFile.filename),
+    ('original_filename', MediaFile.original_filename),
+    ('file_path', MediaFile.file_path),
+    ('file_type', MediaFile.file_type),
+    ('file_size', MediaFile.file_size),
+    ('file_size_mb', MediaFile.file_size, 'round({} / (1024 * 1024), 2)'),
+    ('mime_type', MediaFile.mime_type),
+    ('game_club_id', MediaFile.game_club_id),
+    ('uploaded_by', MediaFile.uploaded_by),
+    ('uploader_name', User.full_name),
+    ('created_at', MediaFile.created_at),
+    ('is_active', MediaFile.is_active),
+    ('url', func.printf('/api/media/%d?club_id=%d', MediaFile.id, MediaFile.game_club_id))
+])
+
+USER = RowShape('User', [
+    ('id', User.id),
+    ('full_name', User.full_name),
+    ('email', User.email),
+    ('role', User.role),
+    ('phone', User.phone),
+    ('additional_phone', User.additional_phone),
+    ('created_at', User.created_at),
+    ('is_active', User.is_active),
+    ('game_club_id', User.game_club_id)
+])
+
+GAME_CLUB = RowShape('GameClub', [
+    ('id', GameClub.id),
+    ('name', GameClub.name),
+    ('description', GameClub.description),
+    ('address', GameClub.address),
+    ('latitude', GameClub.latitude),
+    ('longitude', GameClub.longitude),
+    ('phone', GameClub.phone),
+    ('work_start_time', GameClub.work_start_time),
+    ('work_end_time', GameClub.work_end_time),
+    ('day_price', GameClub.day_price),
+    ('night_price', GameClub.night_price),
+    ('promo_hours', GameClub.promo_hours),
+    ('promo_price', GameClub.promo_price),
+    ('created_at', GameClub.created_at),
+    ('is_active', GameClub.is_active)
+])
+
+
+def _booking_select(shape, model):
+    return shape.select().select_from(model).outerjoin(
+        GameClub, GameClub.id == model.game_club_id
+    ).outerjoin(
+        Room, Room.id == model.room_id
+    ).outerjoin(
+        Computer, Computer.id == model.computer_id
+    ).outerjoin(
+        User, User.id == model.admin_id
+    )
+
+
+def booking_dicts(game_club_id=None, archived=False):
+    """Bronlar (Booking.to_dict shaklida), yaratilgan vaqti bo'yicha kamayish tartibida"""
+    live = _booking_select(BOOKING, Booking)
+    if game_club_id is not None:
+        live = live.where(Booking.game_club_id == game_club_id)
+    if not archived:
+        return BOOKING.all(live.order_by(Booking.created_at.desc()))
+    history = _booking_select(BOOKING_ARCHIVE, BookingArchive)
+    if game_club_id is not None:
+        history = history.where(BookingArchive.game_club_id == game_club_id)
+    # Ikkala shakl bir xil, shuning uchun birlashma BOOKING bilan o'qiladi
+    bookings = union_all(live, history).subquery('booking_history')
+    return BOOKING.all(select(bookings).order_by(bookings.c.created_at.desc()))
+
+
+def booking_dicts_by_id(booking_ids):
+    if not booking_ids:
+        return []
+    return BOOKING.all(_booking_select(BOOKING, Booking).where(Booking.id.in_(booking_ids)))
+
+
+def current_booking_dicts(computer_ids):
+    """Computer.get_current_bookings bilan bir xil, lekin dict lar bilan"""
+    from src.services.status_board import board
+    if not computer_ids:
+        return {}
+
+    statuses = board.statuses(computer_ids)
+    booking_ids = [booking_id for busy, booking_id in statuses.values() if busy]
+    unknown_ids = [computer_id for computer_id in computer_ids if computer_id not in statuses]
+
+    current = {}
+    for booking in booking_dicts_by_id(booking_ids):
+        current[booking['computer_id']] = booking
+    if unknown_ids:
+        # Har bir kompyuterning hozir davom etayotgan eng kichik id li broni (ORM versiyasidagi setdefault)
+        now = datetime.utcnow()
+        first_ids = select(func.min(Booking.id)).where(
+            Booking.computer_id.in_(unknown_ids),
+            Booking.in_progress(now)
+        ).group_by(Booking.computer_id)
+        for booking in BOOKING.all(_booking_select(BOOKING, Booking).where(Booking.id.in_(first_ids))):
+            current.setdefault(booking['computer_id'], booking)
+    return current
+
+
+def room_dicts(game_club_id):
+    """Klubning faol xonalari (Room.to_dict shaklida) kompyuterlari bilan"""
+    rooms = ROOM.all(ROOM.select().where(
+        Room.game_club_id == game_club_id, Room.is_active == True
+    ).order_by(Room.id))
+    if not rooms:
+        return rooms
+    computers = COMPUTER.all(COMPUTER.select().where(
+        Computer.room_id.in_([room['id'] for room in rooms]),
+        Computer.is_active == True
+    ).order_by(Computer.id))
+    current = current_booking_dicts([computer['id'] for computer in computers])
+
+    by_room = {room['id']: [] for room in rooms}
+    for computer in computers:
+        computer['current_booking'] = current.get(computer['id'])
+        by_room[computer['room_id']].append(computer)
+    for room in rooms:
+        room['computers'] = by_room[room['id']]
+        room['available_computers'] = sum(1 for computer in room['computers'] if not computer['current_booking'])
+    return rooms
+
+
+def _media_select():
+    return MEDIA_FILE.select().select_from(MediaFile).outerjoin(User, User.id == MediaFile.uploaded_by)
+
+
+def media_dicts(game_club_id):
+    """Klubning faol fayllari (MediaFile.to_dict shaklida), eng yangisi birinchi"""
+    return MEDIA_FILE.all(_media_select().where(
+        MediaFile.game_club_id == game_club_id, MediaFile.is_active == True
+    ).order_by(MediaFile.created_at.desc()))
+
+
+def _club_contents(club_ids):
+    # {klub: (xonalar soni, barcha media fayllar)} - GameClub.to_dict dagi rooms/media_files
+    contents = {club_id: [0, []] for club_id in club_ids}
+    for club_id, count in db.session.execute(
+        select(Room.game_club_id, func.count(Room.id)).where(
+            Room.game_club_id.in_(club_ids)
+        ).group_by(Room.game_club_id)
+    ):
+        contents[club_id][0] = count
+    for media in MEDIA_FILE.all(_media_select().where(
+        MediaFile.game_club_id.in_(club_ids)
+    ).order_by(MediaFile.id)):
+        contents[media['game_club_id']][1].append(media)
+    return contents
+
+
+def user_dicts(user_ids):
+    """Foydalanuvchilar (User.to_dict shaklida, klubi bilan) berilgan id tartibida"""
+    if not user_ids:
+        return []
+    users = {user['id']: user for user in USER.all(USER.select().where(User.id.in_(user_ids)))}
+    club_ids = sorted({user['game_club_id'] for user in users.values() if user['game_club_id']})
+    clubs = {}
+    if club_ids:
+        contents = per_club(club_ids, _club_contents)
+        for club in GAME_CLUB.all(GAME_CLUB.select().where(GameClub.id.in_(club_ids))):
+            club['rooms_count'], club['media_files'] = contents[club['id']]
+            clubs[club['id']] = club
+    result = []
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if user is not None:
+            user['game_club'] = clubs.get(user['game_club_id'])
+            result.append(user)
+    return result
@@ -0,0 +1,173 @@
+from src.models.user import User, db
+from src.models.game_club import GameClub
+from src.services.invalidation import bus as invalidation
+from src.services.geo import index_clubs
+from src.services.hashing import hash_passwords
+from sqlalchemy import insert
+import csv
+import io
+import json
+
+REQUIRED_FIELDS = ['full_name', 'email', 'password', 'game_club_name', 'address', 'phone']
+DEFAULT_BATCH_SIZE = 200
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename=None, mimetype=None):
+    """Fayl formatini aniqlash: 'csv' yoki 'ndjson'"""
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        return 'ndjson'
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def iter_rows(stream, fmt='csv'):
+    """Oqimdan (qator raqami, ma'lumot, xatolik) larni birma-bir o'qish"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'ndjson':
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_num, None, 'Noto\'g\'ri JSON'
+                continue
+            if not isinstance(row, dict):
+                yield line_num, None, 'Qator obyekt bo\'lishi kerak'
+                continue
+            yield line_num, row, None
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+
+
+def _float_or_none(value):
+    if value in (None, ''):
+        return None
+    return float(value)
+
+
+def validate_row(row):
+    """Qatorni tekshirish va tozalash; (tozalangan qator, xatolik)"""
+    row = {key: value.strip() if isinstance(value, str) else value for key, value in row.items() if key}
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            return None, f'{field} talab qilinadi'
+    if '@' not in row['email']:
+        return None, 'Noto\'g\'ri email'
+    if len(str(row['password'])) < 6:
+        return None, 'Parol kamida 6 ta belgidan iborat bo\'lishi kerak'
+    try:
+        row['latitude'] = _float_or_none(row.get('latitude'))
+        row['longitude'] = _float_or_none(row.get('longitude'))
+    except (TypeError, ValueError):
+        return None, 'Noto\'g\'ri koordinatalar'
+    return row, None
+
+
+class ImportReport:
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.errors = []
+        self.failed = 0
+
+    def error(self, line, email, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'email': email, 'message': message})
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
+
+
+def import_admins(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Klub va adminlarni partiyalab yaratish; xato qatorlar o'tkazib yuboriladi"""
+    report = ImportReport()
+    seen_emails = set()
+    batch = []
+
+    for line, row, error in rows:
+        report.total += 1
+        if error:
+            report.error(line, None, error)
+            continue
+        row, error = validate_row(row)
+        if error:
+            report.error(line, None, error)
+            continue
+        if row['email'] in seen_emails:
+            report.error(line, row['email'], 'Email faylda takrorlangan')
+            continue
+        seen_emails.add(row['email'])
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            _import_batch(batch, report)
+            batch = []
+
+    if batch:
+        _import_batch(batch, report)
+    return report
+
+
+def _import_batch(batch, report):
+    emails = [row['email'] for _, row in batch]
+    existing = {
+        email for (email,) in db.session.query(User.email).filter(User.email.in_(emails))
+    }
+
+    accepted = []
+    for line, row in batch:
+        if row['email'] in existing:
+            report.error(line, row['email'], 'Bu email allaqachon mavjud')
+        else:
+            accepted.append((line, row))
+    if not accepted:
+        return
+
+    password_hashes = hash_passwords(str(row['password']) for _, row in accepted)
+
+    try:
+        club_rows = [{
+            'name': row['game_club_name'],
+            'description': row.get('description') or '',
+            'address': row['address'],
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'phone': row['phone']
+        } for _, row in accepted]
+        club_ids = db.session.execute(
+            insert(GameClub).returning(GameClub.id, sort_by_parameter_order=True),
+            club_rows
+        ).scalars().all()
+
+        db.session.execute(insert(User), [{
+            'full_name': row['full_name'],
+            'email': row['email'],
+            'password_hash': password_hash,
+            'role': 'admin',
+            'phone': row['phone'],
+            'additional_phone': row.get('additional_phone') or None,
+            'game_club_id': club_id
+        } for (_, row), password_hash, club_id in zip(accepted, password_hashes, club_ids)])
+
+        # Bulk insert mapper hodisalarini chaqirmaydi
+        index_clubs([dict(club, id=club_id) for club, club_id in zip(club_rows, club_ids)])
+        invalidation.bump('game_club', club_ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for line, row in accepted:
+            report.error(line, row['email'], f'Xatolik: {str(e)}')
+        return
+
+    report.created += len(accepted)
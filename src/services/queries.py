@@ -0,0 +1,82 @@
+from src.models.user import User, db
+from src.models.room import Room
+from src.models.computer import Computer
+from src.models.booking import Booking
+from src.models.media_file import MediaFile
+from src.models.club_counter import ClubCounter
+from sqlalchemy import and_, func, lambda_stmt, or_, select
+
+# Eng ko'p bajariladigan so'rovlar. lambda_stmt ifodasi kod joyi bo'yicha bir
+# marta quriladi va kompilyatsiya keshiga tushadi; keyingi chaqiruvlarda faqat
+# yopilishdagi (closure) qiymatlar bog'langan parametr sifatida olinadi -
+# Model.query.filter_by(...) kabi har safar Query/Select daraxti qurilmaydi.
+# Lambda ichida faqat parametr qiymatlari o'zgaruvchan bo'lishi mumkin,
+# so'rov tuzilishi emas (shartli qismlar alohida lambda bilan qo'shiladi).
+
+
+def user_by_id(user_id):
+    return db.session.execute(
+        lambda_stmt(lambda: select(User).where(User.id == user_id))
+    ).scalars().first()
+
+
+def room_for_club(room_id, club_id, active_only=True):
+    stmt = lambda_stmt(lambda: select(Room).where(Room.id == room_id, Room.game_club_id == club_id))
+    if active_only:
+        stmt += lambda s: s.where(Room.is_active == True)
+    return db.session.execute(stmt).scalars().first()
+
+
+def computer_by_number(room_id, number):
+    return db.session.execute(
+        lambda_stmt(lambda: select(Computer).where(
+            Computer.room_id == room_id, Computer.number == number, Computer.is_active == True
+        ))
+    ).scalars().first()
+
+
+def conflicting_booking_id(computer_id, start_time, end_time):
+    """Kompyuterning shu oraliqqa to'qnashadigan faol broni (id) yoki None"""
+    return db.session.execute(
+        lambda_stmt(lambda: select(Booking.id).where(
+            Booking.computer_id == computer_id,
+            Booking.is_active == True,
+            or_(
+                and_(Booking.start_time <= start_time, Booking.end_time > start_time),
+                and_(Booking.start_time < end_time, Booking.end_time >= end_time),
+                and_(Booking.start_time >= start_time, Booking.end_time <= end_time)
+            )
+        ).limit(1))
+    ).scalar()
+
+
+def active_bookings_between(computer_ids, start_time, end_time):
+    """[(id, kompyuter id, boshlanish, tugash)] - oraliqqa tegadigan faol bronlar (bitta so'rov)"""
+    return db.session.execute(
+        lambda_stmt(lambda: select(Booking.id, Booking.computer_id, Booking.start_time, Booking.end_time).where(
+            Booking.computer_id.in_(computer_ids),
+            Booking.is_active == True,
+            Booking.start_time <= end_time,
+            Booking.end_time >= start_time
+        ))
+    ).all()
+
+
+def media_type_counts(club_id):
+    """[(fayl turi, soni)] - klubning faol fayllari"""
+    return db.session.execute(
+        lambda_stmt(lambda: select(MediaFile.file_type, func.count(MediaFile.id)).where(
+            MediaFile.game_club_id == club_id, MediaFile.is_active == True
+        ).group_by(MediaFile.file_type))
+    ).all()
+
+
+def counter_values(club_id, names):
+    """[(nom, qiymat)] - club_counter jadvalidan; club_id=None - barcha klublar"""
+    stmt = lambda_stmt(lambda: select(ClubCounter.name, func.sum(ClubCounter.value)).where(
+        ClubCounter.name.in_(names), ClubCounter.game_club_id != 0
+    ).group_by(ClubCounter.name))
+    if club_id is not None:
+        stmt += lambda s: s.where(ClubCounter.game_club_id == club_id)
+    return db.session.execute(stmt).all()
+
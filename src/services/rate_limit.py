@@ -0,0 +1,55 @@
+from collections import deque
+import math
+import threading
+import time
+
+
+class SlidingWindowLimiter:
+    """Kalit bo'yicha sirpanuvchi oyna cheklovchisi (jarayon xotirasida)"""
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Urinishni qayd etish; (ruxsat, necha soniyadan keyin) qaytaradi"""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                if len(self._hits) >= self.max_keys:
+                    self._sweep(now)
+                hits = self._hits[key] = deque()
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return False, max(1, math.ceil(hits[0] + self.window - now))
+            hits.append(now)
+            return True, 0
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def _sweep(self, now):
+        cutoff = now - self.window
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= cutoff]:
+            del self._hits[key]
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, limit, window):
+    """Nomlangan cheklovchini olish (sozlama o'zgarsa qayta yaratiladi)"""
+    limiter = _limiters.get(name)
+    if limiter is None or (limiter.limit, limiter.window) != (limit, window):
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None or (limiter.limit, limiter.window) != (limit, window):
+                limiter = _limiters[name] = SlidingWindowLimiter(limit, window)
+    return limiter
@@ -0,0 +1,143 @@
+from src.models.computer import Computer
+from src.services.queries import active_bookings_between
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+FREQUENCIES = {'daily': timedelta(days=1), 'weekly': timedelta(weeks=1)}
+MODES = ('all_or_nothing', 'skip_conflicts')
+MAX_OCCURRENCES = 104
+MAX_BOOKINGS = 500
+
+
+class RecurrenceError(ValueError):
+    """Noto'g'ri takrorlanish qoidasi yoki kompyuterlar ro'yxati"""
+
+
+def parse_time(value):
+    """ISO vaqt (create_booking dagi kabi); vaqt zonasi tashlanadi - bazada ham shunday saqlanadi"""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise RecurrenceError('Noto\'g\'ri vaqt formati')
+    return parsed.replace(tzinfo=None)
+
+
+def expand(start_time, duration_hours, rule=None):
+    """Takrorlanish qoidasi bo'yicha [(boshlanish, tugash)] ro'yxati.
+
+    rule: {'frequency': 'daily'|'weekly', 'interval': 1, 'count': n} yoki
+    'count' o'rniga 'until' (ISO vaqt, shu vaqtgacha boshlanganlari kiradi).
+    rule berilmasa bitta bron.
+    """
+    duration = timedelta(hours=duration_hours)
+    if not rule:
+        return [(start_time, start_time + duration)]
+
+    frequency = FREQUENCIES.get(rule.get('frequency', 'weekly'))
+    if frequency is None:
+        raise RecurrenceError(f'frequency quyidagilardan biri bo\'lishi kerak: {", ".join(FREQUENCIES)}')
+    interval = rule.get('interval', 1)
+    if not isinstance(interval, int) or interval < 1:
+        raise RecurrenceError('interval musbat butun son bo\'lishi kerak')
+    step = frequency * interval
+
+    count = rule.get('count')
+    until = parse_time(rule['until']) if rule.get('until') else None
+    if (count is None) == (until is None):
+        raise RecurrenceError('count yoki until dan bittasi talab qilinadi')
+    if count is not None and (not isinstance(count, int) or count < 1):
+        raise RecurrenceError('count musbat butun son bo\'lishi kerak')
+
+    occurrences = []
+    begin = start_time
+    while (count is None or len(occurrences) < count) and (until is None or begin <= until):
+        if len(occurrences) >= MAX_OCCURRENCES:
+            raise RecurrenceError(f'Ko\'pi bilan {MAX_OCCURRENCES} ta takrorlanish')
+        occurrences.append((begin, begin + duration))
+        begin += step
+    if not occurrences:
+        raise RecurrenceError('Qoida bo\'yicha birorta ham bron chiqmadi')
+    return occurrences
+
+
+def overlaps(start, end, other_start, other_end):
+    """create_booking dagi to'qnashuv sharti (conflicting_booking_id bilan bir xil)"""
+    return (
+        (start <= other_start < end)
+        or (start < other_end <= end)
+        or (start >= other_start and end <= other_end)
+    )
+
+
+class Intervals:
+    """Bitta kompyuterning bronlari boshlanish vaqti bo'yicha tartiblangan.
+
+    reach[i] - birinchi i+1 ta bronning eng kech tugashi: orqaga qarab
+    qidirishni oraliq boshlanishidan oldin tugaganlarda to'xtatish uchun.
+    """
+
+    __slots__ = ('starts', 'ends', 'ids', 'reach')
+
+    def __init__(self, rows):
+        self.starts, self.ends, self.ids, self.reach = [], [], [], []
+        for booking_id, start, end in sorted(rows, key=lambda row: row[1]):
+            self.starts.append(start)
+            self.ends.append(end)
+            self.ids.append(booking_id)
+            self.reach.append(max(end, self.reach[-1]) if self.reach else end)
+
+    def conflict(self, start, end):
+        """Oraliq bilan to'qnashadigan bron id si yoki None"""
+        index = bisect_right(self.starts, end)
+        while index > 0:
+            index -= 1
+            if self.reach[index] < start:
+                break
+            if overlaps(self.starts[index], self.ends[index], start, end):
+                return self.ids[index]
+        return None
+
+
+def find_conflicts(computer_ids, occurrences):
+    """{(kompyuter id, boshlanish): to'qnashgan bron id yoki None}.
+
+    Barcha kompyuterlar va takrorlanishlar uchun bitta oraliq so'rovi, keyin
+    har bir kompyuter bronlari ichida bisect. Yangi bronlarning o'zaro
+    to'qnashuvi ham tekshiriladi (None - avvalgi takrorlanish bilan).
+    """
+    first = min(start for start, _ in occurrences)
+    last = max(end for _, end in occurrences)
+    rows = {}
+    for booking_id, computer_id, start, end in active_bookings_between(computer_ids, first, last):
+        rows.setdefault(computer_id, []).append((booking_id, start, end))
+
+    conflicts = {}
+    for computer_id in computer_ids:
+        intervals = Intervals(rows.get(computer_id, ()))
+        previous = None
+        for start, end in sorted(occurrences):
+            booking_id = intervals.conflict(start, end)
+            if booking_id is not None:
+                conflicts[(computer_id, start)] = booking_id
+            elif previous is not None and overlaps(previous[0], previous[1], start, end):
+                conflicts[(computer_id, start)] = None
+            else:
+                previous = (start, end)
+    return conflicts
+
+
+def room_computers(room_id, numbers):
+    """Xonadagi faol kompyuterlar raqam tartibida; topilmagan raqamlar uchun RecurrenceError"""
+    if not isinstance(numbers, list) or not numbers:
+        raise RecurrenceError('computer_numbers ro\'yxati talab qilinadi')
+    numbers = list(dict.fromkeys(numbers))
+    computers = Computer.query.filter(
+        Computer.room_id == room_id,
+        Computer.number.in_(numbers),
+        Computer.is_active == True
+    ).all()
+    by_number = {computer.number: computer for computer in computers}
+    missing = [number for number in numbers if number not in by_number]
+    if missing:
+        raise RecurrenceError(f'Kompyuter topilmadi: {", ".join(map(str, missing))}')
+    return [by_number[number] for number in numbers]
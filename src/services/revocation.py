@@ -0,0 +1,90 @@
+from flask import current_app
+from src.models.user import db
+from src.models.revoked_token import RevokedToken
+from datetime import datetime, timedelta
+import threading
+import time
+
+DEFAULT_REFRESH_INTERVAL = 2    # soniya
+DEFAULT_RELOAD_INTERVAL = 600   # soniya
+
+
+class RevocationStore:
+    """Bekor qilingan tokenlar jadvalining ishchi xotirasidagi nusxasi"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jtis = set()
+        self._user_cutoffs = {}
+        self._last_id = 0
+        self._last_refresh = 0.0
+        self._last_reload = 0.0
+
+    def refresh(self, force=False):
+        """Yangi yozuvlarni o'qish (id > oxirgi o'qilgan)"""
+        now = time.monotonic()
+        interval = current_app.config.get('TOKEN_REVOCATION_REFRESH', DEFAULT_REFRESH_INTERVAL)
+        if not force and now - self._last_refresh < interval:
+            return
+        with self._lock:
+            if not force and now - self._last_refresh < interval:
+                return
+            reload_interval = current_app.config.get('TOKEN_REVOCATION_RELOAD', DEFAULT_RELOAD_INTERVAL)
+            if now - self._last_reload >= reload_interval:
+                # Muddati o'tgan yozuvlarni xotiradan tushirish
+                jtis, cutoffs, last_id = set(), {}, 0
+                self._last_reload = now
+            else:
+                jtis, cutoffs, last_id = self._jtis, self._user_cutoffs, self._last_id
+
+            rows = db.session.query(
+                RevokedToken.id, RevokedToken.jti, RevokedToken.user_id, RevokedToken.created_at
+            ).filter(
+                RevokedToken.id > last_id,
+                RevokedToken.expires_at > datetime.utcnow()
+            ).order_by(RevokedToken.id).all()
+            for row_id, jti, user_id, created_at in rows:
+                if jti:
+                    jtis.add(jti)
+                else:
+                    cutoff = int((created_at - datetime(1970, 1, 1)).total_seconds())
+                    cutoffs[user_id] = max(cutoffs.get(user_id, 0), cutoff)
+                last_id = row_id
+
+            self._jtis, self._user_cutoffs, self._last_id = jtis, cutoffs, last_id
+            self._last_refresh = now
+
+    def is_revoked(self, payload):
+        """Token bekor qilinganmi? (O(1) tekshiruv)"""
+        self.refresh()
+        if payload.get('jti') in self._jtis:
+            return True
+        cutoff = self._user_cutoffs.get(payload.get('user_id'))
+        return cutoff is not None and payload.get('iat', 0) < cutoff
+
+    def revoke_token(self, payload):
+        """Bitta tokenni bekor qilish (sessiyaga qo'shiladi, commit chaqiruvchida)"""
+        if not payload.get('jti'):
+            return
+        db.session.add(RevokedToken(
+            jti=payload['jti'],
+            user_id=payload['user_id'],
+            expires_at=datetime.utcfromtimestamp(payload['exp'])
+        ))
+
+    def revoke_user(self, user_id):
+        """Foydalanuvchining hozirgacha berilgan barcha tokenlarini bekor qilish"""
+        lifetime = current_app.config.get('REFRESH_TOKEN_DAYS', 7)
+        db.session.add(RevokedToken(
+            user_id=user_id,
+            expires_at=datetime.utcnow() + timedelta(days=lifetime)
+        ))
+
+    def prune(self):
+        """Muddati o'tgan yozuvlarni bazadan o'chirish"""
+        deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+        db.session.commit()
+        return deleted
+
+
+revocations = RevocationStore()
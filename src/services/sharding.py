@@ -0,0 +1,264 @@
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.sql.util import find_tables
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import re
+import threading
+
+# Klubga tegishli jadvallar - shard rejimida klub fayllarida saqlanadi.
+# Klub hodisalari va hisoblagichlari ham shu yerda: bron yozuvi markaziy bazani qulflamaydi.
+# User, GameClub va qolgan xizmat jadvallari markaziy bazada qoladi
+SHARDED_TABLES = frozenset({
+    'room', 'computer', 'booking', 'booking_archive', 'media_file', 'live_event', 'club_counter'
+})
+MODES = ('club', 'fixed')
+DEFAULT_SHARD_COUNT = 8
+DEFAULT_WORKERS = 4
+
+_scope = ContextVar('shard_scope', default=None)
+
+
+class ShardingError(RuntimeError):
+    """Klub doirasi aniqlanmagan holda shard jadvaliga murojaat"""
+
+
+class ShardRouter:
+    """game_club_id bo'yicha shard faylini tanlash (SHARD_MODE o'rnatilmasa o'chiq).
+
+    'club' - har bir klub alohida faylda, 'fixed' - SHARD_COUNT ta fayl
+    (club_id % SHARD_COUNT). Har bir shard ulanishiga markaziy baza
+    'central' nomi bilan ATTACH qilinadi, shuning uchun User/GameClub bilan
+    JOIN lar o'zgarishsiz ishlaydi.
+    """
+
+    def __init__(self):
+        self.mode = None
+        self.count = DEFAULT_SHARD_COUNT
+        self.directory = None
+        self.workers = DEFAULT_WORKERS
+        self._central_path = None
+        self._metadata = None
+        self._engines = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    def init_app(self, app, db):
+        mode = app.config.get('SHARD_MODE')
+        if not mode:
+            return
+        if mode not in MODES:
+            raise RuntimeError(f'SHARD_MODE quyidagilardan biri bo\'lishi kerak: {", ".join(MODES)}')
+        with app.app_context():
+            self._central_path = db.engine.url.database
+        if not self._central_path or self._central_path == ':memory:':
+            raise RuntimeError('Shard rejimi fayldagi markaziy SQLite bazani talab qiladi')
+        self.mode = mode
+        self.count = app.config.get('SHARD_COUNT', DEFAULT_SHARD_COUNT)
+        self.workers = app.config.get('SHARD_WORKERS', DEFAULT_WORKERS)
+        self.directory = app.config.get('SHARD_DIR') or os.path.join(
+            os.path.dirname(os.path.abspath(self._central_path)), 'shards'
+        )
+        self._metadata = db.metadata
+        os.makedirs(self.directory, exist_ok=True)
+
+    def shard_for(self, club_id):
+        if self.mode == 'club':
+            return f'club_{club_id}'
+        return f'shard_{club_id % self.count}'
+
+    def keys(self):
+        """Fan-out uchun barcha shardlar (club rejimida - mavjud fayllar)"""
+        if self.mode == 'fixed':
+            return [f'shard_{index}' for index in range(self.count)]
+        return sorted(
+            name[:-3] for name in os.listdir(self.directory)
+            if re.fullmatch(r'club_\d+\.db', name)
+        )
+
+    def groups(self, club_ids):
+        """{shard: [club_id, ...]}"""
+        groups = {}
+        for club_id in club_ids:
+            groups.setdefault(self.shard_for(club_id), []).append(club_id)
+        return groups
+
+    def scoped_key(self):
+        """Joriy klub doirasi shardi yoki None"""
+        key = _scope.get()
+        if key is None and has_app_context():
+            key = g.get('shard_key')
+        return key
+
+    def current_key(self):
+        key = self.scoped_key()
+        if key is None:
+            raise ShardingError('Klub doirasi tanlanmagan (club_scope yoki fan_out kerak)')
+        return key
+
+    def engine(self, key):
+        engine = self._engines.get(key)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(key)
+                if engine is None:
+                    engine = self._engines[key] = self._create_engine(key)
+        return engine
+
+    def _create_engine(self, key):
+        engine = create_engine(f"sqlite:///{os.path.join(self.directory, key + '.db')}")
+        central = self._central_path
+
+        @event.listens_for(engine, 'connect')
+        def _attach_central(dbapi_connection, connection_record):
+            dbapi_connection.execute('ATTACH DATABASE ? AS central', (central,))
+
+        self._metadata.create_all(engine, tables=[
+            table for name, table in self._metadata.tables.items() if name in SHARDED_TABLES
+        ])
+        return engine
+
+    def migrate(self, central_engine):
+        """Markaziy bazadagi klub jadvallarini shard fayllarga nusxalash (qayta ishga tushirsa bo'ladi).
+
+        Markaziy nusxalar o'chirilmaydi - shard rejimida ular o'qilmaydi.
+        """
+        counts = {}
+        with central_engine.connect() as source:
+            room_clubs = dict(source.execute(select(
+                self._metadata.tables['room'].c.id, self._metadata.tables['room'].c.game_club_id
+            )).all())
+            for name in ('room', 'computer', 'booking', 'booking_archive', 'media_file'):
+                table = self._metadata.tables[name]
+                by_shard = {}
+                rows = source.execute(select(table)).mappings().all()
+                for row in rows:
+                    club_id = room_clubs.get(row['room_id']) if name == 'computer' else row['game_club_id']
+                    if club_id is not None:
+                        by_shard.setdefault(self.shard_for(club_id), []).append(dict(row))
+                for key, part in by_shard.items():
+                    with self.engine(key).begin() as target:
+                        target.execute(table.insert().prefix_with('OR IGNORE'), part)
+                counts[name] = len(rows)
+        return counts
+
+    def executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='shard')
+        return self._pool
+
+
+router = ShardRouter()
+
+
+def _is_sharded(mapper, clause):
+    # ORM so'rovida mapper birinchi entity (masalan GameClub) bo'lishi mumkin,
+    # shuning uchun JOIN qilingan jadvallar ham tekshiriladi
+    if mapper is not None and any(table.name in SHARDED_TABLES for table in mapper.tables):
+        return True
+    if clause is not None:
+        return any(
+            getattr(table, 'name', None) in SHARDED_TABLES
+            for table in find_tables(clause, include_crud=True, include_joins=True)
+        )
+    return False
+
+
+class RoutingSession(FlaskSession):
+    """Klub jadvallarini joriy shard ga, qolganini markaziy bazaga yo'naltirish.
+
+    Klub doirasi tanlangan bo'lsa markaziy jadvallar ham shard ulanishi orqali
+    (ATTACH qilingan 'central') o'qiladi va yoziladi - shard va markaziy
+    o'zgarishlar bitta SQLite tranzaksiyasida commit qilinadi. Bron bilan birga
+    yoziladigan live_event va club_counter shard faylida, cache_version esa
+    commit dan keyin yoziladi, shuning uchun oddiy bron markaziy bazani qulflamaydi.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard_key=None, **kwargs):
+        if bind is None and router.enabled:
+            if _is_sharded(mapper, clause):
+                return router.engine(shard_key or router.current_key())
+            shard_key = shard_key or router.scoped_key()
+            if shard_key is not None:
+                return router.engine(shard_key)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _club_of(instance):
+    from src.models.game_club import GameClub
+    if isinstance(instance, GameClub):
+        return instance.id
+    return getattr(instance, 'game_club_id', None)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _route_lazy_load(state):
+    # club.rooms, booking.room kabi yuklashlar obyekt klubining shardiga boradi
+    # (superadmin so'rovlari va login da joriy doira bo'lmaydi)
+    if router.enabled and state.is_select and state.lazy_loaded_from is not None and _scope.get() is None:
+        club_id = _club_of(state.lazy_loaded_from.obj())
+        if club_id:
+            state.bind_arguments['shard_key'] = router.shard_for(club_id)
+
+
+def bind_request(club_id):
+    """So'rov davomida klub shardini tanlash (token_required chaqiradi)"""
+    if router.enabled and club_id:
+        g.shard_key = router.shard_for(club_id)
+
+
+@contextmanager
+def club_scope(club_id):
+    """Blok ichida berilgan klub shardi bilan ishlash"""
+    token = _scope.set(router.shard_for(club_id)) if router.enabled and club_id else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _scope.reset(token)
+
+
+def fan_out(fn, keys=None):
+    """fn() ni har bir shardda parallel bajarish; natijalar ro'yxati.
+
+    Shard rejimi o'chiq bo'lsa fn() joriy kontekstda bir marta chaqiriladi.
+    fn ORM obyektlarini emas, tayyor qiymatlarni qaytarishi kerak - har bir
+    shard alohida sessiyada ishlaydi.
+    """
+    if not router.enabled:
+        return [fn()]
+    from src.models.user import db
+    app = current_app._get_current_object()
+
+    def run(key):
+        with app.app_context():
+            token = _scope.set(key)
+            try:
+                return fn()
+            finally:
+                _scope.reset(token)
+                db.session.remove()
+
+    keys = router.keys() if keys is None else list(keys)
+    return list(router.executor().map(run, keys))
+
+
+def per_club(club_ids, fn):
+    """fn(club_ids) -> dict natijalarini shardlar bo'yicha yig'ish"""
+    club_ids = list(club_ids)
+    if not router.enabled:
+        return fn(club_ids)
+    groups = router.groups(club_ids)
+    merged = {}
+    for part in fan_out(lambda: fn(groups[_scope.get()]), groups):
+        merged.update(part)
+    return merged
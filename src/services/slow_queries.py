@@ -0,0 +1,233 @@
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import Counter
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+MAX_FINGERPRINTS = 10000
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+# "SCAN booking" - to'liq o'qish; "SCAN t USING (COVERING) INDEX" va
+# virtual (R-tree) jadvallar - indeks bo'yicha
+_FULL_SCAN = re.compile(r'^SCAN (\w+)\b(?! USING| VIRTUAL TABLE)')
+
+
+def fingerprint(statement):
+    """Literal va parametr ro'yxatlarisiz normallashgan so'rov va uning qisqa xeshi"""
+    normalized = _WHITESPACE.sub(' ', statement).strip()
+    normalized = _STRING.sub('?', normalized)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _PLACEHOLDER_LIST.sub('?...', normalized)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def parameter_shape(parameters):
+    """Qiymatlarsiz parametrlar shakli: '(int, str, datetime x3)'"""
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in parameters.items()) + '}'
+    groups = []
+    for value in parameters or ():
+        name = type(value).__name__
+        if groups and groups[-1][0] == name:
+            groups[-1][1] += 1
+        else:
+            groups.append([name, 1])
+    return '(' + ', '.join(name if count == 1 else f'{name} x{count}' for name, count in groups) + ')'
+
+
+def plan_flags(plan):
+    flags = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match:
+            flags.append(f'full_scan:{match.group(1)}')
+        if 'USE TEMP B-TREE' in detail:
+            flags.append('temp_btree')
+    return sorted(set(flags))
+
+
+class SlowQueryLog:
+    """Sekin SQL so'rovlarini EXPLAIN QUERY PLAN bilan JSON lines faylga yozish.
+
+    Har bir so'rov turi (fingerprint) jarayonda bir marta EXPLAIN qilinadi:
+    to'liq jadval o'qiydigan so'rovlar tez bo'lsa ham bir marta 'full_scan'
+    sababi bilan yoziladi, SLOW_QUERY_THRESHOLD_MS dan sekinlari esa har safar.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold = DEFAULT_THRESHOLD_MS / 1000
+        self.path = None
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self._plans = {}
+        self._fingerprints = {}
+        self._queue = queue.Queue(maxsize=10000)
+        self._writer = None
+        self._writer_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SLOW_QUERY_ENABLED', True)
+        self.path = app.config.get('SLOW_QUERY_LOG_PATH')
+        if not self.enabled or not self.path:
+            self.enabled = False
+            return
+        self.threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', DEFAULT_THRESHOLD_MS) / 1000
+        self.max_bytes = app.config.get('SLOW_QUERY_MAX_BYTES', DEFAULT_MAX_BYTES)
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slow_query_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        # SQLAlchemy bir xil so'rov matnini qayta ishlatadi - normallashtirish keshlanadi
+        cached = self._fingerprints.get(statement)
+        if cached is None:
+            if len(self._fingerprints) >= MAX_FINGERPRINTS:
+                self._fingerprints.clear()
+            cached = self._fingerprints[statement] = fingerprint(statement)
+        key, normalized = cached
+        first_seen = key not in self._plans
+        if duration < self.threshold and not first_seen:
+            return
+
+        sample = parameters[0] if executemany and parameters else parameters
+        if first_seen:
+            plan = self._explain(cursor.connection, statement, sample)
+            self._plans[key] = (plan, plan_flags(plan))
+        plan, flags = self._plans[key]
+        if duration < self.threshold and not any(flag.startswith('full_scan') for flag in flags):
+            return
+
+        self._emit({
+            'at': datetime.utcnow().isoformat(),
+            'fingerprint': key,
+            'statement': normalized,
+            'parameters': parameter_shape(sample),
+            'executemany': executemany,
+            'duration_ms': round(duration * 1000, 3),
+            'reason': 'slow' if duration >= self.threshold else 'full_scan',
+            'endpoint': request.endpoint if has_request_context() else threading.current_thread().name,
+            'plan': plan,
+            'flags': flags
+        })
+
+    def _explain(self, dbapi_connection, statement, parameters):
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return []
+        try:
+            explain = dbapi_connection.cursor()
+            try:
+                explain.execute(f'EXPLAIN QUERY PLAN {statement}', parameters or ())
+                return [row[3] for row in explain.fetchall()]
+            finally:
+                explain.close()
+        except Exception as e:
+            return [f'EXPLAIN xatolik: {e}']
+
+    def _emit(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            return
+        if self._writer is None or self._writer_pid != os.getpid() or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or self._writer_pid != os.getpid() or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name='slow-queries', daemon=True)
+                    self._writer_pid = os.getpid()
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            records = [self._queue.get()]
+            while not self._queue.empty() and len(records) < 500:
+                records.append(self._queue.get_nowait())
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+                with open(self.path, 'a') as stream:
+                    for record in records:
+                        stream.write(json.dumps(record, separators=(',', ':')) + '\n')
+            except OSError as e:
+                print(f"Sekin so'rovlar jurnaliga yozishda xatolik: {e}")
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+
+    def flush(self, timeout=2.0):
+        """Navbatdagi yozuvlar faylga tushishini kutish (CLI/endpoint o'qishidan oldin)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def records(self, since=None):
+        for path in (self.path + '.1', self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path) as stream:
+                for line in stream:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since is None or record['at'] >= since.isoformat():
+                        yield record
+
+    def summary(self, hours=None, top=20, order_by='total_ms'):
+        """Fingerprint bo'yicha yig'indi: soni, jami/o'rtacha/p95/max vaqt, endpoint lar, plan"""
+        self.flush()
+        since = datetime.utcnow() - timedelta(hours=hours) if hours else None
+        groups = {}
+        for record in self.records(since):
+            group = groups.get(record['fingerprint'])
+            if group is None:
+                group = groups[record['fingerprint']] = {
+                    'fingerprint': record['fingerprint'],
+                    'statement': record['statement'],
+                    'parameters': record['parameters'],
+                    'plan': record['plan'],
+                    'flags': record['flags'],
+                    'durations': [],
+                    'endpoints': Counter(),
+                    'last_seen': record['at']
+                }
+            group['durations'].append(record['duration_ms'])
+            group['endpoints'][record['endpoint']] += 1
+            group['plan'], group['flags'], group['last_seen'] = record['plan'], record['flags'], record['at']
+
+        result = []
+        for group in groups.values():
+            durations = sorted(group.pop('durations'))
+            group.update({
+                'count': len(durations),
+                'total_ms': round(sum(durations), 3),
+                'avg_ms': round(sum(durations) / len(durations), 3),
+                'p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                'max_ms': durations[-1],
+                'endpoints': dict(group['endpoints'].most_common(5))
+            })
+            result.append(group)
+        return sorted(result, key=lambda group: group[order_by], reverse=True)[:top]
+
+
+slow_queries = SlowQueryLog()
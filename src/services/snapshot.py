@@ -0,0 +1,83 @@
+from src.models.user import db
+from src.models.game_club import GameClub
+from src.models.booking import Booking
+from src.services.invalidation import bus as invalidation
+from src.services.listing import GAME_CLUB, room_dicts
+from sqlalchemy import func
+from datetime import datetime, timedelta
+import hashlib
+import json
+import threading
+
+MAX_CACHED_CLUBS = 1000
+MAX_AGE = timedelta(seconds=60)
+
+
+def build_snapshot(club_id):
+    """Klub, xonalar, kompyuterlar va joriy bronlar - /rooms bilan bir xil listing shakllari.
+
+    Hujjat va u eskiradigan vaqt (eng yaqin bron tugashi yoki keyingi bron boshlanishi) qaytariladi.
+    """
+    clubs = GAME_CLUB.all(GAME_CLUB.select().where(GameClub.id == club_id))
+    if not clubs:
+        return None, None
+
+    rooms = room_dicts(club_id)
+    computers = [computer for room in rooms for computer in room['computers']]
+    current = [computer['current_booking'] for computer in computers if computer['current_booking']]
+    document = {
+        'club': clubs[0],
+        'rooms': rooms,
+        'busy_computers': len(current),
+        'total_computers': len(computers)
+    }
+
+    now = datetime.utcnow()
+    expires_at = now + MAX_AGE
+    if current:
+        expires_at = min(expires_at, min(datetime.fromisoformat(booking['end_time']) for booking in current))
+    next_start = db.session.query(func.min(Booking.start_time)).filter(
+        Booking.game_club_id == club_id,
+        Booking.is_active == True,
+        Booking.start_time > now
+    ).scalar()
+    if next_start:
+        expires_at = min(expires_at, next_start)
+    return document, expires_at
+
+
+class SnapshotCache:
+    """Klub versiyasi bo'yicha keshlangan snapshot hujjatlari"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def evict(self, club_ids):
+        with self._lock:
+            for club_id in club_ids:
+                self._entries.pop(club_id, None)
+
+    def get(self, club_id):
+        """(versiya, kontent xeshi, hujjat) yoki None"""
+        version = invalidation.version('game_club', club_id)
+        entry = self._entries.get(club_id)
+        if entry and entry[0] == version and entry[1] > datetime.utcnow():
+            return entry[0], entry[2], entry[3]
+
+        document, expires_at = build_snapshot(club_id)
+        if document is None:
+            return None
+        content_hash = hashlib.sha256(
+            json.dumps(document, sort_keys=True, separators=(',', ':')).encode()
+        ).hexdigest()
+
+        with self._lock:
+            if len(self._entries) >= MAX_CACHED_CLUBS:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[club_id] = (version, expires_at, content_hash, document)
+        return version, content_hash, document
+
+
+snapshots = SnapshotCache()
+invalidation.subscribe('game_club', snapshots.evict)
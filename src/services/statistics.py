@@ -0,0 +1,256 @@
+from src.models.user import db
+from src.models.booking import Booking
+from src.models.media_file import MediaFile
+from src.models.club_counter import ClubCounter
+from src.services.archive import booking_history
+from src.services.sharding import fan_out
+from src.services.queries import counter_values, media_type_counts
+from sqlalchemy import case, event, func, inspect, select, text, bindparam
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+BOOKING_COUNTERS = {
+    'bookings_total': None,
+    'bookings_active': 'is_active',
+    'bookings_completed': 'is_completed'
+}
+MEDIA_TYPES = ('image', 'video')
+_BUILT = (0, '_built')
+
+_ADD_SQL = text(
+    'INSERT INTO club_counter (game_club_id, name, value) VALUES (:club_id, :name, :delta) '
+    'ON CONFLICT (game_club_id, name) DO UPDATE SET value = value + excluded.value'
+)
+_CLEAR_SQL = text(
+    'DELETE FROM club_counter WHERE game_club_id IN :club_ids'
+).bindparams(bindparam('club_ids', expanding=True))
+# Shard rejimida hisoblagichlar klub faylida (bron bilan bitta tranzaksiyada)
+_COUNTERS = {'mapper': ClubCounter.__mapper__}
+
+
+def _sum(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _bookings():
+    # Arxivdagi bronlar ham hisobga olinadi (ular hech qachon faol emas)
+    return booking_history('id', 'game_club_id', 'is_active', 'is_completed', 'end_time')
+
+
+def _booking_columns(bookings, now):
+    # jami, faol, tugallangan, muddati o'tgan (faol, lekin vaqti tugagan)
+    return (
+        func.count(bookings.c.id),
+        _sum(bookings.c.is_active == True),
+        _sum(bookings.c.is_completed == True),
+        _sum((bookings.c.is_active == True) & (bookings.c.end_time <= now))
+    )
+
+
+def _booking_query(bookings, now):
+    return select(bookings.c.game_club_id, *_booking_columns(bookings, now)).group_by(bookings.c.game_club_id)
+
+
+def _media_query():
+    return select(
+        MediaFile.game_club_id, MediaFile.file_type, func.count(MediaFile.id)
+    ).where(MediaFile.is_active == True).group_by(MediaFile.game_club_id, MediaFile.file_type)
+
+
+def _aggregate_counters(session, club_ids=None):
+    """{(klub, nom): qiymat} - jadvallardan to'g'ridan-to'g'ri hisoblangan"""
+    history = _bookings()
+    bookings = _booking_query(history, datetime.utcnow())
+    media = _media_query()
+    if club_ids is not None:
+        bookings = bookings.where(history.c.game_club_id.in_(club_ids))
+        media = media.where(MediaFile.game_club_id.in_(club_ids))
+    counters = {}
+    for club_id, total, active, completed, _ in session.execute(bookings):
+        counters[(club_id, 'bookings_total')] = total
+        counters[(club_id, 'bookings_active')] = active
+        counters[(club_id, 'bookings_completed')] = completed
+    for club_id, file_type, count in session.execute(media):
+        counters[(club_id, f'media_{file_type}')] = count
+    return counters
+
+
+def _rebuild_counters(session):
+    """Joriy shard (yoki markaziy baza) hisoblagichlarini jadvallardan qayta qurish"""
+    counters = _aggregate_counters(session)
+    connection = session.connection(bind_arguments=_COUNTERS)
+    connection.execute(text('DELETE FROM club_counter'))
+    _write_counters(connection, counters)
+    connection.execute(_ADD_SQL, {'club_id': _BUILT[0], 'name': _BUILT[1], 'delta': 1})
+
+
+def _write_counters(connection, counters):
+    rows = [
+        {'club_id': club_id, 'name': name, 'delta': value}
+        for (club_id, name), value in sorted(counters.items()) if value
+    ]
+    if rows:
+        connection.execute(_ADD_SQL, rows)
+
+
+class ClubStatistics:
+    """Bron va media statistikasi - bitta agregat so'rov yoki hisoblagichlar orqali"""
+
+    def __init__(self):
+        self.counters_enabled = False
+
+    def init_app(self, app):
+        """Indeks yaratish; hisoblagichlar yoqilgan bo'lsa ularni bir marta to'ldirish"""
+        self.counters_enabled = app.config.get('STATS_COUNTERS_ENABLED', False)
+        with app.app_context():
+            # Shard rejimida har bir shard fayli alohida tayyorlanadi
+            fan_out(self._prepare)
+
+    def _prepare(self):
+        # Muddati o'tgan bronlarni sanash faqat faol bronlar ustida yuradi
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_booking_active_end ON booking (is_active, end_time)'
+        ), bind_arguments={'mapper': Booking.__mapper__})
+        built = db.session.get(ClubCounter, _BUILT) is not None
+        if self.counters_enabled and not built:
+            _rebuild_counters(db.session)
+        elif not self.counters_enabled and built:
+            # O'chirilgan paytda hisoblagichlar yangilanmaydi - keyin qayta quriladi
+            db.session.execute(text('DELETE FROM club_counter'), bind_arguments=_COUNTERS)
+        db.session.commit()
+
+    def booking_stats(self, club_id=None):
+        """{'total_bookings', 'active_bookings', 'completed_bookings', 'expired_bookings'}"""
+        now = datetime.utcnow()
+        if self.counters_enabled:
+            counters = self._read_counters(club_id, BOOKING_COUNTERS)
+            total, active, completed = (counters[name] for name in BOOKING_COUNTERS)
+            expired_query = select(func.count(Booking.id)).where(
+                Booking.is_active == True, Booking.end_time <= now
+            )
+            if club_id is not None:
+                expired = db.session.execute(expired_query.where(Booking.game_club_id == club_id)).scalar()
+            else:
+                expired = sum(fan_out(lambda: db.session.execute(expired_query).scalar()))
+        else:
+            history = _bookings()
+            query = select(*_booking_columns(history, now))
+            if club_id is not None:
+                total, active, completed, expired = db.session.execute(
+                    query.where(history.c.game_club_id == club_id)
+                ).one()
+            else:
+                parts = fan_out(lambda: tuple(db.session.execute(query).one()))
+                total, active, completed, expired = (sum(column) for column in zip(*parts))
+        return {
+            'total_bookings': total,
+            'active_bookings': active,
+            'completed_bookings': completed,
+            'expired_bookings': expired
+        }
+
+    def media_counts(self, club_id):
+        """Klubning faol fayllari soni turi bo'yicha: {'image': n, 'video': n}"""
+        if self.counters_enabled:
+            counters = self._read_counters(club_id, [f'media_{file_type}' for file_type in MEDIA_TYPES])
+            return {file_type: counters[f'media_{file_type}'] for file_type in MEDIA_TYPES}
+        counts = dict.fromkeys(MEDIA_TYPES, 0)
+        counts.update(media_type_counts(club_id))
+        return counts
+
+    def _read_counters(self, club_id, names):
+        values = dict.fromkeys(names, 0)
+        if club_id is not None:
+            values.update(counter_values(club_id, list(names)))
+            return values
+        # Barcha klublar - har bir shard hisoblagichlari yig'iladi
+        for part in fan_out(lambda: [tuple(row) for row in counter_values(None, list(names))]):
+            for name, value in part:
+                values[name] += value
+        return values
+
+    def check(self, fix=False):
+        """Hisoblagichlarni jadvallar bilan solishtirish; [(klub, nom, hisoblagich, haqiqiy)]"""
+        def check_shard():
+            actual = _aggregate_counters(db.session)
+            stored = {
+                (club_id, name): value
+                for club_id, name, value in db.session.execute(
+                    select(ClubCounter.game_club_id, ClubCounter.name, ClubCounter.value)
+                    .where(ClubCounter.game_club_id != 0)
+                )
+            }
+            mismatches = [
+                (club_id, name, stored.get((club_id, name), 0), actual.get((club_id, name), 0))
+                for club_id, name in sorted(set(actual) | set(stored))
+                if stored.get((club_id, name), 0) != actual.get((club_id, name), 0)
+            ]
+            if fix and mismatches:
+                _rebuild_counters(db.session)
+            db.session.commit()
+            return mismatches
+
+        # Shard rejimida har bir shard alohida tekshiriladi (klublar kesishmaydi)
+        return sorted(mismatch for part in fan_out(check_shard) for mismatch in part)
+
+
+statistics = ClubStatistics()
+
+
+def _flag_change(obj, attr, is_new, is_deleted):
+    """Bayroq qiymatining o'zgarishi: -1, 0, 1 yoki None (eski qiymat noma'lum)"""
+    if is_new:
+        return 1 if getattr(obj, attr) else 0
+    history = inspect(obj).attrs[attr].history
+    if is_deleted:
+        if history.deleted:
+            return -1 if history.deleted[0] else 0
+        value = history.unchanged or history.added
+        return -1 if value and value[0] else 0
+    if not history.has_changes():
+        return 0
+    if not history.deleted:
+        return None
+    return int(bool(history.added and history.added[0])) - int(bool(history.deleted[0]))
+
+
+def _collect(obj, is_new, is_deleted, deltas, recount):
+    if isinstance(obj, Booking):
+        changes = {'bookings_total': 1 if is_new else -1 if is_deleted else 0}
+        for name, attr in BOOKING_COUNTERS.items():
+            if attr:
+                changes[name] = _flag_change(obj, attr, is_new, is_deleted)
+    elif isinstance(obj, MediaFile):
+        if obj.file_type not in MEDIA_TYPES:
+            return
+        changes = {f'media_{obj.file_type}': _flag_change(obj, 'is_active', is_new, is_deleted)}
+    else:
+        return
+    if None in changes.values():
+        recount.add(obj.game_club_id)
+        return
+    for name, delta in changes.items():
+        if delta:
+            deltas[(obj.game_club_id, name)] = deltas.get((obj.game_club_id, name), 0) + delta
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_counters(session, flush_context):
+    # Bulk insert/update so'rovlari bu yerdan o'tmaydi - ular uchun 'check --fix'
+    if not statistics.counters_enabled:
+        return
+    deltas, recount = {}, set()
+    for obj in session.new:
+        _collect(obj, True, False, deltas, recount)
+    for obj in session.dirty:
+        _collect(obj, False, False, deltas, recount)
+    for obj in session.deleted:
+        _collect(obj, False, True, deltas, recount)
+    recount.discard(None)
+    if not deltas and not recount:
+        return
+    connection = session.connection(bind_arguments=_COUNTERS)
+    if recount:
+        connection.execute(_CLEAR_SQL, {'club_ids': sorted(recount)})
+        _write_counters(connection, _aggregate_counters(session, sorted(recount)))
+    _write_counters(connection, {key: value for key, value in deltas.items() if key[0] not in recount})
@@ -0,0 +1,223 @@
+from src.models.user import db
+from src.models.computer import Computer
+from src.models.booking import Booking
+from multiprocessing import shared_memory
+from contextlib import contextmanager
+from sqlalchemy import func
+from datetime import datetime
+import calendar
+import fcntl
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+
+# Sarlavha: magic, sig'im; har bir slot: seq, holat, bron id, vaqt (epoch):
+# BUSY uchun bron tugashi, FREE uchun keyingi bron boshlanishi (0 - keyingi bron yo'q)
+MAGIC = b'GPSB'
+HEADER = struct.Struct('<4sI')
+HEADER_SIZE = 64
+SEQ = struct.Struct('<I')
+FIELDS = struct.Struct('<B3xqq')
+SLOT_SIZE = SEQ.size + FIELDS.size
+DEFAULT_CAPACITY = 65536
+READ_RETRIES = 100
+
+UNKNOWN, FREE, BUSY, INACTIVE = 0, 1, 2, 3
+
+
+def _epoch(value):
+    return calendar.timegm(value.utctimetuple())
+
+
+class StatusBoard:
+    """Kompyuterlar holati jadvali - barcha gunicorn ishchilari uchun umumiy xotirada.
+
+    Har bir kompyuter (id bo'yicha) uchun bitta slot. Yozuvchilar fayl qulfi
+    ostida seqlock tartibida yozadi, o'quvchilar qulfsiz o'qiydi. Slot vaqti
+    o'tgan bo'lsa (bron tugagan yoki keyingisi boshlangan) holat noma'lum -
+    o'quvchilar bazaga murojaat qiladi.
+    """
+
+    def __init__(self):
+        self._shm = None
+        self._lock_path = None
+        self._lock_fd = None
+        self._lock_pid = None
+        self._thread_lock = threading.Lock()
+        self.capacity = 0
+
+    @property
+    def enabled(self):
+        return self._shm is not None
+
+    def init_app(self, app):
+        """Umumiy xotirani ochish (yoki yaratish) va bazadan qayta qurish"""
+        # Shard rejimida kompyuter id lari fayllar orasida takrorlanishi mumkin
+        if not app.config.get('STATUS_BOARD_ENABLED', True) or app.config.get('SHARD_MODE'):
+            return
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        name = app.config.get('STATUS_BOARD_NAME') or 'gameport_' + hashlib.sha1(uri.encode()).hexdigest()[:12]
+        capacity = app.config.get('STATUS_BOARD_CAPACITY', DEFAULT_CAPACITY)
+        size = HEADER_SIZE + capacity * SLOT_SIZE
+        self._lock_path = os.path.join(tempfile.gettempdir(), f'{name}.lock')
+
+        try:
+            with self._locked():
+                try:
+                    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                    HEADER.pack_into(shm.buf, 0, MAGIC, capacity)
+                except FileExistsError:
+                    shm = shared_memory.SharedMemory(name=name)
+                    magic, existing = HEADER.unpack_from(shm.buf, 0)
+                    if magic != MAGIC or existing != capacity or shm.size < size:
+                        raise RuntimeError(f'{name}: holat jadvali formati mos emas')
+                # Segment bitta ishchi chiqqanda o'chib ketmasligi uchun
+                try:
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(shm._name, 'shared_memory')
+                except Exception:
+                    pass
+                self._shm = shm
+                self.capacity = capacity
+                with app.app_context():
+                    self._rebuild_locked()
+        except Exception as e:
+            self._shm = None
+            print(f'Holat jadvali o\'chirildi: {e}')
+
+    @contextmanager
+    def _locked(self):
+        # flock fayl deskriptoriga bog'liq - fork dan keyin har jarayon o'zinikini ochadi.
+        # Bitta jarayon ichidagi oqimlarni flock ajratmaydi (bir xil deskriptor),
+        # shuning uchun avval jarayon ichidagi qulf olinadi
+        with self._thread_lock:
+            if self._lock_fd is None or self._lock_pid != os.getpid():
+                self._lock_fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _offset(self, computer_id):
+        if not self.enabled or not 0 < computer_id < self.capacity:
+            return None
+        return HEADER_SIZE + computer_id * SLOT_SIZE
+
+    def _write(self, offset, state, booking_id, end_epoch):
+        buf = self._shm.buf
+        seq = SEQ.unpack_from(buf, offset)[0]
+        SEQ.pack_into(buf, offset, (seq + 1) & 0xFFFFFFFF)
+        FIELDS.pack_into(buf, offset + SEQ.size, state, booking_id, end_epoch)
+        SEQ.pack_into(buf, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def _read(self, offset):
+        buf = self._shm.buf
+        for _ in range(READ_RETRIES):
+            before = SEQ.unpack_from(buf, offset)[0]
+            if before & 1:
+                continue
+            fields = FIELDS.unpack_from(buf, offset + SEQ.size)
+            if SEQ.unpack_from(buf, offset)[0] == before:
+                return fields
+        return None
+
+    def mark_busy(self, computer_id, booking_id, end_time):
+        """Hozir davom etayotgan bron (kelajakdagilar uchun mark_upcoming)"""
+        offset = self._offset(computer_id)
+        if offset is not None:
+            with self._locked():
+                self._write(offset, BUSY, booking_id, _epoch(end_time))
+
+    def mark_upcoming(self, computer_id, start_time):
+        """Kelajakdagi bron: bo'sh slot shu vaqtgacha amal qiladi"""
+        offset = self._offset(computer_id)
+        if offset is not None:
+            start = _epoch(start_time)
+            with self._locked():
+                state, booking_id, until = FIELDS.unpack_from(self._shm.buf, offset + SEQ.size)
+                if state == FREE and (until == 0 or start < until):
+                    self._write(offset, FREE, 0, start)
+
+    def mark_free(self, computer_id, booking_id, next_start=None):
+        """Slotda shu bron bo'lsa bo'shatish (compare-and-clear), aks holda slot
+        noma'lum bo'ladi va o'quvchilar bazadan tekshiradi"""
+        offset = self._offset(computer_id)
+        if offset is not None:
+            with self._locked():
+                state, current, _ = FIELDS.unpack_from(self._shm.buf, offset + SEQ.size)
+                if state == BUSY and current == booking_id:
+                    self._write(offset, FREE, 0, _epoch(next_start) if next_start else 0)
+                else:
+                    self._write(offset, UNKNOWN, 0, 0)
+
+    def status(self, computer_id, now=None):
+        """(band, bron id) yoki None - jadvalda ma'lumot bo'lmasa"""
+        offset = self._offset(computer_id)
+        if offset is None:
+            return None
+        fields = self._read(offset)
+        if fields is None or fields[0] == UNKNOWN:
+            return None
+        state, booking_id, until = fields
+        if now is None:
+            now = _epoch(datetime.utcnow())
+        if state == BUSY:
+            return (True, booking_id) if now < until else None
+        if state == FREE and until and now >= until:
+            return None
+        return False, None
+
+    def statuses(self, computer_ids):
+        """Bir nechta kompyuter holati; jadvalda yo'qlari natijaga kirmaydi"""
+        if not self.enabled:
+            return {}
+        now = _epoch(datetime.utcnow())
+        result = {}
+        for computer_id in computer_ids:
+            status = self.status(computer_id, now)
+            if status is not None:
+                result[computer_id] = status
+        return result
+
+    def rebuild(self):
+        """Jadvalni bazadagi holatdan qayta qurish"""
+        if self.enabled:
+            with self._locked():
+                self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        now = datetime.utcnow()
+        computers = dict(db.session.query(Computer.id, Computer.is_active).all())
+        current = {}
+        for booking_id, computer_id, end_time in db.session.query(
+            Booking.id, Booking.computer_id, Booking.end_time
+        ).filter(Booking.in_progress(now)).order_by(Booking.id):
+            current.setdefault(computer_id, (booking_id, end_time))
+        upcoming = dict(db.session.query(Booking.computer_id, func.min(Booking.start_time)).filter(
+            Booking.is_active == True,
+            Booking.start_time > now
+        ).group_by(Booking.computer_id).all())
+
+        # Slotlar nolga tushirilmaydi - seq hisoblagichlari o'quvchilar uchun
+        # faqat oshib boradi, bazada yo'q id lar UNKNOWN qilib yoziladi
+        buf = self._shm.buf
+        for computer_id in range(1, self.capacity):
+            offset = HEADER_SIZE + computer_id * SLOT_SIZE
+            if computer_id not in computers:
+                if FIELDS.unpack_from(buf, offset + SEQ.size)[0] != UNKNOWN:
+                    self._write(offset, UNKNOWN, 0, 0)
+            elif not computers[computer_id]:
+                self._write(offset, INACTIVE, 0, 0)
+            elif computer_id in current:
+                booking_id, end_time = current[computer_id]
+                self._write(offset, BUSY, booking_id, _epoch(end_time))
+            else:
+                start_time = upcoming.get(computer_id)
+                self._write(offset, FREE, 0, _epoch(start_time) if start_time else 0)
+
+
+board = StatusBoard()
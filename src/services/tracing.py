@@ -0,0 +1,375 @@
+from flask import g, has_app_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import heapq
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_WINDOW = 10000        # p99 hisoblanadigan oxirgi so'rovlar
+DEFAULT_MAX_SPANS = 500       # bitta trace dagi span lar chegarasi
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+FORMATS = ('jsonl', 'otlp')
+STATEMENT_PREVIEW = 300
+THRESHOLD_REFRESH = 100
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+_ROOT_KEY = 'gameport.trace_root'
+
+
+class Span:
+    __slots__ = ('span_id', 'parent_id', 'name', 'start', 'end', 'attributes')
+
+    def __init__(self, span_id, parent_id, name, attributes=None):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+
+    def to_dict(self):
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start,
+            'duration_ms': round((self.end - self.start) / 1e6, 3) if self.end else None,
+            'attributes': self.attributes
+        }
+
+
+class Trace:
+    """Bitta so'rovning span lari (ichma-ich, stek bilan)"""
+
+    def __init__(self, trace_id, request_id, sampled, max_spans):
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.sampled = sampled
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+        self._stack = []
+
+    def start(self, name, attributes=None):
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(
+            '%016x' % random.getrandbits(64),
+            self._stack[-1].span_id if self._stack else None,
+            name, attributes
+        )
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def finish(self, span):
+        if span is None:
+            return
+        span.end = time.time_ns()
+        # Istisno sabab ichki span yopilmagan bo'lsa stek shu span gacha kesiladi
+        while self._stack:
+            if self._stack.pop() is span:
+                break
+
+    @property
+    def root(self):
+        return self.spans[0] if self.spans else None
+
+    @property
+    def duration(self):
+        root = self.root
+        return (root.end - root.start) / 1e9 if root and root.end else 0.0
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'request_id': self.request_id,
+            'duration_ms': round(self.duration * 1000, 3),
+            'dropped_spans': self.dropped,
+            'spans': [span.to_dict() for span in self.spans]
+        }
+
+    def to_otlp(self):
+        """OTLP/JSON (ExportTraceServiceRequest) shakli"""
+        def attributes(values):
+            return [
+                {'key': key, 'value': {'intValue': str(value)} if isinstance(value, int) and not isinstance(value, bool)
+                 else {'stringValue': str(value)}}
+                for key, value in values.items()
+            ]
+
+        return {'resourceSpans': [{
+            'resource': {'attributes': attributes({'service.name': 'gameport-backend'})},
+            'scopeSpans': [{
+                'scope': {'name': 'src.services.tracing'},
+                'spans': [
+                    {
+                        'traceId': self.trace_id,
+                        'spanId': span.span_id,
+                        'parentSpanId': span.parent_id or '',
+                        'name': span.name,
+                        'kind': 2 if span.parent_id is None else 1,
+                        'startTimeUnixNano': str(span.start),
+                        'endTimeUnixNano': str(span.end or span.start),
+                        'attributes': attributes(span.attributes)
+                    }
+                    for span in self.spans
+                ]
+            }]
+        }]}
+
+
+def current_trace():
+    return g.get('trace') if has_app_context() else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """Joriy so'rov trace ida ichki span (trace bo'lmasa hech narsa qilmaydi)"""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    item = trace.start(name, attributes)
+    try:
+        yield item
+    finally:
+        trace.finish(item)
+
+
+def traced(name):
+    """Funksiya chaqiruvini span bilan o'rash"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = current_trace()
+            if trace is None:
+                return fn(*args, **kwargs)
+            item = trace.start(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.finish(item)
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+class TracingJSONProvider(DefaultJSONProvider):
+    """Javobni JSON ga kodlash ham alohida span"""
+
+    def dumps(self, obj, **kwargs):
+        with span('response.encode'):
+            return super().dumps(obj, **kwargs)
+
+
+class SlowestTraces:
+    """Oxirgi DEFAULT_WINDOW so'rovning eng sekin 1% i (to'liq span lari bilan)"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self._durations = deque(maxlen=window)
+        self._heap = []
+        self._keep = max(1, window // 100)
+        self._threshold = 0.0
+        self._added = 0
+        self._lock = threading.Lock()
+
+    def threshold(self):
+        """Keshlangan p99 (har THRESHOLD_REFRESH so'rovda qayta hisoblanadi)"""
+        return self._threshold
+
+    def _refresh(self):
+        durations = sorted(self._durations)
+        self._threshold = durations[int(len(durations) * 0.99)] if durations else 0.0
+        # Oynadan chiqib ketgan trace lar tashlanadi
+        oldest = self._added - self._durations.maxlen
+        self._heap = [item for item in self._heap if item[1] >= oldest]
+        heapq.heapify(self._heap)
+
+    def add(self, trace):
+        with self._lock:
+            self._durations.append(trace.duration)
+            item = (trace.duration, self._added, trace)
+            self._added += 1
+            if self._added % THRESHOLD_REFRESH == 0:
+                self._refresh()
+            if len(self._heap) < self._keep:
+                heapq.heappush(self._heap, item)
+            elif trace.duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def slowest(self):
+        """(p99 chegarasi, chegaradan sekin trace lar - sekinidan boshlab)"""
+        with self._lock:
+            self._refresh()
+            threshold = self._threshold
+            traces = [trace for duration, _, trace in sorted(self._heap, reverse=True) if duration >= threshold]
+        return threshold, traces
+
+
+class Tracer:
+    """So'rovlar uchun yengil tracing: korrelyatsiya id, span lar, namuna va eksport.
+
+    Har bir so'rov uchun span lar yig'iladi (eng sekin 1% ni istalgan paytda
+    olish uchun), lekin faylga faqat TRACE_SAMPLE_RATE ulushi va eng sekin
+    1% ga kirganlari yoziladi. Eksport fon oqimida: JSON lines yoki OTLP/JSON.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = DEFAULT_SAMPLE_RATE
+        self.max_spans = DEFAULT_MAX_SPANS
+        self.export_path = None
+        self.export_format = 'jsonl'
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.slow = SlowestTraces()
+        self._queue = queue.Queue(maxsize=10000)
+        self._writer = None
+        self._writer_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('TRACE_ENABLED', True)
+        if not self.enabled:
+            return
+        self.sample_rate = app.config.get('TRACE_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        self.max_spans = app.config.get('TRACE_MAX_SPANS', DEFAULT_MAX_SPANS)
+        self.export_path = app.config.get('TRACE_EXPORT_PATH')
+        self.export_format = app.config.get('TRACE_EXPORT_FORMAT', 'jsonl')
+        if self.export_format not in FORMATS:
+            raise RuntimeError(f'TRACE_EXPORT_FORMAT quyidagilardan biri: {", ".join(FORMATS)}')
+        self.max_bytes = app.config.get('TRACE_EXPORT_MAX_BYTES', DEFAULT_MAX_BYTES)
+        self.slow = SlowestTraces(app.config.get('TRACE_WINDOW', DEFAULT_WINDOW))
+
+        app.json = TracingJSONProvider(app)
+        app.before_request(self._start_request)
+        app.after_request(self._tag_response)
+        app.teardown_request(self._finish_request)
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        for mapper in db.Model.registry.mappers:
+            cls = mapper.class_
+            method = cls.__dict__.get('to_dict')
+            if method is not None and not getattr(method, '__traced__', False):
+                setattr(cls, 'to_dict', traced(f'{cls.__name__}.to_dict')(method))
+
+    def _start_request(self):
+        trace = g.get('trace')
+        if trace is not None:
+            # Batch ichidagi so'rov - tashqi trace da ichki span
+            request.environ[_ROOT_KEY] = trace.start('batch.request', {
+                'http.method': request.method, 'http.target': request.path
+            })
+            return
+        incoming = request.headers.get('X-Request-ID', '')
+        trace_id = uuid.uuid4().hex
+        trace = g.trace = Trace(
+            trace_id,
+            incoming if _REQUEST_ID.match(incoming) else trace_id,
+            random.random() < self.sample_rate,
+            self.max_spans
+        )
+        request.environ[_ROOT_KEY] = trace.start('request', {
+            'http.method': request.method,
+            'http.target': request.path,
+            'http.route': request.endpoint or ''
+        })
+
+    def _tag_response(self, response):
+        trace = g.get('trace')
+        if trace is not None:
+            response.headers['X-Request-ID'] = trace.request_id
+            root = request.environ.get(_ROOT_KEY)
+            if root is not None:
+                root.attributes['http.status_code'] = response.status_code
+        return response
+
+    def _finish_request(self, exc=None):
+        root = request.environ.pop(_ROOT_KEY, None)
+        trace = g.get('trace')
+        if trace is None or root is None:
+            return
+        if exc is not None:
+            root.attributes['error'] = str(exc)
+        trace.finish(root)
+        if root is not trace.root:
+            return
+        g.pop('trace', None)
+        threshold = self.slow.threshold()
+        self.slow.add(trace)
+        if self.export_path and (trace.sampled or (threshold and trace.duration >= threshold)):
+            self._export(trace)
+
+    def _export(self, trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            return
+        if self._writer is None or self._writer_pid != os.getpid() or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or self._writer_pid != os.getpid() or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name='trace-export', daemon=True)
+                    self._writer_pid = os.getpid()
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            traces = [self._queue.get()]
+            while not self._queue.empty() and len(traces) < 500:
+                traces.append(self._queue.get_nowait())
+            try:
+                os.makedirs(os.path.dirname(self.export_path), exist_ok=True)
+                if os.path.exists(self.export_path) and os.path.getsize(self.export_path) > self.max_bytes:
+                    os.replace(self.export_path, self.export_path + '.1')
+                with open(self.export_path, 'a') as stream:
+                    for trace in traces:
+                        document = trace.to_otlp() if self.export_format == 'otlp' else trace.to_dict()
+                        stream.write(json.dumps(document, separators=(',', ':')) + '\n')
+            except OSError as e:
+                print(f"Trace larni yozishda xatolik: {e}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    if trace is not None and context is not None:
+        context._trace_span = trace.start('sql', {
+            'db.statement': statement[:STATEMENT_PREVIEW],
+            'db.executemany': executemany
+        })
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    item = getattr(context, '_trace_span', None)
+    if item is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            item.attributes['db.rowcount'] = cursor.rowcount
+        trace = current_trace()
+        if trace is not None:
+            trace.finish(item)
+        context._trace_span = None
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    item = getattr(context, '_trace_span', None) if context is not None else None
+    if item is not None:
+        item.attributes['error'] = str(exception_context.original_exception)
+        trace = current_trace()
+        if trace is not None:
+            trace.finish(item)
+        context._trace_span = None
+
+
+tracer = Tracer()